@@ -1,1250 +1,1337 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-import sqlite3
-import os
-from datetime import datetime
-import uuid
-import secrets
-
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-change-this'
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Ensure upload directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-def init_db():
-    """Initialize the database with all required tables"""
-    conn = sqlite3.connect('skillswap.db')
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            name TEXT NOT NULL,
-            location TEXT,
-            profile_photo TEXT,
-            is_public INTEGER DEFAULT 1,
-            availability TEXT,
-            is_admin INTEGER DEFAULT 0,
-            is_banned INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Skills offered table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS skills_offered (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            skill_name TEXT NOT NULL,
-            description TEXT,
-            is_approved INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Skills wanted table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS skills_wanted (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            skill_name TEXT NOT NULL,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Swap requests table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS swap_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            requester_id INTEGER,
-            provider_id INTEGER,
-            offered_skill_id INTEGER,
-            wanted_skill TEXT,
-            message TEXT,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (requester_id) REFERENCES users (id),
-            FOREIGN KEY (provider_id) REFERENCES users (id),
-            FOREIGN KEY (offered_skill_id) REFERENCES skills_offered (id)
-        )
-    ''')
-    
-    # Ratings table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ratings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            swap_request_id INTEGER,
-            rater_id INTEGER,
-            rated_id INTEGER,
-            rating INTEGER CHECK (rating >= 1 AND rating <= 5),
-            feedback TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (swap_request_id) REFERENCES swap_requests (id),
-            FOREIGN KEY (rater_id) REFERENCES users (id),
-            FOREIGN KEY (rated_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Platform messages table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS platform_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            admin_id INTEGER,
-            title TEXT NOT NULL,
-            message TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (admin_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Rooms table for group messaging
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS rooms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            creator_id INTEGER,
-            is_public INTEGER DEFAULT 1,
-            room_code TEXT UNIQUE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (creator_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Room members table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS room_members (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            room_id INTEGER,
-            user_id INTEGER,
-            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (room_id) REFERENCES rooms (id),
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(room_id, user_id)
-        )
-    ''')
-    
-    # Room messages table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS room_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            room_id INTEGER,
-            user_id INTEGER,
-            message TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (room_id) REFERENCES rooms (id),
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Create default admin user if not exists
-    cursor.execute('SELECT * FROM users WHERE username = ?', ('admin',))
-    if not cursor.fetchone():
-        admin_password = generate_password_hash('admin123')
-        cursor.execute('''
-            INSERT INTO users (username, email, password_hash, name, is_admin)
-            VALUES (?, ?, ?, ?, ?)
-        ''', ('admin', 'admin@skillswap.com', admin_password, 'Administrator', 1))
-    
-    conn.commit()
-    conn.close()
-
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect('skillswap.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
-@app.route('/')
-def index():
-    """Home page"""
-    conn = get_db_connection()
-    
-    # Get recent platform messages
-    messages = conn.execute('''
-        SELECT pm.*, u.name as admin_name
-        FROM platform_messages pm
-        JOIN users u ON pm.admin_id = u.id
-        ORDER BY pm.created_at DESC
-        LIMIT 3
-    ''').fetchall()
-    
-    # Get some featured skills
-    featured_skills = conn.execute('''
-        SELECT so.skill_name, u.name, u.location
-        FROM skills_offered so
-        JOIN users u ON so.user_id = u.id
-        WHERE u.is_public = 1 AND u.is_banned = 0 AND so.is_approved = 1
-        ORDER BY RANDOM()
-        LIMIT 6
-    ''').fetchall()
-    
-    conn.close()
-    return render_template('index.html', messages=messages, featured_skills=featured_skills)
-
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    """User registration"""
-    if request.method == 'POST':
-        username = request.form['username']
-        email = request.form['email']
-        password = request.form['password']
-        name = request.form['name']
-        location = request.form.get('location', '')
-        
-        conn = get_db_connection()
-        
-        # Check if user already exists
-        if conn.execute('SELECT id FROM users WHERE username = ? OR email = ?', (username, email)).fetchone():
-            flash('Username or email already exists!')
-            conn.close()
-            return render_template('register.html')
-        
-        # Create new user
-        password_hash = generate_password_hash(password)
-        conn.execute('''
-            INSERT INTO users (username, email, password_hash, name, location)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (username, email, password_hash, name, location))
-        
-        conn.commit()
-        conn.close()
-        
-        flash('Registration successful! Please login.')
-        return redirect(url_for('login'))
-    
-    return render_template('register.html')
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    """User login"""
-    if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
-        
-        conn = get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
-        
-        if user and check_password_hash(user['password_hash'], password):
-            if user['is_banned']:
-                flash('Your account has been banned. Please contact admin.')
-                return render_template('login.html')
-            
-            session['user_id'] = user['id']
-            session['username'] = user['username']
-            session['is_admin'] = user['is_admin']
-            
-            if user['is_admin']:
-                return redirect(url_for('admin_dashboard'))
-            else:
-                return redirect(url_for('dashboard'))
-        else:
-            flash('Invalid username or password!')
-    
-    return render_template('login.html')
-
-@app.route('/logout')
-def logout():
-    """User logout"""
-    session.clear()
-    flash('You have been logged out.')
-    return redirect(url_for('index'))
-
-@app.route('/dashboard')
-def dashboard():
-    """User dashboard"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    # Check if user is admin - redirect to admin dashboard
-    conn = get_db_connection()
-    user = conn.execute('SELECT is_admin FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-    
-    if user and user['is_admin']:
-        conn.close()
-        return redirect(url_for('admin_dashboard'))
-    
-    user_id = session['user_id']
-    
-    # Get user's skills offered
-    skills_offered = conn.execute('''
-        SELECT * FROM skills_offered WHERE user_id = ? ORDER BY created_at DESC
-    ''', (user_id,)).fetchall()
-    
-    # Get user's skills wanted
-    skills_wanted = conn.execute('''
-        SELECT * FROM skills_wanted WHERE user_id = ? ORDER BY created_at DESC
-    ''', (user_id,)).fetchall()
-    
-    # Get pending swap requests (received)
-    pending_requests = conn.execute('''
-        SELECT sr.*, u.name as requester_name, so.skill_name as offered_skill
-        FROM swap_requests sr
-        JOIN users u ON sr.requester_id = u.id
-        JOIN skills_offered so ON sr.offered_skill_id = so.id
-        WHERE sr.provider_id = ? AND sr.status = 'pending'
-        ORDER BY sr.created_at DESC
-    ''', (user_id,)).fetchall()
-    
-    # Get sent swap requests
-    sent_requests = conn.execute('''
-        SELECT sr.*, u.name as provider_name, so.skill_name as offered_skill
-        FROM swap_requests sr
-        JOIN users u ON sr.provider_id = u.id
-        JOIN skills_offered so ON sr.offered_skill_id = so.id
-        WHERE sr.requester_id = ?
-        ORDER BY sr.created_at DESC
-    ''', (user_id,)).fetchall()
-    
-    # Get user's rooms
-    user_rooms = conn.execute('''
-        SELECT r.*, rm.joined_at, u.name as creator_name,
-               (SELECT COUNT(*) FROM room_members WHERE room_id = r.id) as member_count
-        FROM rooms r
-        JOIN room_members rm ON r.id = rm.room_id
-        JOIN users u ON r.creator_id = u.id
-        WHERE rm.user_id = ?
-        ORDER BY rm.joined_at DESC
-    ''', (user_id,)).fetchall()
-    
-    conn.close()
-    
-    return render_template('dashboard.html', 
-                         skills_offered=skills_offered,
-                         skills_wanted=skills_wanted,
-                         pending_requests=pending_requests,
-                         sent_requests=sent_requests,
-                         user_rooms=user_rooms)
-
-@app.route('/profile')
-def profile():
-    """User profile"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    user_id = session['user_id']
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-
-    # Swaps completed (as requester or provider)
-    swaps_completed = conn.execute('''
-        SELECT COUNT(*) as count FROM swap_requests
-        WHERE (requester_id = ? OR provider_id = ?) AND status = 'accepted'
-    ''', (user_id, user_id)).fetchone()['count']
-
-    # Most requested skills (skills offered by user, most requested by others)
-    most_requested_skills = conn.execute('''
-        SELECT so.skill_name, COUNT(sr.id) as request_count
-        FROM skills_offered so
-        LEFT JOIN swap_requests sr ON sr.offered_skill_id = so.id
-        WHERE so.user_id = ?
-        GROUP BY so.skill_name
-        ORDER BY request_count DESC
-        LIMIT 3
-    ''', (user_id,)).fetchall()
-
-    # Average feedback score (ratings received)
-    avg_feedback = conn.execute('''
-        SELECT AVG(rating) as avg FROM ratings WHERE rated_id = ?
-    ''', (user_id,)).fetchone()['avg']
-
-    # Busiest day/time (hour with most swaps completed)
-    busiest = conn.execute('''
-        SELECT strftime('%w', updated_at) as day, strftime('%H', updated_at) as hour, COUNT(*) as cnt
-        FROM swap_requests
-        WHERE (requester_id = ? OR provider_id = ?) AND status = 'accepted'
-        GROUP BY day, hour
-        ORDER BY cnt DESC
-        LIMIT 1
-    ''', (user_id, user_id)).fetchone()
-    busiest_day = None
-    busiest_hour = None
-    if busiest:
-        days = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-        busiest_day = days[int(busiest['day'])]
-        busiest_hour = f"{int(busiest['hour']):02d}:00"
-
-    conn.close()
-    
-    return render_template('profile.html', user=user,
-        swaps_completed=swaps_completed,
-        most_requested_skills=most_requested_skills,
-        avg_feedback=avg_feedback,
-        busiest_day=busiest_day,
-        busiest_hour=busiest_hour
-    )
-
-@app.route('/edit_profile', methods=['GET', 'POST'])
-def edit_profile():
-    """Edit user profile"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    user_id = session['user_id']
-    
-    if request.method == 'POST':
-        name = request.form['name']
-        location = request.form.get('location', '')
-        availability = request.form.get('availability', '')
-        is_public = 1 if request.form.get('is_public') else 0
-        
-        # Handle profile photo upload
-        profile_photo = None
-        if 'profile_photo' in request.files:
-            file = request.files['profile_photo']
-            if file and file.filename:
-                filename = secure_filename(f"{user_id}_{file.filename}")
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                profile_photo = filename
-        
-        # Update user profile
-        if profile_photo:
-            conn.execute('''
-                UPDATE users SET name = ?, location = ?, availability = ?, 
-                is_public = ?, profile_photo = ? WHERE id = ?
-            ''', (name, location, availability, is_public, profile_photo, user_id))
-        else:
-            conn.execute('''
-                UPDATE users SET name = ?, location = ?, availability = ?, 
-                is_public = ? WHERE id = ?
-            ''', (name, location, availability, is_public, user_id))
-        
-        conn.commit()
-        conn.close()
-        
-        flash('Profile updated successfully!')
-        return redirect(url_for('profile'))
-    
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-    conn.close()
-    
-    return render_template('edit_profile.html', user=user)
-
-@app.route('/add_skill_offered', methods=['POST'])
-def add_skill_offered():
-    """Add a skill offered"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    skill_name = request.form['skill_name']
-    description = request.form.get('description', '')
-    
-    conn = get_db_connection()
-    conn.execute('''
-        INSERT INTO skills_offered (user_id, skill_name, description)
-        VALUES (?, ?, ?)
-    ''', (session['user_id'], skill_name, description))
-    conn.commit()
-    conn.close()
-    
-    flash('Skill added successfully!')
-    return redirect(url_for('dashboard'))
-
-@app.route('/add_skill_wanted', methods=['POST'])
-def add_skill_wanted():
-    """Add a skill wanted"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    skill_name = request.form['skill_name']
-    description = request.form.get('description', '')
-    
-    conn = get_db_connection()
-    conn.execute('''
-        INSERT INTO skills_wanted (user_id, skill_name, description)
-        VALUES (?, ?, ?)
-    ''', (session['user_id'], skill_name, description))
-    conn.commit()
-    conn.close()
-    
-    flash('Skill wanted added successfully!')
-    return redirect(url_for('dashboard'))
-
-@app.route('/browse_skills')
-def browse_skills():
-    """Browse available skills"""
-    search = request.args.get('search', '')
-    
-    conn = get_db_connection()
-    
-    if search:
-        skills = conn.execute('''
-            SELECT so.*, u.name, u.location, u.profile_photo
-            FROM skills_offered so
-            JOIN users u ON so.user_id = u.id
-            WHERE u.is_public = 1 AND u.is_banned = 0 AND so.is_approved = 1
-            AND (so.skill_name LIKE ? OR so.description LIKE ?)
-            ORDER BY so.created_at DESC
-        ''', (f'%{search}%', f'%{search}%')).fetchall()
-    else:
-        skills = conn.execute('''
-            SELECT so.*, u.name, u.location, u.profile_photo
-            FROM skills_offered so
-            JOIN users u ON so.user_id = u.id
-            WHERE u.is_public = 1 AND u.is_banned = 0 AND so.is_approved = 1
-            ORDER BY so.created_at DESC
-        ''').fetchall()
-    
-    conn.close()
-    
-    return render_template('browse_skills.html', skills=skills, search=search)
-
-@app.route('/request_swap/<int:skill_id>')
-def request_swap(skill_id):
-    """Request a skill swap"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    skill = conn.execute('''
-        SELECT so.*, u.name, u.location
-        FROM skills_offered so
-        JOIN users u ON so.user_id = u.id
-        WHERE so.id = ?
-    ''', (skill_id,)).fetchone()
-    
-    # Get user's skills wanted
-    my_skills_wanted = conn.execute('''
-        SELECT * FROM skills_wanted WHERE user_id = ?
-    ''', (session['user_id'],)).fetchall()
-    
-    conn.close()
-    
-    return render_template('request_swap.html', skill=skill, my_skills_wanted=my_skills_wanted)
-
-@app.route('/send_swap_request', methods=['POST'])
-def send_swap_request():
-    """Send a swap request"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    offered_skill_id = request.form['offered_skill_id']
-    wanted_skill = request.form['wanted_skill']
-    message = request.form.get('message', '')
-    
-    conn = get_db_connection()
-    
-    # Get provider ID from skill
-    skill = conn.execute('SELECT user_id FROM skills_offered WHERE id = ?', (offered_skill_id,)).fetchone()
-    
-    if skill and skill['user_id'] != session['user_id']:
-        conn.execute('''
-            INSERT INTO swap_requests (requester_id, provider_id, offered_skill_id, wanted_skill, message)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (session['user_id'], skill['user_id'], offered_skill_id, wanted_skill, message))
-        conn.commit()
-        flash('Swap request sent successfully!')
-    else:
-        flash('Cannot send swap request!')
-    
-    conn.close()
-    return redirect(url_for('browse_skills'))
-
-@app.route('/handle_swap_request/<int:request_id>/<action>')
-def handle_swap_request(request_id, action):
-    """Accept or reject a swap request"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    if action not in ['accept', 'reject']:
-        flash('Invalid action!')
-        return redirect(url_for('dashboard'))
-    
-    conn = get_db_connection()
-    
-    # Verify the request belongs to current user
-    swap_request = conn.execute('''
-        SELECT * FROM swap_requests WHERE id = ? AND provider_id = ?
-    ''', (request_id, session['user_id'])).fetchone()
-    
-    if swap_request:
-        status = 'accepted' if action == 'accept' else 'rejected'
-        conn.execute('''
-            UPDATE swap_requests SET status = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (status, request_id))
-        conn.commit()
-        flash(f'Swap request {status}!')
-    else:
-        flash('Request not found!')
-    
-    conn.close()
-    return redirect(url_for('dashboard'))
-
-@app.route('/delete_swap_request/<int:request_id>')
-def delete_swap_request(request_id):
-    """Delete a swap request (only if pending)"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    
-    # Verify the request belongs to current user and is pending
-    swap_request = conn.execute('''
-        SELECT * FROM swap_requests WHERE id = ? AND requester_id = ? AND status = 'pending'
-    ''', (request_id, session['user_id'])).fetchone()
-    
-    if swap_request:
-        conn.execute('DELETE FROM swap_requests WHERE id = ?', (request_id,))
-        conn.commit()
-        flash('Swap request deleted!')
-    else:
-        flash('Cannot delete this request!')
-    
-    conn.close()
-    return redirect(url_for('dashboard'))
-
-@app.route('/rate_user/<int:swap_id>')
-def rate_user(swap_id):
-    """Rate a user after swap"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    
-    # Get swap details
-    swap = conn.execute('''
-        SELECT sr.*, u1.name as requester_name, u2.name as provider_name
-        FROM swap_requests sr
-        JOIN users u1 ON sr.requester_id = u1.id
-        JOIN users u2 ON sr.provider_id = u2.id
-        WHERE sr.id = ? AND sr.status = 'accepted'
-        AND (sr.requester_id = ? OR sr.provider_id = ?)
-    ''', (swap_id, session['user_id'], session['user_id'])).fetchone()
-    
-    if not swap:
-        flash('Swap not found or not authorized!')
-        conn.close()
-        return redirect(url_for('dashboard'))
-    
-    # Check if already rated
-    existing_rating = conn.execute('''
-        SELECT * FROM ratings WHERE swap_request_id = ? AND rater_id = ?
-    ''', (swap_id, session['user_id'])).fetchone()
-    
-    conn.close()
-    
-    if existing_rating:
-        flash('You have already rated this swap!')
-        return redirect(url_for('dashboard'))
-    
-    return render_template('rate_user.html', swap=swap)
-
-@app.route('/submit_rating', methods=['POST'])
-def submit_rating():
-    """Submit a rating"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    swap_id = request.form['swap_id']
-    rating = request.form['rating']
-    feedback = request.form.get('feedback', '')
-    
-    conn = get_db_connection()
-    
-    # Get swap details to determine who to rate
-    swap = conn.execute('''
-        SELECT * FROM swap_requests WHERE id = ? AND status = 'accepted'
-        AND (requester_id = ? OR provider_id = ?)
-    ''', (swap_id, session['user_id'], session['user_id'])).fetchone()
-    
-    if swap:
-        # Determine who to rate (the other person in the swap)
-        rated_id = swap['provider_id'] if swap['requester_id'] == session['user_id'] else swap['requester_id']
-        
-        conn.execute('''
-            INSERT INTO ratings (swap_request_id, rater_id, rated_id, rating, feedback)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (swap_id, session['user_id'], rated_id, rating, feedback))
-        conn.commit()
-        flash('Rating submitted successfully!')
-    else:
-        flash('Invalid swap request!')
-    
-    conn.close()
-    return redirect(url_for('dashboard'))
-
-# Admin routes
-@app.route('/admin')
-def admin_dashboard():
-    """Admin dashboard"""
-    if 'user_id' not in session or not session.get('is_admin'):
-        flash('Access denied!')
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    
-    # Get statistics
-    stats = {
-        'total_users': conn.execute('SELECT COUNT(*) as count FROM users WHERE is_admin = 0').fetchone()['count'],
-        'total_skills': conn.execute('SELECT COUNT(*) as count FROM skills_offered').fetchone()['count'],
-        'pending_swaps': conn.execute('SELECT COUNT(*) as count FROM swap_requests WHERE status = "pending"').fetchone()['count'],
-        'completed_swaps': conn.execute('SELECT COUNT(*) as count FROM swap_requests WHERE status = "accepted"').fetchone()['count']
-    }
-    
-    # Get unapproved skills
-    unapproved_skills = conn.execute('''
-        SELECT so.*, u.name, u.username
-        FROM skills_offered so
-        JOIN users u ON so.user_id = u.id
-        WHERE so.is_approved = 0
-        ORDER BY so.created_at DESC
-    ''').fetchall()
-    
-    # Get recent swap requests
-    recent_swaps = conn.execute('''
-        SELECT sr.*, u1.name as requester_name, u2.name as provider_name, so.skill_name
-        FROM swap_requests sr
-        JOIN users u1 ON sr.requester_id = u1.id
-        JOIN users u2 ON sr.provider_id = u2.id
-        JOIN skills_offered so ON sr.offered_skill_id = so.id
-        ORDER BY sr.created_at DESC
-        LIMIT 10
-    ''').fetchall()
-    
-    conn.close()
-    
-    return render_template('admin_dashboard.html', stats=stats, 
-                         unapproved_skills=unapproved_skills, recent_swaps=recent_swaps)
-
-@app.route('/admin/users')
-def admin_users():
-    """Admin user management"""
-    if 'user_id' not in session or not session.get('is_admin'):
-        flash('Access denied!')
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    users = conn.execute('''
-        SELECT u.*, 
-               (SELECT AVG(rating) FROM ratings WHERE rated_id = u.id) as avg_rating,
-               (SELECT COUNT(*) FROM ratings WHERE rated_id = u.id) as rating_count
-        FROM users u 
-        WHERE u.is_admin = 0
-        ORDER BY u.created_at DESC
-    ''').fetchall()
-    conn.close()
-    
-    return render_template('admin_users.html', users=users)
-
-@app.route('/admin/ban_user/<int:user_id>')
-def admin_ban_user(user_id):
-    """Ban/unban a user"""
-    if 'user_id' not in session or not session.get('is_admin'):
-        flash('Access denied!')
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-    
-    if user and not user['is_admin']:
-        new_status = 0 if user['is_banned'] else 1
-        conn.execute('UPDATE users SET is_banned = ? WHERE id = ?', (new_status, user_id))
-        conn.commit()
-        action = 'banned' if new_status else 'unbanned'
-        flash(f'User {action} successfully!')
-    else:
-        flash('Cannot ban this user!')
-    
-    conn.close()
-    return redirect(url_for('admin_users'))
-
-@app.route('/admin/approve_skill/<int:skill_id>')
-def admin_approve_skill(skill_id):
-    """Approve/reject a skill"""
-    if 'user_id' not in session or not session.get('is_admin'):
-        flash('Access denied!')
-        return redirect(url_for('login'))
-    
-    action = request.args.get('action', 'approve')
-    
-    conn = get_db_connection()
-    
-    if action == 'approve':
-        conn.execute('UPDATE skills_offered SET is_approved = 1 WHERE id = ?', (skill_id,))
-        flash('Skill approved!')
-    elif action == 'reject':
-        conn.execute('DELETE FROM skills_offered WHERE id = ?', (skill_id,))
-        flash('Skill rejected and removed!')
-    
-    conn.commit()
-    conn.close()
-    
-    return redirect(url_for('admin_dashboard'))
-
-@app.route('/admin/messages')
-def admin_messages():
-    """Admin platform messages"""
-    if 'user_id' not in session or not session.get('is_admin'):
-        flash('Access denied!')
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    messages = conn.execute('''
-        SELECT pm.*, u.name
-        FROM platform_messages pm
-        JOIN users u ON pm.admin_id = u.id
-        ORDER BY pm.created_at DESC
-    ''').fetchall()
-    conn.close()
-    
-    return render_template('admin_messages.html', messages=messages)
-
-@app.route('/admin/send_message', methods=['POST'])
-def admin_send_message():
-    """Send platform-wide message"""
-    if 'user_id' not in session or not session.get('is_admin'):
-        flash('Access denied!')
-        return redirect(url_for('login'))
-    
-    title = request.form['title']
-    message = request.form['message']
-    
-    conn = get_db_connection()
-    conn.execute('''
-        INSERT INTO platform_messages (admin_id, title, message)
-        VALUES (?, ?, ?)
-    ''', (session['user_id'], title, message))
-    conn.commit()
-    conn.close()
-    
-    flash('Message sent successfully!')
-    return redirect(url_for('admin_messages'))
-
-@app.route('/admin/delete_message/<int:message_id>')
-def admin_delete_message(message_id):
-    """Delete platform message"""
-    if 'user_id' not in session or not session.get('is_admin'):
-        flash('Access denied!')
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    conn.execute('DELETE FROM platform_messages WHERE id = ?', (message_id,))
-    conn.commit()
-    conn.close()
-    
-    flash('Message deleted successfully!')
-    return redirect(url_for('admin_messages'))
-
-@app.route('/admin/reports')
-def admin_reports():
-    """Admin reports"""
-    if 'user_id' not in session or not session.get('is_admin'):
-        flash('Access denied!')
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    
-    # User activity report
-    user_activity = conn.execute('''
-        SELECT u.name, u.username, u.created_at,
-               (SELECT COUNT(*) FROM skills_offered WHERE user_id = u.id) as skills_offered,
-               (SELECT COUNT(*) FROM skills_wanted WHERE user_id = u.id) as skills_wanted,
-               (SELECT COUNT(*) FROM swap_requests WHERE requester_id = u.id OR provider_id = u.id) as total_swaps,
-               (SELECT AVG(rating) FROM ratings WHERE rated_id = u.id) as avg_rating
-        FROM users u
-        WHERE u.is_admin = 0
-        ORDER BY u.created_at DESC
-    ''').fetchall()
-    
-    # Swap statistics
-    swap_stats = conn.execute('''
-        SELECT 
-            COUNT(*) as total_requests,
-            SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending,
-            SUM(CASE WHEN status = 'accepted' THEN 1 ELSE 0 END) as accepted,
-            SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END) as rejected
-        FROM swap_requests
-    ''').fetchone()
-    
-    # Top skills
-    top_skills = conn.execute('''
-        SELECT skill_name, COUNT(*) as count
-        FROM skills_offered
-        WHERE is_approved = 1
-        GROUP BY skill_name
-        ORDER BY count DESC
-        LIMIT 10
-    ''').fetchall()
-    
-    conn.close()
-    
-    return render_template('admin_reports.html', 
-                         user_activity=user_activity,
-                         swap_stats=swap_stats,
-                         top_skills=top_skills)
-
-# Room and messaging routes
-@app.route('/rooms')
-def rooms():
-    """List all public rooms"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    
-    # Get all public rooms
-    public_rooms = conn.execute('''
-        SELECT r.*, u.name as creator_name,
-               (SELECT COUNT(*) FROM room_members WHERE room_id = r.id) as member_count,
-               (SELECT COUNT(*) FROM room_members WHERE room_id = r.id AND user_id = ?) as is_member
-        FROM rooms r
-        JOIN users u ON r.creator_id = u.id
-        WHERE r.is_public = 1
-        ORDER BY r.created_at DESC
-    ''', (session['user_id'],)).fetchall()
-    
-    conn.close()
-    
-    return render_template('rooms.html', public_rooms=public_rooms)
-
-@app.route('/create_room', methods=['POST'])
-def create_room():
-    """Create a new room"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    name = request.form['name']
-    description = request.form.get('description', '')
-    is_public = 1 if request.form.get('is_public') else 0
-    
-    # Generate unique room code
-    room_code = secrets.token_urlsafe(8).upper()
-    
-    conn = get_db_connection()
-    
-    # Ensure room code is unique
-    while True:
-        cursor = conn.cursor()
-        cursor.execute('SELECT id FROM rooms WHERE room_code = ?', (room_code,))
-        if not cursor.fetchone():
-            break
-        room_code = secrets.token_urlsafe(8).upper()
-    
-    # Create room
-    cursor.execute('''
-        INSERT INTO rooms (name, description, creator_id, is_public, room_code)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (name, description, session['user_id'], is_public, room_code))
-    
-    room_id = cursor.lastrowid
-    
-    # Add creator as member
-    conn.execute('''
-        INSERT INTO room_members (room_id, user_id)
-        VALUES (?, ?)
-    ''', (room_id, session['user_id']))
-    
-    conn.commit()
-    conn.close()
-    
-    flash(f'Room created successfully! Room code: {room_code}')
-    return redirect(url_for('room_detail', room_id=room_id))
-
-@app.route('/room/<int:room_id>')
-def room_detail(room_id):
-    """Room detail and chat"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    
-    # Get room details
-    room = conn.execute('''
-        SELECT r.*, u.name as creator_name,
-               (SELECT COUNT(*) FROM room_members WHERE room_id = r.id) as member_count
-        FROM rooms r
-        JOIN users u ON r.creator_id = u.id
-        WHERE r.id = ?
-    ''', (room_id,)).fetchone()
-    
-    if not room:
-        flash('Room not found!')
-        conn.close()
-        return redirect(url_for('rooms'))
-    
-    # Check if user is member
-    is_member = conn.execute('''
-        SELECT id FROM room_members WHERE room_id = ? AND user_id = ?
-    ''', (room_id, session['user_id'])).fetchone()
-    
-    if not is_member and not room['is_public']:
-        flash('Access denied to this private room!')
-        conn.close()
-        return redirect(url_for('rooms'))
-    
-    # Get room messages
-    messages = conn.execute('''
-        SELECT rm.*, u.name, u.profile_photo
-        FROM room_messages rm
-        JOIN users u ON rm.user_id = u.id
-        WHERE rm.room_id = ?
-        ORDER BY rm.created_at ASC
-    ''', (room_id,)).fetchall()
-    
-    # Get room members
-    members = conn.execute('''
-        SELECT u.id, u.name, u.username, u.profile_photo, rm.joined_at,
-               (SELECT AVG(rating) FROM ratings WHERE rated_id = u.id) as rating
-        FROM room_members rm
-        JOIN users u ON rm.user_id = u.id
-        WHERE rm.room_id = ?
-        ORDER BY rm.joined_at ASC
-    ''', (room_id,)).fetchall()
-    
-    conn.close()
-    
-    return render_template('room_detail.html', room=room, messages=messages, 
-                         members=members, is_member=is_member)
-
-@app.route('/join_room/<int:room_id>')
-def join_room(room_id):
-    """Join a room"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    
-    # Check if room exists and is public
-    room = conn.execute('SELECT * FROM rooms WHERE id = ? AND is_public = 1', (room_id,)).fetchone()
-    
-    if not room:
-        flash('Room not found or is private!')
-        conn.close()
-        return redirect(url_for('rooms'))
-    
-    # Check if already member
-    existing = conn.execute('''
-        SELECT id FROM room_members WHERE room_id = ? AND user_id = ?
-    ''', (room_id, session['user_id'])).fetchone()
-    
-    if existing:
-        flash('You are already a member of this room!')
-    else:
-        conn.execute('''
-            INSERT INTO room_members (room_id, user_id)
-            VALUES (?, ?)
-        ''', (room_id, session['user_id']))
-        conn.commit()
-        flash('Successfully joined the room!')
-    
-    conn.close()
-    return redirect(url_for('room_detail', room_id=room_id))
-
-@app.route('/join_room_by_code', methods=['POST'])
-def join_room_by_code():
-    """Join a room using room code"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    room_code = request.form['room_code'].upper().strip()
-    
-    conn = get_db_connection()
-    
-    # Find room by code
-    room = conn.execute('''
-        SELECT r.*, u.username as creator_name
-        FROM rooms r
-        JOIN users u ON r.creator_id = u.id
-        WHERE r.room_code = ?
-    ''', (room_code,)).fetchone()
-    
-    if not room:
-        flash('Invalid room code. Please check and try again.', 'error')
-        return redirect(url_for('rooms'))
-    
-    # Check if user is already a member
-    existing_member = conn.execute('''
-        SELECT id FROM room_members 
-        WHERE room_id = ? AND user_id = ?
-    ''', (room['id'], session['user_id'])).fetchone()
-    
-    if existing_member:
-        flash('You are already a member of this room!')
-        return redirect(url_for('room_detail', room_id=room['id']))
-    
-    # Add user to room
-    conn.execute('''
-        INSERT INTO room_members (room_id, user_id)
-        VALUES (?, ?)
-    ''', (room['id'], session['user_id']))
-    
-    conn.commit()
-    conn.close()
-    
-    flash(f'Successfully joined "{room["name"]}"!')
-    return redirect(url_for('room_detail', room_id=room['id']))
-
-@app.route('/invite_user_to_room', methods=['POST'])
-def invite_user_to_room():
-    """Invite a user to room (room creator only)"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    room_id = request.form['room_id']
-    username = request.form['username'].strip()
-    
-    conn = get_db_connection()
-    
-    # Check if current user is room creator
-    room = conn.execute('''
-        SELECT creator_id FROM rooms WHERE id = ?
-    ''', (room_id,)).fetchone()
-    
-    if not room or room['creator_id'] != session['user_id']:
-        flash('Only room creators can invite users.', 'error')
-        return redirect(url_for('room_detail', room_id=room_id))
-    
-    # Find user to invite
-    user_to_invite = conn.execute('''
-        SELECT id, username FROM users WHERE username = ? AND is_banned = 0
-    ''', (username,)).fetchone()
-    
-    if not user_to_invite:
-        flash('User not found or is banned.', 'error')
-        return redirect(url_for('room_detail', room_id=room_id))
-    
-    # Check if user is already a member
-    existing_member = conn.execute('''
-        SELECT id FROM room_members 
-        WHERE room_id = ? AND user_id = ?
-    ''', (room_id, user_to_invite['id'])).fetchone()
-    
-    if existing_member:
-        flash(f'{username} is already a member of this room.', 'info')
-        return redirect(url_for('room_detail', room_id=room_id))
-    
-    # Add user to room
-    conn.execute('''
-        INSERT INTO room_members (room_id, user_id)
-        VALUES (?, ?)
-    ''', (room_id, user_to_invite['id']))
-    
-    conn.commit()
-    conn.close()
-    
-    flash(f'{username} has been added to the room!')
-    return redirect(url_for('room_detail', room_id=room_id))
-
-@app.route('/send_message', methods=['POST'])
-def send_message():
-    """Send a message to a room"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    room_id = request.form['room_id']
-    message = request.form['message']
-    
-    conn = get_db_connection()
-    
-    # Check if user is member
-    is_member = conn.execute('''
-        SELECT id FROM room_members WHERE room_id = ? AND user_id = ?
-    ''', (room_id, session['user_id'])).fetchone()
-    
-    if is_member:
-        conn.execute('''
-            INSERT INTO room_messages (room_id, user_id, message)
-            VALUES (?, ?, ?)
-        ''', (room_id, session['user_id'], message))
-        conn.commit()
-    
-    conn.close()
-    return redirect(url_for('room_detail', room_id=room_id))
-
-@app.route('/leave_room/<int:room_id>')
-def leave_room(room_id):
-    """Leave a room"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    
-    # Check if room exists
-    room = conn.execute('SELECT * FROM rooms WHERE id = ?', (room_id,)).fetchone()
-    
-    if not room:
-        flash('Room not found!')
-        conn.close()
-        return redirect(url_for('rooms'))
-    
-    # Check if user is the creator
-    if room['creator_id'] == session['user_id']:
-        flash('Room creators cannot leave their own rooms!')
-        conn.close()
-        return redirect(url_for('room_detail', room_id=room_id))
-    
-    # Check if user is member
-    is_member = conn.execute('''
-        SELECT id FROM room_members WHERE room_id = ? AND user_id = ?
-    ''', (room_id, session['user_id'])).fetchone()
-    
-    if not is_member:
-        flash('You are not a member of this room!')
-    else:
-        # Remove user from room
-        conn.execute('''
-            DELETE FROM room_members WHERE room_id = ? AND user_id = ?
-        ''', (room_id, session['user_id']))
-        conn.commit()
-        flash('Successfully left the room!')
-    
-    conn.close()
-    return redirect(url_for('rooms'))
-
-@app.route('/delete_room/<int:room_id>', methods=['POST'])
-def delete_room(room_id):
-    """Delete a room (creator only)"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    
-    # Check if room exists and user is the creator
-    room = conn.execute('''
-        SELECT creator_id, name FROM rooms WHERE id = ?
-    ''', (room_id,)).fetchone()
-    
-    if not room:
-        flash('Room not found!')
-        conn.close()
-        return redirect(url_for('rooms'))
-    
-    if room['creator_id'] != session['user_id']:
-        flash('Only room creators can delete their rooms!')
-        conn.close()
-        return redirect(url_for('room_detail', room_id=room_id))
-    
-    # Delete all related data in the correct order (due to foreign key constraints)
-    # Delete room messages first
-    conn.execute('DELETE FROM room_messages WHERE room_id = ?', (room_id,))
-    
-    # Delete room members
-    conn.execute('DELETE FROM room_members WHERE room_id = ?', (room_id,))
-    
-    # Finally delete the room itself
-    conn.execute('DELETE FROM rooms WHERE id = ?', (room_id,))
-    
-    conn.commit()
-    conn.close()
-    
-    flash(f'Room "{room["name"]}" has been deleted successfully!')
-    return redirect(url_for('rooms'))
-
-if __name__ == '__main__':
-    init_db()
-    app.run(debug=True)
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, session, jsonify, g, send_from_directory
+from werkzeug.security import generate_password_hash
+import os
+import secrets
+import random
+from db import init_app as init_db_pool, connect, get_db, get_pool, get_write_queue, per_worker
+from migrations import migrate
+from chat_hub import get_hub, stream_room
+from search import has_index, search_skills, search_skills_like
+from matching import MATCHES_PER_USER, normalize_skill, queue_skill_change, get_match_queue, get_matches, find_cycles
+from pagination import page_size
+from user_stats import bump, get_stats
+from cache import CachedValue, SamplePool
+from counters import bump_counters, swap_moved, skill_approved, get_counters, top_skills, get_reconciler
+from exports import FORMATS, REPORTS, build_query, count_rows, stream_export
+from auth import AuthBusy, get_auth
+from throttle import get_login_throttle
+from sessions import init_app as init_sessions, get_principals, revoke_sessions
+from assets import init_app as init_assets
+from blobs import is_immutable
+from images import UploadBusy, UploadRejected, avatar_url, get_image_pipeline, save_upload
+from page_cache import conditional, get_page_cache
+from metrics import init_app as init_metrics, get_metrics
+from repository import ROOM_ORDERS, Repository, as_dict, get_repo
+from dashboard import get_dashboards
+
+app = Flask(__name__)
+app.secret_key = 'your-secret-key-change-this'
+app.config['UPLOAD_FOLDER'] = 'static/uploads'
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['DATABASE'] = 'skillswap.db'
+app.config['DB_POOL_SIZE'] = 8  # connections per worker process
+app.config['DB_POOL_TIMEOUT'] = 5.0  # seconds to wait for a free connection
+app.config['DB_STATEMENT_CACHE'] = 512  # prepared statements kept per pooled connection (sqlite3's default is 128)
+app.config['DB_WRITE_QUEUE'] = False  # True routes chat posts through the group-commit writer
+app.config['CHAT_PAGE_SIZE'] = 50  # messages per chat page / incremental fetch
+app.config['CHAT_HUB_BACKEND'] = 'local'  # 'sqlite' shares chat events between worker processes
+app.config['CHAT_HUB_QUEUE_SIZE'] = 100  # events buffered per stream before it is dropped
+app.config['CHAT_HUB_POLL_INTERVAL'] = 0.5  # seconds between hub_events polls ('sqlite' backend)
+app.config['CHAT_HEARTBEAT'] = 15  # seconds between keep-alive comments on idle streams
+app.config['CHAT_REPLAY_LIMIT'] = 500  # most missed messages replayed on reconnect
+app.config['SEARCH_RESULT_LIMIT'] = 100  # best-ranked skills returned by a search
+app.config['PAGE_SIZE'] = 50  # rows per page on listing pages
+app.config['MAX_PAGE_SIZE'] = 200  # cap on ?limit= for listing pages
+app.config['FEATURED_SKILLS'] = 6  # skills drawn for the home page
+app.config['FEATURED_POOL_TTL'] = 300  # seconds before the featured-skill pool is reloaded
+app.config['HOME_MESSAGES_TTL'] = 60  # seconds the home page's platform messages are cached
+app.config['COUNTERS_RECONCILE_INTERVAL'] = 3600  # seconds between platform counter reconciliations
+app.config['EXPORT_BATCH_SIZE'] = 1000  # rows fetched per batch when streaming report exports
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'  # weaker stored hashes are upgraded at login
+app.config['AUTH_HASH_WORKERS'] = 2  # hashing processes per worker; 0 hashes on the request thread
+app.config['AUTH_MAX_PENDING'] = 32  # hash jobs queued or running before logins get a 429
+app.config['AUTH_HASH_TIMEOUT'] = 10.0  # seconds to wait for a hash job
+app.config['LOGIN_USER_LIMIT'] = (5, 300)  # login attempts per username: burst, seconds to refill it
+app.config['LOGIN_IP_LIMIT'] = (30, 60)  # login attempts per client IP: burst, seconds to refill it
+app.config['LOGIN_THROTTLE_BACKEND'] = 'local'  # 'sqlite' shares login buckets between worker processes
+app.config['LOGIN_THROTTLE_MAX_KEYS'] = 1000000  # login buckets per worker ('local'), 16 bytes each
+app.config['SESSION_BACKEND'] = 'cookie'  # 'sqlite' keeps sessions server-side so bans sign users out at once
+app.config['PRINCIPAL_CACHE_TTL'] = 30  # seconds a worker trusts its cached copy of a signed-in user
+app.config['PRINCIPAL_CACHE_SIZE'] = 10000  # signed-in users cached per worker
+app.config['MATCH_QUEUE_BATCH'] = 100  # queued skill changes applied per round by the match updater
+app.config['MATCH_QUEUE_INTERVAL'] = 5.0  # seconds between checks for changes queued by other workers
+app.config['DASHBOARD_CACHE_TTL'] = 30  # seconds a cached dashboard is kept even while its version is unchanged
+app.config['DASHBOARD_CACHE_SIZE'] = 10000  # dashboards cached per worker
+app.config['DASHBOARD_LIST_LIMIT'] = 50  # newest pending and sent swap requests listed on the dashboard
+app.config['UPLOAD_CHUNK_SIZE'] = 64 * 1024  # bytes copied at a time when saving an upload
+app.config['IMAGE_WORKERS'] = 1  # thumbnail threads per worker process
+app.config['IMAGE_QUEUE_SIZE'] = 100  # uploads waiting for thumbnails before new ones are refused
+app.config['MEDIA_MAX_AGE'] = 365 * 24 * 3600  # seconds browsers keep content-hashed uploads
+app.config['ASSETS_FINGERPRINT'] = True  # serve minified, hashed, precompressed CSS/JS from static/dist
+app.config['ASSETS_MAX_AGE'] = 365 * 24 * 3600  # seconds browsers keep fingerprinted assets
+app.config['PAGE_CACHE'] = True  # ETags, 304s and cached bodies for the read-heavy pages
+app.config['PAGE_CACHE_SIZE'] = 1000  # rendered pages kept per worker
+app.config['METRICS'] = True  # per-endpoint latency histograms and SQL statement timings
+app.config['METRICS_SQL_SAMPLE_RATE'] = 1.0  # fraction of requests whose SQL statements are timed
+app.config['METRICS_SLOW_QUERY_MS'] = 25  # statements at least this slow are kept as samples
+app.config['METRICS_SLOW_SAMPLES'] = 100  # slow statement samples kept per worker
+app.config['METRICS_TOKEN'] = None  # bearer token that lets a scraper read /metrics without signing in
+
+init_db_pool(app)
+init_metrics(app)
+init_sessions(app)
+init_assets(app)
+app.add_template_global(avatar_url)
+
+# Ensure upload directory exists
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+def init_db():
+    """Bring the database schema up to date and seed the admin account"""
+    conn = connect(app.config['DATABASE'], app.config['SQLITE_PRAGMAS'])
+    migrate(conn)
+    cursor = conn.cursor()
+    
+    # Create default admin user if not exists
+    cursor.execute('SELECT * FROM users WHERE username = ?', ('admin',))
+    if not cursor.fetchone():
+        admin_password = generate_password_hash('admin123', method=app.config['PASSWORD_HASH_METHOD'])
+        cursor.execute('''
+            INSERT INTO users (username, email, password_hash, name, is_admin)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ('admin', 'admin@skillswap.com', admin_password, 'Administrator', 1))
+    
+    conn.commit()
+    conn.close()
+
+def save_password_hash(user_id, old_hash, new_hash):
+    """Store an upgraded password hash; runs on the hash service's background thread"""
+    conn = connect(app.config['DATABASE'], app.config['SQLITE_PRAGMAS'])
+    try:
+        Repository(conn).users.upgrade_password_hash(user_id, old_hash, new_hash)
+        conn.commit()
+    finally:
+        conn.close()
+
+def featured_pool():
+    """This worker's pool of skill ids eligible to be featured on the home page"""
+    return per_worker(app, 'featured_pool', lambda: SamplePool(app.config['FEATURED_POOL_TTL']))
+
+def recent_messages_cache():
+    """This worker's cache of the platform messages shown on the home page"""
+    return per_worker(app, 'recent_messages', lambda: CachedValue(app.config['HOME_MESSAGES_TTL']))
+
+def wants_json():
+    """True when the client asked for JSON (Accept header or ?format=json)"""
+    return request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json'
+
+def listing_limit():
+    """Page size for the current request: ?limit=, capped at MAX_PAGE_SIZE"""
+    return page_size(request.args.get('limit', type=int),
+                     app.config['PAGE_SIZE'], app.config['MAX_PAGE_SIZE'])
+
+def listing_page(fetch):
+    """One keyset page from ``fetch(cursor, limit)`` for the current request's ?cursor= and ?limit="""
+    return fetch(request.args.get('cursor'), listing_limit())
+
+def next_page_url(next_cursor):
+    """URL of the following page, keeping the rest of the query string"""
+    if next_cursor is None:
+        return None
+    args = request.args.to_dict()
+    args['cursor'] = next_cursor
+    return url_for(request.endpoint, **args)
+
+def page_links(next_cursor):
+    """Next/first page URLs for the pager shown under a listing"""
+    first = None
+    if request.args.get('cursor'):
+        args = request.args.to_dict()
+        del args['cursor']
+        first = url_for(request.endpoint, **args)
+    return {'next': next_page_url(next_cursor), 'first': first}
+
+def listing_json(rows, next_cursor, exclude=()):
+    """JSON body for one page of a listing"""
+    items = [{k: v for k, v in as_dict(row).items() if k not in exclude} for row in rows]
+    return jsonify({'items': items, 'next_cursor': next_cursor, 'next_url': next_page_url(next_cursor)})
+
+@app.before_request
+def load_user():
+    """Set g.user to the signed-in user's principal, or None"""
+    g.user = None
+    user_id = session.get('user_id')
+    if user_id is None or request.endpoint == 'static':
+        return
+    
+    user = get_principals().get(user_id)
+    if user is None or user.is_banned:
+        session.clear()
+        if user:
+            flash('Your account has been banned. Please contact admin.')
+        return
+    g.user = user
+
+@app.route('/')
+@conditional('platform_messages', 'skills_offered', 'users', period=app.config['FEATURED_POOL_TTL'])
+def index():
+    """Home page"""
+    repo = get_repo()
+    
+    # Get recent platform messages (cached; dropped when an admin sends or deletes one)
+    messages = recent_messages_cache().get(lambda: repo.messages.recent_platform(3))
+    
+    # Get some featured skills: a random draw from the cached pool of eligible ids,
+    # seeded by the ETag so the page only changes when its ETag does
+    skill_ids = featured_pool().sample(repo.skills.featurable_ids, app.config['FEATURED_SKILLS'],
+                                       rng=random.Random(g.get('page_etag')))
+    
+    featured_skills = []
+    if skill_ids:
+        # Eligibility is checked again in case a skill or user changed since the pool loaded
+        featured_skills = repo.skills.featured(skill_ids)
+    
+    return render_template('index.html', messages=messages, featured_skills=featured_skills)
+
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    """User registration"""
+    if request.method == 'POST':
+        username = request.form['username']
+        email = request.form['email']
+        password = request.form['password']
+        name = request.form['name']
+        location = request.form.get('location', '')
+        
+        conn = get_db()
+        repo = get_repo()
+        
+        # Check if user already exists
+        if repo.users.exists(username, email):
+            flash('Username or email already exists!')
+            return render_template('register.html')
+        
+        # Create new user
+        try:
+            password_hash = get_auth().hash(password)
+        except AuthBusy:
+            flash('The server is busy. Please try again in a moment.')
+            return render_template('register.html'), 429, {'Retry-After': '1'}
+        repo.users.create(username, email, password_hash, name, location)
+        bump_counters(conn, total_users=1)
+        
+        conn.commit()
+        
+        flash('Registration successful! Please login.')
+        return redirect(url_for('login'))
+    
+    return render_template('register.html')
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    """User login"""
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        
+        # Refuse throttled attempts before spending a password hash on them
+        throttle = get_login_throttle()
+        wait = throttle.check(username, request.remote_addr)
+        if wait:
+            flash('Too many login attempts. Please wait a few minutes and try again.')
+            return render_template('login.html'), 429, {'Retry-After': str(int(wait) + 1)}
+        
+        repo = get_repo()
+        user = repo.users.credentials(username)
+        
+        auth = get_auth()
+        try:
+            # Unknown usernames are checked against a dummy hash so both cases take as long
+            valid = auth.verify(user.password_hash if user else None, password)
+        except AuthBusy:
+            flash('Too many login attempts right now. Please try again in a moment.')
+            return render_template('login.html'), 429, {'Retry-After': '1'}
+        
+        if valid:
+            if user.is_banned:
+                flash('Your account has been banned. Please contact admin.')
+                return render_template('login.html')
+            
+            # Upgrade hashes made under an older, weaker policy, after replying
+            auth.rehash_later(user.password_hash, password,
+                              lambda new_hash: save_password_hash(user.id, user.password_hash, new_hash))
+            
+            throttle.succeeded(username)
+            session.clear()
+            session['user_id'] = user.id
+            get_principals().invalidate(user.id)
+            
+            if user.is_admin:
+                return redirect(url_for('admin_dashboard'))
+            else:
+                return redirect(url_for('dashboard'))
+        else:
+            flash('Invalid username or password!')
+    
+    return render_template('login.html')
+
+@app.route('/logout')
+def logout():
+    """User logout"""
+    session.clear()
+    flash('You have been logged out.')
+    return redirect(url_for('index'))
+
+@app.route('/dashboard')
+def dashboard():
+    """User dashboard"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    # Check if user is admin - redirect to admin dashboard
+    if g.user.is_admin:
+        return redirect(url_for('admin_dashboard'))
+    
+    # Skills, swap requests, rooms and matches come from one query, and are
+    # reused until a write changes this user's dashboard
+    dashboard = get_dashboards().get(get_db(), g.user.id)
+    
+    # The page polls this to refresh its counts and requests in place
+    if wants_json():
+        return jsonify(serialize_dashboard(dashboard))
+    
+    return render_template('dashboard.html', 
+                         dashboard_version=dashboard.version,
+                         skills_offered=dashboard.skills_offered,
+                         skills_wanted=dashboard.skills_wanted,
+                         pending_requests=dashboard.pending_requests,
+                         pending_count=dashboard.pending_count,
+                         sent_requests=dashboard.sent_requests,
+                         sent_count=dashboard.sent_count,
+                         user_rooms=dashboard.user_rooms,
+                         matches=dashboard.matches)
+
+def serialize_dashboard(dashboard):
+    """JSON shape of the dashboard: counts, swap requests, rooms and matches"""
+    return {
+        'version': dashboard.version,
+        'counts': {
+            'skills_offered': len(dashboard.skills_offered),
+            'skills_wanted': len(dashboard.skills_wanted),
+            'pending_requests': dashboard.pending_count,
+            'sent_requests': dashboard.sent_count,
+            'rooms': len(dashboard.user_rooms),
+        },
+        'pending_requests': [dict(as_dict(row),
+                                  accept_url=url_for('handle_swap_request', request_id=row.id, action='accept'),
+                                  reject_url=url_for('handle_swap_request', request_id=row.id, action='reject'))
+                             for row in dashboard.pending_requests],
+        'sent_requests': [as_dict(row) for row in dashboard.sent_requests],
+        'rooms': [dict(as_dict(row), url=url_for('room_detail', room_id=row.id)) for row in dashboard.user_rooms],
+        'matches': [serialize_match(row) for row in dashboard.matches],
+    }
+
+@app.route('/api/matches')
+def api_matches():
+    """Reciprocal skill matches for the logged-in user as JSON"""
+    if not g.user:
+        return jsonify({'error': 'Login required'}), 401
+    
+    user_id = g.user.id
+    limit = min(request.args.get('limit', 20, type=int), MATCHES_PER_USER)
+    
+    conn = get_db()
+    matches = [serialize_match(row) for row in get_matches(conn, user_id, limit=limit)]
+    
+    result = {'matches': matches}
+    if request.args.get('cycles'):
+        # Three-way swaps: you learn from B, B learns from C, C learns from you
+        cycles = find_cycles(conn, user_id)
+        cards = get_repo().users.cards({uid for cycle in cycles for uid in cycle})
+        result['cycles'] = [[{'user_id': uid, 'name': cards[uid].name if uid in cards else None}
+                             for uid in cycle] for cycle in cycles]
+    
+    return jsonify(result)
+
+def serialize_match(row):
+    """JSON shape of a match shared by /api/matches and the dashboard"""
+    match = as_dict(row)
+    return {
+        'user_id': match['other_id'],
+        'name': match['name'],
+        'location': match['location'],
+        'they_offer': match['they_offer'],
+        'they_want': match['they_want'],
+        'score': match['score'],
+        'request_url': url_for('request_swap', skill_id=match['skill_id']),
+    }
+
+@app.route('/profile')
+@conditional('users', 'user_stats', 'skills_offered', 'swap_requests')
+def profile():
+    """User profile"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    repo = get_repo()
+    user_id = g.user.id
+    user = repo.users.get(user_id)
+
+    # Swaps completed and ratings received, kept up to date in user_stats
+    stats = get_stats(repo.conn, user_id)
+    swaps_completed = stats['swaps_completed']
+
+    # Most requested skills (skills offered by user, most requested by others)
+    most_requested_skills = repo.skills.most_requested(user_id, 3)
+
+    # Average feedback score (ratings received)
+    avg_feedback = stats['avg_rating']
+
+    # Busiest day/time (hour with most swaps completed)
+    busiest = repo.swaps.busiest_slot(user_id)
+    busiest_day = None
+    busiest_hour = None
+    if busiest:
+        days = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+        busiest_day = days[int(busiest.day)]
+        busiest_hour = f"{int(busiest.hour):02d}:00"
+
+    return render_template('profile.html', user=user,
+        swaps_completed=swaps_completed,
+        most_requested_skills=most_requested_skills,
+        avg_feedback=avg_feedback,
+        busiest_day=busiest_day,
+        busiest_hour=busiest_hour
+    )
+
+@app.route('/edit_profile', methods=['GET', 'POST'])
+def edit_profile():
+    """Edit user profile"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    repo = get_repo()
+    user_id = g.user.id
+    
+    if request.method == 'POST':
+        name = request.form['name']
+        location = request.form.get('location', '')
+        availability = request.form.get('availability', '')
+        is_public = 1 if request.form.get('is_public') else 0
+        
+        # Save the photo upload; thumbnails are made in the background and
+        # profile_photo is updated once they exist
+        photo_pending = False
+        if 'profile_photo' in request.files:
+            file = request.files['profile_photo']
+            if file and file.filename:
+                try:
+                    path, digest, ext = save_upload(file.stream, app.config['UPLOAD_FOLDER'],
+                                                    app.config['UPLOAD_CHUNK_SIZE'])
+                except UploadRejected as e:
+                    flash(str(e))
+                else:
+                    try:
+                        get_image_pipeline().submit(user_id, path, digest, ext)
+                        photo_pending = True
+                    except UploadBusy:
+                        os.unlink(path)
+                        flash('Photo uploads are busy right now. Please try the photo again in a moment.')
+        
+        # Update user profile
+        repo.users.update_profile(user_id, name, location, availability, is_public)
+        
+        repo.conn.commit()
+        get_principals().invalidate(user_id)
+        
+        if photo_pending:
+            flash('Profile updated successfully! Your new photo will appear in a moment.')
+        else:
+            flash('Profile updated successfully!')
+        return redirect(url_for('profile'))
+    
+    user = repo.users.get(user_id)
+    
+    return render_template('edit_profile.html', user=user)
+
+@app.route('/media/<name>')
+def media(name):
+    """Serve an uploaded photo; content-hashed ones are cached for good"""
+    if not is_immutable(name):
+        # Photos saved under their upload name before content hashing
+        return send_from_directory(app.config['UPLOAD_FOLDER'], name)
+    
+    response = send_from_directory(app.config['UPLOAD_FOLDER'], name, max_age=app.config['MEDIA_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/add_skill_offered', methods=['POST'])
+def add_skill_offered():
+    """Add a skill offered"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    skill_name = request.form['skill_name']
+    description = request.form.get('description', '')
+    
+    skill_key = normalize_skill(skill_name)
+    
+    conn = get_db()
+    get_repo().skills.add_offered(g.user.id, skill_name, skill_key, description)
+    queue_skill_change(conn, g.user.id, skill_key, 'offered')
+    bump(conn, g.user.id, skills_offered=1)
+    bump_counters(conn, total_skills=1)
+    # New skills are approved by default
+    skill_approved(conn, skill_name, 1)
+    conn.commit()
+    get_match_queue().notify()
+    
+    flash('Skill added successfully!')
+    return redirect(url_for('dashboard'))
+
+@app.route('/add_skill_wanted', methods=['POST'])
+def add_skill_wanted():
+    """Add a skill wanted"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    skill_name = request.form['skill_name']
+    description = request.form.get('description', '')
+    
+    skill_key = normalize_skill(skill_name)
+    
+    conn = get_db()
+    get_repo().skills.add_wanted(g.user.id, skill_name, skill_key, description)
+    queue_skill_change(conn, g.user.id, skill_key, 'wanted')
+    bump(conn, g.user.id, skills_wanted=1)
+    conn.commit()
+    get_match_queue().notify()
+    
+    flash('Skill wanted added successfully!')
+    return redirect(url_for('dashboard'))
+
+@app.route('/browse_skills')
+@conditional('skills_offered', 'users')
+def browse_skills():
+    """Browse available skills"""
+    search = request.args.get('search', '')
+    
+    conn = get_db()
+    next_cursor = None
+    
+    if search and has_index(conn):
+        # Ranked full-text search returns only the best matches, so it is not paged
+        skills = search_skills(conn, search, limit=app.config['SEARCH_RESULT_LIMIT'])
+    elif search:
+        # LIKE only where SQLite lacks FTS5
+        skills, next_cursor = search_skills_like(conn, search, request.args.get('cursor'), listing_limit())
+    else:
+        skills, next_cursor = listing_page(get_repo().skills.listing_page)
+    
+    if wants_json():
+        return listing_json(skills, next_cursor, exclude=('skill_name_html', 'snippet_html'))
+    
+    return render_template('browse_skills.html', skills=skills, search=search,
+                           pages=page_links(next_cursor))
+
+@app.route('/request_swap/<int:skill_id>')
+def request_swap(skill_id):
+    """Request a skill swap"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    repo = get_repo()
+    skill = repo.skills.with_owner(skill_id)
+    
+    # Get user's skills wanted
+    my_skills_wanted = repo.skills.wanted_by(g.user.id)
+    
+    return render_template('request_swap.html', skill=skill, my_skills_wanted=my_skills_wanted)
+
+@app.route('/send_swap_request', methods=['POST'])
+def send_swap_request():
+    """Send a swap request"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    offered_skill_id = request.form['offered_skill_id']
+    wanted_skill = request.form['wanted_skill']
+    message = request.form.get('message', '')
+    
+    conn = get_db()
+    repo = get_repo()
+    
+    # Get provider ID from skill
+    provider_id = repo.skills.owner_id(offered_skill_id)
+    
+    if provider_id is not None and provider_id != g.user.id:
+        repo.swaps.create(g.user.id, provider_id, offered_skill_id, wanted_skill, message)
+        swap_moved(conn, None, 'pending')
+        bump(conn, g.user.id, swap_requests=1)
+        bump(conn, provider_id, swap_requests=1)
+        conn.commit()
+        flash('Swap request sent successfully!')
+    else:
+        flash('Cannot send swap request!')
+    
+    return redirect(url_for('browse_skills'))
+
+@app.route('/handle_swap_request/<int:request_id>/<action>')
+def handle_swap_request(request_id, action):
+    """Accept or reject a swap request"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    if action not in ['accept', 'reject']:
+        flash('Invalid action!')
+        return redirect(url_for('dashboard'))
+    
+    conn = get_db()
+    repo = get_repo()
+    
+    # Verify the request belongs to current user
+    swap_request = repo.swaps.received(request_id, g.user.id)
+    
+    if swap_request:
+        status = 'accepted' if action == 'accept' else 'rejected'
+        repo.swaps.set_status(request_id, status)
+        # Only a change into or out of 'accepted' moves the completed count
+        delta = (status == 'accepted') - (swap_request.status == 'accepted')
+        bump(conn, swap_request.requester_id, swaps_completed=delta)
+        bump(conn, swap_request.provider_id, swaps_completed=delta)
+        swap_moved(conn, swap_request.status, status)
+        conn.commit()
+        flash(f'Swap request {status}!')
+    else:
+        flash('Request not found!')
+    
+    return redirect(url_for('dashboard'))
+
+@app.route('/delete_swap_request/<int:request_id>')
+def delete_swap_request(request_id):
+    """Delete a swap request (only if pending)"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    conn = get_db()
+    repo = get_repo()
+    
+    # Verify the request belongs to current user and is pending
+    swap_request = repo.swaps.pending_sent(request_id, g.user.id)
+    
+    if swap_request:
+        repo.swaps.delete(request_id)
+        swap_moved(conn, 'pending', None)
+        bump(conn, swap_request.requester_id, swap_requests=-1)
+        bump(conn, swap_request.provider_id, swap_requests=-1)
+        conn.commit()
+        flash('Swap request deleted!')
+    else:
+        flash('Cannot delete this request!')
+    
+    return redirect(url_for('dashboard'))
+
+@app.route('/rate_user/<int:swap_id>')
+def rate_user(swap_id):
+    """Rate a user after swap"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    repo = get_repo()
+    
+    # Get swap details
+    swap = repo.swaps.accepted_parties(swap_id, g.user.id)
+    
+    if not swap:
+        flash('Swap not found or not authorized!')
+        return redirect(url_for('dashboard'))
+    
+    # Check if already rated
+    if repo.ratings.exists(swap_id, g.user.id):
+        flash('You have already rated this swap!')
+        return redirect(url_for('dashboard'))
+    
+    return render_template('rate_user.html', swap=swap)
+
+@app.route('/submit_rating', methods=['POST'])
+def submit_rating():
+    """Submit a rating"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    swap_id = request.form['swap_id']
+    rating = request.form.get('rating', type=int)
+    feedback = request.form.get('feedback', '')
+    
+    if rating not in range(1, 6):
+        flash('Please choose a rating from 1 to 5!')
+        return redirect(url_for('rate_user', swap_id=swap_id))
+    
+    conn = get_db()
+    repo = get_repo()
+    
+    # Get swap details to determine who to rate
+    swap = repo.swaps.accepted(swap_id, g.user.id)
+    
+    if swap:
+        # Determine who to rate (the other person in the swap)
+        rated_id = swap.provider_id if swap.requester_id == g.user.id else swap.requester_id
+        
+        repo.ratings.create(swap_id, g.user.id, rated_id, rating, feedback)
+        bump(conn, rated_id, rating_sum=rating, rating_count=1)
+        conn.commit()
+        flash('Rating submitted successfully!')
+    else:
+        flash('Invalid swap request!')
+    
+    return redirect(url_for('dashboard'))
+
+# Admin routes
+@app.route('/admin')
+def admin_dashboard():
+    """Admin dashboard"""
+    if not g.user or not g.user.is_admin:
+        flash('Access denied!')
+        return redirect(url_for('login'))
+    
+    conn = get_db()
+    
+    # Get statistics from the platform counters (reconciled in the background)
+    get_reconciler()
+    counters = get_counters(conn)
+    stats = {
+        'total_users': counters['total_users'],
+        'total_skills': counters['total_skills'],
+        'pending_swaps': counters['swaps_pending'],
+        'completed_swaps': counters['swaps_accepted'],
+        'reconciled_at': counters['reconciled_at']
+    }
+    
+    # Get unapproved skills and recent swap requests
+    repo = get_repo()
+    unapproved_skills = repo.skills.pending_approval()
+    recent_swaps = repo.swaps.recent(10)
+    
+    return render_template('admin_dashboard.html', stats=stats, 
+                         unapproved_skills=unapproved_skills, recent_swaps=recent_swaps)
+
+@app.route('/admin/users')
+def admin_users():
+    """Admin user management"""
+    if not g.user or not g.user.is_admin:
+        flash('Access denied!')
+        return redirect(url_for('login'))
+    
+    users, next_cursor = listing_page(get_repo().users.admin_page)
+    
+    if wants_json():
+        return listing_json(users, next_cursor)
+    
+    return render_template('admin_users.html', users=users, pages=page_links(next_cursor))
+
+@app.route('/admin/ban_user/<int:user_id>')
+def admin_ban_user(user_id):
+    """Ban/unban a user"""
+    if not g.user or not g.user.is_admin:
+        flash('Access denied!')
+        return redirect(url_for('login'))
+    
+    conn = get_db()
+    repo = get_repo()
+    user = repo.users.get(user_id)
+    
+    if user and not user.is_admin:
+        new_status = 0 if user.is_banned else 1
+        repo.users.set_banned(user_id, new_status)
+        if new_status:
+            revoke_sessions(conn, user_id)
+        conn.commit()
+        get_principals().invalidate(user_id)
+        featured_pool().invalidate()
+        action = 'banned' if new_status else 'unbanned'
+        flash(f'User {action} successfully!')
+    else:
+        flash('Cannot ban this user!')
+    
+    return redirect(url_for('admin_users'))
+
+@app.route('/admin/approve_skill/<int:skill_id>')
+def admin_approve_skill(skill_id):
+    """Approve/reject a skill"""
+    if not g.user or not g.user.is_admin:
+        flash('Access denied!')
+        return redirect(url_for('login'))
+    
+    action = request.args.get('action', 'approve')
+    
+    conn = get_db()
+    repo = get_repo()
+    skill = repo.skills.state(skill_id)
+    
+    if action == 'approve':
+        repo.skills.approve(skill_id)
+        if skill and not skill.is_approved:
+            skill_approved(conn, skill.skill_name, 1)
+        flash('Skill approved!')
+    elif action == 'reject':
+        repo.skills.delete(skill_id)
+        if skill:
+            bump(conn, skill.user_id, skills_offered=-1)
+            bump_counters(conn, total_skills=-1)
+            if skill.is_approved:
+                skill_approved(conn, skill.skill_name, -1)
+        flash('Skill rejected and removed!')
+    
+    if skill:
+        queue_skill_change(conn, skill.user_id, skill.skill_key, 'offered')
+    conn.commit()
+    get_match_queue().notify()
+    featured_pool().invalidate()
+    
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/messages')
+def admin_messages():
+    """Admin platform messages"""
+    if not g.user or not g.user.is_admin:
+        flash('Access denied!')
+        return redirect(url_for('login'))
+    
+    messages, next_cursor = listing_page(get_repo().messages.platform_page)
+    
+    if wants_json():
+        return listing_json(messages, next_cursor)
+    
+    return render_template('admin_messages.html', messages=messages, pages=page_links(next_cursor))
+
+@app.route('/admin/send_message', methods=['POST'])
+def admin_send_message():
+    """Send platform-wide message"""
+    if not g.user or not g.user.is_admin:
+        flash('Access denied!')
+        return redirect(url_for('login'))
+    
+    title = request.form['title']
+    message = request.form['message']
+    
+    repo = get_repo()
+    repo.messages.send_platform(g.user.id, title, message)
+    repo.conn.commit()
+    recent_messages_cache().invalidate()
+    
+    flash('Message sent successfully!')
+    return redirect(url_for('admin_messages'))
+
+@app.route('/admin/delete_message/<int:message_id>')
+def admin_delete_message(message_id):
+    """Delete platform message"""
+    if not g.user or not g.user.is_admin:
+        flash('Access denied!')
+        return redirect(url_for('login'))
+    
+    repo = get_repo()
+    repo.messages.delete_platform(message_id)
+    repo.conn.commit()
+    recent_messages_cache().invalidate()
+    
+    flash('Message deleted successfully!')
+    return redirect(url_for('admin_messages'))
+
+@app.route('/admin/reports')
+def admin_reports():
+    """Admin reports"""
+    if not g.user or not g.user.is_admin:
+        flash('Access denied!')
+        return redirect(url_for('login'))
+    
+    conn = get_db()
+    
+    # User activity report, one page at a time
+    user_activity, next_cursor = listing_page(get_repo().users.activity_page)
+    
+    if wants_json():
+        return listing_json(user_activity, next_cursor)
+    
+    # Swap statistics from the platform counters
+    get_reconciler()
+    counters = get_counters(conn)
+    swap_stats = {
+        'total_requests': counters['swaps_total'],
+        'pending': counters['swaps_pending'],
+        'accepted': counters['swaps_accepted'],
+        'rejected': counters['swaps_rejected']
+    }
+    
+    return render_template('admin_reports.html', 
+                         user_activity=user_activity,
+                         swap_stats=swap_stats,
+                         top_skills=top_skills(conn, 10),
+                         reconciled_at=counters['reconciled_at'],
+                         pages=page_links(next_cursor))
+
+@app.route('/admin/export/<report>')
+def admin_export(report):
+    """Stream a report as CSV or NDJSON, optionally limited to ?since=/?until= days"""
+    if not g.user or not g.user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    fmt = request.args.get('format', 'csv')
+    if report not in REPORTS:
+        return jsonify({'error': 'Unknown report', 'reports': sorted(REPORTS)}), 404
+    if fmt not in FORMATS:
+        return jsonify({'error': 'Unknown format', 'formats': sorted(FORMATS)}), 400
+    try:
+        columns, sql, params = build_query(report, request.args.get('since'), request.args.get('until'))
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    
+    # Counted up front so clients can show progress while the rows stream in
+    total = count_rows(get_db(), sql, params)
+    batch_size = app.config['EXPORT_BATCH_SIZE']
+    response = Response(stream_export(get_pool(), fmt, columns, sql, params, batch_size),
+                        content_type=FORMATS[fmt])
+    response.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (report, fmt)
+    response.headers['X-Total-Rows'] = str(total)
+    response.headers['X-Export-Batch-Size'] = str(batch_size)
+    return response
+
+@app.route('/admin/db_pool')
+def admin_db_pool():
+    """Connection pool, writer and match updater statistics for this worker"""
+    if not g.user or not g.user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    stats = get_pool().stats()
+    if app.config['DB_WRITE_QUEUE']:
+        stats['writer'] = get_write_queue().stats()
+    stats['match_queue'] = get_match_queue().stats()
+    return jsonify(stats)
+
+@app.route('/admin/auth')
+def admin_auth():
+    """Password hashing pool, login latency and login throttle statistics for this worker"""
+    if not g.user or not g.user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(dict(get_auth().stats(), throttle=get_login_throttle().stats()))
+
+@app.route('/admin/chat_hub')
+def admin_chat_hub():
+    """Chat stream statistics for this worker"""
+    if not g.user or not g.user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(get_hub().stats())
+
+@app.route('/admin/images')
+def admin_images():
+    """Profile photo pipeline statistics for this worker"""
+    if not g.user or not g.user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(get_image_pipeline().stats())
+
+@app.route('/admin/caches')
+def admin_caches():
+    """Home page, signed-in user, dashboard and page cache statistics for this worker"""
+    if not g.user or not g.user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify({'featured_pool': featured_pool().stats(),
+                    'recent_messages': recent_messages_cache().stats(),
+                    'principals': get_principals().stats(),
+                    'dashboards': get_dashboards().stats(),
+                    'pages': get_page_cache().stats()})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for this worker"""
+    token = app.config['METRICS_TOKEN']
+    scraper = token and secrets.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token)
+    if not scraper and (not g.user or not g.user.is_admin):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return Response(get_metrics().prometheus(page_cache=get_page_cache().stats()),
+                    mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/slow_queries')
+def admin_slow_queries():
+    """Busiest SQL statements and recent slow ones for this worker"""
+    if not g.user or not g.user.is_admin:
+        flash('Access denied!')
+        return redirect(url_for('login'))
+    
+    metrics = get_metrics()
+    if wants_json():
+        return jsonify({'statements': metrics.statements(), 'slow': metrics.slow_queries(),
+                        'endpoints': metrics.endpoints()})
+    
+    return render_template('admin_slow_queries.html', statements=metrics.statements(),
+                           slow=metrics.slow_queries(), endpoints=metrics.endpoints(),
+                           slow_ms=metrics.slow_ms, sample_rate=metrics.sample_rate)
+
+# Room and messaging routes
+@app.route('/rooms')
+@conditional('rooms', 'room_members', 'users')
+def rooms():
+    """List all public rooms"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    sort = request.args.get('sort', 'newest')
+    if sort not in ROOM_ORDERS:
+        sort = 'newest'
+    
+    # Get all public rooms; counts are stored on each room and the viewer's
+    # memberships are fetched for all of them at once
+    public_rooms = get_repo().rooms.public(g.user.id, sort)
+    
+    return render_template('rooms.html', public_rooms=public_rooms, sort=sort,
+                         total_members=sum(room.member_count for room in public_rooms),
+                         total_messages=sum(room.message_count for room in public_rooms),
+                         user_rooms=[room for room in public_rooms if room.is_member])
+
+@app.route('/create_room', methods=['POST'])
+def create_room():
+    """Create a new room"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    name = request.form['name']
+    description = request.form.get('description', '')
+    is_public = 1 if request.form.get('is_public') else 0
+    
+    # Generate unique room code
+    room_code = secrets.token_urlsafe(8).upper()
+    
+    repo = get_repo()
+    
+    # Ensure room code is unique
+    while repo.rooms.code_taken(room_code):
+        room_code = secrets.token_urlsafe(8).upper()
+    
+    # Create room, with the creator as its first member
+    room_id = repo.rooms.create(name, description, g.user.id, is_public, room_code)
+    
+    repo.conn.commit()
+    
+    flash(f'Room created successfully! Room code: {room_code}')
+    return redirect(url_for('room_detail', room_id=room_id))
+
+@app.route('/room/<int:room_id>')
+@conditional('rooms', 'room_members', 'room_messages', 'users', 'user_stats')
+def room_detail(room_id):
+    """Room detail and chat"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    repo = get_repo()
+    
+    # Get room details
+    room = repo.rooms.detail(room_id)
+    
+    if not room:
+        flash('Room not found!')
+        return redirect(url_for('rooms'))
+    
+    # Check if user is member
+    is_member = repo.rooms.is_member(room_id, g.user.id)
+    
+    if not is_member and not room.is_public:
+        flash('Access denied to this private room!')
+        return redirect(url_for('rooms'))
+    
+    # Get the latest page of room messages; older ones are loaded on demand
+    messages, has_older = fetch_room_messages(repo, room_id)
+    
+    # Get room members
+    members = repo.rooms.members(room_id)
+    
+    return render_template('room_detail.html', room=room, messages=messages, 
+                         members=members, is_member=is_member,
+                         message_count=room.message_count, has_older=has_older)
+
+def fetch_room_messages(repo, room_id, after=None, before=None, limit=None):
+    """Keyset-paged room messages in chronological order, plus a has-more flag
+
+    ``after`` returns messages newer than that id (oldest first); otherwise the
+    newest page older than ``before`` (or the newest page overall).
+    """
+    limit = limit or app.config['CHAT_PAGE_SIZE']
+    
+    if after is not None:
+        rows = repo.messages.after(room_id, after, limit + 1)
+        return rows[:limit], len(rows) > limit
+    
+    rows = repo.messages.before(room_id, before if before is not None else 2 ** 62, limit + 1)
+    return rows[:limit][::-1], len(rows) > limit
+
+@app.route('/room/<int:room_id>/messages')
+@conditional('rooms', 'room_members', 'room_messages', 'users', store=False)
+def room_messages(room_id):
+    """Room messages as JSON: ?after=<id> for new ones, ?before=<id> for older ones"""
+    if not g.user:
+        return jsonify({'error': 'Login required'}), 401
+    
+    repo = get_repo()
+    
+    room = repo.rooms.get(room_id)
+    if not room:
+        return jsonify({'error': 'Room not found'}), 404
+    
+    if not room.is_public and not repo.rooms.is_member(room_id, g.user.id):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    limit = min(max(request.args.get('limit', app.config['CHAT_PAGE_SIZE'], type=int), 1),
+                app.config['CHAT_PAGE_SIZE'])
+    messages, has_more = fetch_room_messages(repo, room_id,
+                                             after=request.args.get('after', type=int),
+                                             before=request.args.get('before', type=int),
+                                             limit=limit)
+    
+    return jsonify({
+        'messages': [serialize_room_message(m) for m in messages],
+        'has_more': has_more,
+    })
+
+def serialize_room_message(row):
+    """JSON shape of a chat message shared by the poll and stream endpoints"""
+    return {
+        'id': row.id,
+        'user_id': row.user_id,
+        'name': row.name,
+        'message': row.message,
+        'created_at': row.created_at,
+    }
+
+@app.route('/room/<int:room_id>/stream')
+def room_stream(room_id):
+    """Server-Sent Events stream of new chat messages for a room"""
+    if not g.user:
+        return jsonify({'error': 'Login required'}), 401
+    
+    repo = get_repo()
+    
+    room = repo.rooms.get(room_id)
+    if not room:
+        return jsonify({'error': 'Room not found'}), 404
+    
+    if not room.is_public and not repo.rooms.is_member(room_id, g.user.id):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    # EventSource sends Last-Event-ID when it reconnects
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('after', 0, type=int)
+    
+    # Subscribe first so nothing published during the replay query is missed
+    hub = get_hub()
+    sub = hub.subscribe(room_id)
+    
+    # Replay what the client missed; all database work happens here, before
+    # streaming starts, so the pooled connection is not held by the stream
+    backlog = []
+    after = last_id
+    has_more = True
+    try:
+        while has_more and len(backlog) < app.config['CHAT_REPLAY_LIMIT']:
+            messages, has_more = fetch_room_messages(repo, room_id, after=after)
+            backlog.extend(serialize_room_message(m) for m in messages)
+            if messages:
+                after = messages[-1].id
+    except Exception:
+        # No response will close the subscription, so drop it here
+        hub.unsubscribe(sub)
+        raise
+    
+    response = Response(stream_room(hub, sub, backlog, last_id,
+                                    heartbeat=app.config['CHAT_HEARTBEAT'], reset=has_more),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: hub.unsubscribe(sub))
+    return response
+
+@app.route('/join_room/<int:room_id>')
+def join_room(room_id):
+    """Join a room"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    repo = get_repo()
+    
+    # Check if room exists and is public
+    room = repo.rooms.get_public(room_id)
+    
+    if not room:
+        flash('Room not found or is private!')
+        return redirect(url_for('rooms'))
+    
+    # Check if already member
+    if repo.rooms.is_member(room_id, g.user.id):
+        flash('You are already a member of this room!')
+    else:
+        repo.rooms.add_member(room_id, g.user.id)
+        repo.conn.commit()
+        flash('Successfully joined the room!')
+    
+    return redirect(url_for('room_detail', room_id=room_id))
+
+@app.route('/join_room_by_code', methods=['POST'])
+def join_room_by_code():
+    """Join a room using room code"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    room_code = request.form['room_code'].upper().strip()
+    
+    repo = get_repo()
+    
+    # Find room by code
+    room = repo.rooms.by_code(room_code)
+    
+    if not room:
+        flash('Invalid room code. Please check and try again.', 'error')
+        return redirect(url_for('rooms'))
+    
+    # Check if user is already a member
+    if repo.rooms.is_member(room.id, g.user.id):
+        flash('You are already a member of this room!')
+        return redirect(url_for('room_detail', room_id=room.id))
+    
+    # Add user to room
+    repo.rooms.add_member(room.id, g.user.id)
+    
+    repo.conn.commit()
+    
+    flash(f'Successfully joined "{room.name}"!')
+    return redirect(url_for('room_detail', room_id=room.id))
+
+@app.route('/invite_user_to_room', methods=['POST'])
+def invite_user_to_room():
+    """Invite a user to room (room creator only)"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    room_id = request.form['room_id']
+    username = request.form['username'].strip()
+    
+    repo = get_repo()
+    
+    # Check if current user is room creator
+    room = repo.rooms.get(room_id)
+    
+    if not room or room.creator_id != g.user.id:
+        flash('Only room creators can invite users.', 'error')
+        return redirect(url_for('room_detail', room_id=room_id))
+    
+    # Find user to invite
+    user_to_invite = repo.users.find_active(username)
+    
+    if not user_to_invite:
+        flash('User not found or is banned.', 'error')
+        return redirect(url_for('room_detail', room_id=room_id))
+    
+    # Check if user is already a member
+    if repo.rooms.is_member(room_id, user_to_invite.id):
+        flash(f'{username} is already a member of this room.', 'info')
+        return redirect(url_for('room_detail', room_id=room_id))
+    
+    # Add user to room
+    repo.rooms.add_member(room_id, user_to_invite.id)
+    
+    repo.conn.commit()
+    
+    flash(f'{username} has been added to the room!')
+    return redirect(url_for('room_detail', room_id=room_id))
+
+@app.route('/send_message', methods=['POST'])
+def send_message():
+    """Send a message to a room"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    room_id = request.form['room_id']
+    message = request.form['message']
+    
+    repo = get_repo()
+    
+    message_id = None
+    # Check if user is member
+    if repo.rooms.is_member(room_id, g.user.id):
+        message_id = repo.messages.post(room_id, g.user.id, message)
+        
+        # Push the new message to everyone streaming this room
+        row = repo.messages.get(message_id)
+        get_hub().publish(int(room_id), serialize_room_message(row))
+    
+    # The chat page posts with fetch() and only needs the new id
+    if wants_json():
+        if message_id is None:
+            return jsonify({'error': 'Not a member of this room'}), 403
+        return jsonify({'id': message_id})
+    
+    return redirect(url_for('room_detail', room_id=room_id))
+
+@app.route('/leave_room/<int:room_id>')
+def leave_room(room_id):
+    """Leave a room"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    repo = get_repo()
+    
+    # Check if room exists
+    room = repo.rooms.get(room_id)
+    
+    if not room:
+        flash('Room not found!')
+        return redirect(url_for('rooms'))
+    
+    # Check if user is the creator
+    if room.creator_id == g.user.id:
+        flash('Room creators cannot leave their own rooms!')
+        return redirect(url_for('room_detail', room_id=room_id))
+    
+    # Check if user is member
+    if not repo.rooms.is_member(room_id, g.user.id):
+        flash('You are not a member of this room!')
+    else:
+        # Remove user from room
+        repo.rooms.remove_member(room_id, g.user.id)
+        repo.conn.commit()
+        flash('Successfully left the room!')
+    
+    return redirect(url_for('rooms'))
+
+@app.route('/delete_room/<int:room_id>', methods=['POST'])
+def delete_room(room_id):
+    """Delete a room (creator only)"""
+    if not g.user:
+        return redirect(url_for('login'))
+    
+    repo = get_repo()
+    
+    # Check if room exists and user is the creator
+    room = repo.rooms.get(room_id)
+    
+    if not room:
+        flash('Room not found!')
+        return redirect(url_for('rooms'))
+    
+    if room.creator_id != g.user.id:
+        flash('Only room creators can delete their rooms!')
+        return redirect(url_for('room_detail', room_id=room_id))
+    
+    # Delete the room with its messages and members (children first, for the foreign keys)
+    repo.rooms.delete(room_id)
+    
+    repo.conn.commit()
+    
+    flash(f'Room "{room.name}" has been deleted successfully!')
+    return redirect(url_for('rooms'))
+
+if __name__ == '__main__':
+    init_db()
+    app.run(debug=True)
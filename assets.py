@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Fingerprinted, minified and precompressed static assets.
+
+``build`` minifies the site's own CSS and JavaScript, writes each one to
+``static/dist`` under a name containing its content hash, next to ``.gz``
+(and, when the ``brotli`` package is installed, ``.br``) copies, and records
+the mapping in ``static/dist/manifest.json``.
+
+Fingerprinted files the new manifest no longer lists are deleted.
+
+Building is a deploy step; workers never build. ``init_app`` loads the
+manifest, rewrites ``url_for('static', filename=...)`` to the fingerprinted
+names and serves those with a year-long ``immutable`` Cache-Control, choosing
+the precompressed copy from Accept-Encoding. A fingerprinted URL changes
+whenever the file does, so browsers never need to revalidate it. Without a
+manifest, or with one older than a source, the plain files are served.
+
+Usage: python assets.py [static folder]   # build static/dist
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+SOURCES = ('css/style.css', 'css/base.css', 'css/index.css', 'js/main.js', 'js/base.js')
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Names ``build`` gives its output: <stem>.<12 hex digits><ext>[.gz|.br]
+_BUILT = re.compile(r'^[\w-]+\.[0-9a-f]{12}\.(css|js)(\.gz|\.br)?$')
+
+# A comment, or a quoted string (group 1) that minifying must not touch
+_CSS_TOKENS = re.compile(r'''/\*.*?\*/|("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''', re.S)
+
+
+def minify_css(text):
+    """Drop comments and insignificant whitespace, leaving quoted strings as they are"""
+    strings = []
+
+    def hide(match):
+        if match.group(1) is None:
+            return ' '
+        strings.append(match.group(1))
+        return '\0%d\0' % (len(strings) - 1)
+
+    text = _CSS_TOKENS.sub(hide, text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    # Only around a property's colon: the next of { ; } is ; or }, not a rule's {.
+    # In a selector the space is a descendant combinator (``a :hover``).
+    text = re.sub(r'\s*:\s*(?=[^{};]*[;}])', ':', text)
+    text = text.replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda match: strings[int(match.group(1))], text)
+
+
+def minify_js(text):
+    """Strip indentation, blank lines and whole-line comments
+
+    Deliberately conservative: line breaks are kept so automatic semicolon
+    insertion behaves exactly as before, and lines inside multi-line
+    template literals are left untouched.
+    """
+    out = []
+    in_template = in_comment = False
+    for line in text.splitlines():
+        if in_template:
+            out.append(line)
+        else:
+            stripped = line.strip()
+            if in_comment:
+                in_comment = '*/' not in stripped
+                continue
+            if stripped.startswith('/*'):
+                in_comment = '*/' not in stripped
+                continue
+            if not stripped or stripped.startswith('//'):
+                continue
+            out.append(stripped)
+        if line.count('`') % 2:
+            in_template = not in_template
+    return '\n'.join(out) + '\n'
+
+
+def _minify(path, data):
+    text = data.decode('utf-8')
+    if path.endswith('.css'):
+        return minify_css(text).encode('utf-8')
+    if path.endswith('.js'):
+        return minify_js(text).encode('utf-8')
+    return data
+
+
+def build(static_folder, sources=SOURCES):
+    """Write fingerprinted, precompressed copies of ``sources`` and prune older ones; returns the manifest"""
+    dist = os.path.join(static_folder, DIST)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for source in sources:
+        with open(os.path.join(static_folder, source), 'rb') as f:
+            data = _minify(source, f.read())
+        stem, ext = os.path.splitext(os.path.basename(source))
+        name = '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:12], ext)
+        target = os.path.join(dist, name)
+        if not os.path.exists(target):
+            with open(target, 'wb') as f:
+                f.write(data)
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                with open(target + '.br', 'wb') as f:
+                    f.write(brotli.compress(data))
+        manifest[source] = '%s/%s' % (DIST, name)
+
+    # Write the manifest atomically so a running worker never reads half of it
+    path = os.path.join(dist, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+    current = set(os.path.basename(name) for name in manifest.values())
+    for name in os.listdir(dist):
+        if _BUILT.match(name) and re.sub(r'\.(gz|br)$', '', name) not in current:
+            os.unlink(os.path.join(dist, name))
+    return manifest
+
+
+def _stale(static_folder, sources):
+    path = os.path.join(static_folder, DIST, MANIFEST)
+    if not os.path.exists(path):
+        return True
+    built = os.path.getmtime(path)
+    return any(os.path.getmtime(os.path.join(static_folder, s)) > built for s in sources)
+
+
+def init_app(app):
+    """Fingerprint static URLs and serve the built assets, if ASSETS_FINGERPRINT is on"""
+    if not app.config['ASSETS_FINGERPRINT']:
+        return
+    static_folder = app.static_folder
+    if _stale(static_folder, SOURCES):
+        app.logger.warning('static/dist is missing or older than its sources; serving plain assets '
+                           '(run python assets.py when deploying)')
+        return
+    with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+        manifest = json.load(f)
+    built = set(manifest.values())
+    app.extensions['assets'] = manifest
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    send_static_file = app.view_functions['static']
+
+    def static(filename):
+        if filename not in built:
+            return send_static_file(filename=filename)
+
+        encoding, suffix = next(((e, s) for e, s in ENCODINGS
+                                 if request.accept_encodings[e] and os.path.exists(
+                                     os.path.join(static_folder, filename + s))), (None, ''))
+        response = send_from_directory(static_folder, filename + suffix, max_age=app.config['ASSETS_MAX_AGE'],
+                                       mimetype=mimetypes.guess_type(filename)[0])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions['static'] = static
+
+
+if __name__ == '__main__':
+    manifest = build(sys.argv[1] if len(sys.argv) > 1 else 'static')
+    for source, target in sorted(manifest.items()):
+        print('%s -> %s' % (source, target))
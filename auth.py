@@ -0,0 +1,168 @@
+"""
+Password hashing off the request thread.
+
+``generate_password_hash``/``check_password_hash`` are deliberately slow
+KDFs. ``HashService`` runs them on a small process pool so a burst of logins
+cannot tie up the threads serving every other route. At most ``max_pending``
+hash jobs may be queued or running; past that, callers get ``AuthBusy``
+straight away and the route answers 429 instead of piling up.
+
+Stored hashes weaker than ``PASSWORD_HASH_METHOD`` are upgraded after the
+next successful login (see :func:`needs_rehash`). The upgrade is queued on a
+background thread that waits for the pool, so the login reply does not wait
+for a second hash.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from db import per_worker
+
+
+class AuthBusy(Exception):
+    """Too many hash jobs in flight; the caller should retry later"""
+
+
+def _hash(password, method):
+    started = time.perf_counter()
+    return generate_password_hash(password, method=method), time.perf_counter() - started
+
+
+def _verify(stored, password):
+    started = time.perf_counter()
+    return check_password_hash(stored, password), time.perf_counter() - started
+
+
+def needs_rehash(stored, policy):
+    """True when ``stored`` uses another algorithm or weaker cost parameters than ``policy``
+
+    Methods look like 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1'; numeric
+    parts are compared as costs, anything else must match exactly.
+    """
+    method = stored.split('$', 1)[0]
+    if method == policy:
+        return False
+    have, want = method.split(':'), policy.split(':')
+    if len(have) != len(want):
+        return True
+    for h, w in zip(have, want):
+        if h.isdigit() and w.isdigit():
+            if int(h) < int(w):
+                return True
+        elif h != w:
+            return True
+    return False
+
+
+class HashService:
+    """Bounded pool of hashing processes, or inline hashing when ``workers`` is 0"""
+
+    def __init__(self, workers=2, max_pending=32, timeout=10.0, method='scrypt:32768:8:1'):
+        self.pid = os.getpid()
+        self.method = method
+        self.max_pending = max_pending
+        self.timeout = timeout
+        # spawn, not fork: the web process has threads and open SQLite handles
+        self._executor = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context('spawn')) if workers else None
+        # Waits on upgrade hashes so no request thread does
+        self._rehasher = ThreadPoolExecutor(1, thread_name_prefix='rehash')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rehashes = 0
+        self._latency = deque(maxlen=1000)
+        self._stats = {'hashes': 0, 'verifies': 0, 'failures': 0, 'rejected': 0,
+                       'timeouts': 0, 'rehashed': 0, 'rehash_failures': 0, 'compute_time': 0.0}
+        # Checked when the username does not exist, so the reply takes as long as a real check
+        self._dummy = generate_password_hash(os.urandom(16).hex(), method=method)
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise AuthBusy()
+            self._pending += 1
+
+        started = time.perf_counter()
+        try:
+            if self._executor is None:
+                result, compute = fn(*args)
+            else:
+                try:
+                    result, compute = self._executor.submit(fn, *args).result(self.timeout)
+                except FutureTimeout:
+                    self._stats['timeouts'] += 1
+                    raise AuthBusy()
+        finally:
+            with self._lock:
+                self._pending -= 1
+        self._latency.append(time.perf_counter() - started)
+        self._stats['compute_time'] += compute
+        return result
+
+    def hash(self, password):
+        """New hash of ``password`` under the current policy"""
+        self._stats['hashes'] += 1
+        return self._run(_hash, password, self.method)
+
+    def verify(self, stored, password):
+        """Check ``password`` against ``stored``; ``stored`` None checks a dummy hash"""
+        self._stats['verifies'] += 1
+        ok = self._run(_verify, stored or self._dummy, password) and stored is not None
+        if not ok:
+            self._stats['failures'] += 1
+        return ok
+
+    def rehash_later(self, stored, password, save):
+        """If ``stored`` is below policy, hash ``password`` in the background and call ``save(new_hash)``
+
+        Returns whether an upgrade was queued. Skipped while ``max_pending``
+        upgrades are already waiting; the next login tries again.
+        """
+        if not needs_rehash(stored, self.method):
+            return False
+        with self._lock:
+            if self._rehashes >= self.max_pending:
+                return False
+            self._rehashes += 1
+        self._rehasher.submit(self._rehash, password, save)
+        return True
+
+    def _rehash(self, password, save):
+        try:
+            save(self.hash(password))
+            self._stats['rehashed'] += 1
+        except Exception:
+            # Busy pool or database; not worth more than a retry at the next login
+            self._stats['rehash_failures'] += 1
+        finally:
+            with self._lock:
+                self._rehashes -= 1
+
+    def stats(self):
+        samples = sorted(self._latency)
+
+        def percentile(p):
+            return round(samples[min(int(len(samples) * p), len(samples) - 1)] * 1000, 2) if samples else None
+
+        return dict(self._stats, pending=self._pending, max_pending=self.max_pending, rehashing=self._rehashes,
+                    method=self.method, pool=self._executor is not None,
+                    latency_ms={'p50': percentile(0.5), 'p95': percentile(0.95),
+                                'p99': percentile(0.99), 'samples': len(samples)})
+
+
+def get_auth(app=None):
+    """Return this worker's hash service, built from the AUTH_* settings"""
+    app = app or current_app
+    return per_worker(app, 'auth', lambda: HashService(
+        workers=app.config['AUTH_HASH_WORKERS'],
+        max_pending=app.config['AUTH_MAX_PENDING'],
+        timeout=app.config['AUTH_HASH_TIMEOUT'],
+        method=app.config['PASSWORD_HASH_METHOD']))
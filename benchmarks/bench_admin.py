@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark admin dashboard/reports latency with a large swap history.
+
+Seeds a throwaway database (default 1M swap requests) through the real
+migrations, reconciles the platform counters, then compares the statistics
+queries the admin pages used to run against a full request of each page,
+which now reads the counters.
+
+Usage: python benchmarks/bench_admin.py [--swaps 1000000] [--users 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from counters import reconcile
+from db import connect
+from migrations import migrate
+
+# Statistics the admin pages computed per request before the counters table
+LEGACY = (
+    ('dashboard counts', (
+        'SELECT COUNT(*) FROM users WHERE is_admin = 0',
+        'SELECT COUNT(*) FROM skills_offered',
+        "SELECT COUNT(*) FROM swap_requests WHERE status = 'pending'",
+        "SELECT COUNT(*) FROM swap_requests WHERE status = 'accepted'",
+    )),
+    ('reports swap stats', ('''
+        SELECT COUNT(*),
+               SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'accepted' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END)
+        FROM swap_requests
+    ''',)),
+    ('reports top skills', ('''
+        SELECT skill_name, COUNT(*) FROM skills_offered
+        WHERE is_approved = 1 GROUP BY skill_name ORDER BY COUNT(*) DESC LIMIT 10
+    ''',)),
+)
+
+
+def build(path, swaps, users, seed=7):
+    rng = random.Random(seed)
+    conn = connect(path)
+    migrate(conn)
+
+    conn.execute("INSERT INTO users (username, email, password_hash, name, is_admin) "
+                 "VALUES ('admin', 'admin@example.com', '-', 'Admin', 1)")
+    conn.executemany('INSERT INTO users (username, email, password_hash, name) VALUES (?, ?, ?, ?)',
+                     (('user%d' % i, 'user%d@example.com' % i, '-', 'User %d' % i) for i in range(users)))
+    skills = users * 2
+    conn.executemany('INSERT INTO skills_offered (user_id, skill_name) VALUES (?, ?)',
+                     ((rng.randint(2, users + 1), 'Skill %d' % rng.randint(1, 500)) for _ in range(skills)))
+    statuses = ('pending', 'accepted', 'rejected')
+    batch = 100000
+    for start in range(0, swaps, batch):
+        conn.executemany('''
+            INSERT INTO swap_requests (requester_id, provider_id, offered_skill_id, wanted_skill, status)
+            VALUES (?, ?, ?, 'something', ?)
+        ''', ((rng.randint(2, users + 1), rng.randint(2, users + 1), rng.randint(1, skills), rng.choice(statuses))
+              for _ in range(min(batch, swaps - start))))
+        conn.commit()
+    conn.execute('ANALYZE')
+    conn.commit()
+    reconcile(conn)
+    return conn
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--swaps', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'admin.db')
+        started = time.perf_counter()
+        conn = build(path, args.swaps, args.users)
+        print('# built %d swaps, %d users in %.1fs' % (args.swaps, args.users, time.perf_counter() - started))
+
+        print('%-28s %10s' % ('legacy statistics query', 'ms'))
+        for name, queries in LEGACY:
+            ms = timed(lambda: [conn.execute(sql).fetchall() for sql in queries], args.repeat)
+            print('%-28s %10.2f' % (name, ms))
+
+        app.config['DATABASE'] = path
+        app.config['COUNTERS_RECONCILE_INTERVAL'] = 10 ** 6
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+
+        print('%-28s %10s' % ('page with counters', 'ms'))
+        for url in ('/admin', '/admin/reports'):
+            assert client.get(url).status_code == 200, url
+            ms = timed(lambda: client.get(url), args.repeat)
+            print('%-28s %10.2f' % (url, ms))
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Load-test every page and API of the app and record the results as JSON.
+
+Each route in ROUTES is driven in turn by ``--threads`` threads, each with
+its own signed-in session, until ``--requests`` requests have been made.
+Reports p50/p95/p99 latency, throughput and errors per route. Throughput
+is measured from the first worker starting its timed loop to the last one
+finishing it, and is left out (None) when fewer requests than asked for
+were measured.
+
+Two drivers:
+
+- ``client`` (default) calls the app in-process through Flask's test client,
+  measuring routing, queries and rendering without any network.
+- ``http`` sends real HTTP requests from the threads, either to ``--url`` or
+  to a threaded werkzeug server started in-process on a free port.
+
+Without ``--database`` a throwaway database is seeded with seed_data.py at
+``--scale``. With ``--database`` the app runs against that file; sign in
+with ``--user``/``--password`` (a seeded user) and the admin account.
+
+``--output`` writes the results as JSON; ``--compare`` loads an earlier run
+and flags routes whose p95 grew by more than ``--tolerance`` (exit code 1).
+Routes that destroy state (logout, bans, deletes) and the endless chat
+stream are not driven.
+
+Usage: python benchmarks/bench_app.py [--scale tiny] [--driver client|http] [--threads 8]
+                                      [--requests 200] [--output run.json] [--compare base.json]
+"""
+
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, init_db
+from db import connect
+from migrations import migrate
+from seed_data import SCALES, seed
+
+# (name, method, role, path, form data); {placeholders} come from pick_ids()
+ROUTES = (
+    ('index', 'GET', None, '/', None),
+    ('login page', 'GET', None, '/login', None),
+    ('register page', 'GET', None, '/register', None),
+    ('browse_skills', 'GET', None, '/browse_skills', None),
+    ('browse_skills search', 'GET', None, '/browse_skills?search=python', None),
+    ('browse_skills json', 'GET', 'user', '/browse_skills?format=json', None),
+    ('login', 'POST', None, '/login', {'username': '{username}', 'password': '{password}'}),
+    ('dashboard', 'GET', 'user', '/dashboard', None),
+    ('api_matches', 'GET', 'user', '/api/matches', None),
+    ('profile', 'GET', 'user', '/profile', None),
+    ('edit_profile page', 'GET', 'user', '/edit_profile', None),
+    ('request_swap page', 'GET', 'user', '/request_swap/{skill_id}', None),
+    ('rate_user page', 'GET', 'user', '/rate_user/{swap_id}', None),
+    ('rooms', 'GET', 'user', '/rooms', None),
+    ('room_detail', 'GET', 'user', '/room/{room_id}', None),
+    ('room_messages poll', 'GET', 'user', '/room/{room_id}/messages?after={last_message_id}', None),
+    ('room_messages older', 'GET', 'user', '/room/{room_id}/messages?before={last_message_id}', None),
+    ('add_skill_offered', 'POST', 'user', '/add_skill_offered',
+     {'skill_name': 'Bench Skill {n}', 'description': 'load test'}),
+    ('add_skill_wanted', 'POST', 'user', '/add_skill_wanted',
+     {'skill_name': 'Bench Wish {n}', 'description': 'load test'}),
+    ('send_swap_request', 'POST', 'user', '/send_swap_request',
+     {'offered_skill_id': '{skill_id}', 'wanted_skill': 'Python', 'message': 'load test {n}'}),
+    ('send_message', 'POST', 'user', '/send_message', {'room_id': '{room_id}', 'message': 'load test {n}'}),
+    ('join_room', 'GET', 'user', '/join_room/{room_id}', None),
+    ('create_room', 'POST', 'user', '/create_room',
+     {'name': 'Bench room {n}', 'description': 'load test', 'is_public': '1'}),
+    ('admin', 'GET', 'admin', '/admin', None),
+    ('admin_users', 'GET', 'admin', '/admin/users', None),
+    ('admin_messages', 'GET', 'admin', '/admin/messages', None),
+    ('admin_reports', 'GET', 'admin', '/admin/reports', None),
+    ('admin_export', 'GET', 'admin', '/admin/export/swap_stats', None),
+    ('admin_slow_queries', 'GET', 'admin', '/admin/slow_queries', None),
+    ('admin_caches', 'GET', 'admin', '/admin/caches', None),
+    ('metrics', 'GET', 'admin', '/metrics', None),
+)
+
+
+def pick_ids(database, username):
+    """Ids the routes need: the signed-in user's busiest swap, a popular room, ..."""
+    conn = sqlite3.connect(database)
+    user_id = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()[0]
+    skill = conn.execute('SELECT id FROM skills_offered WHERE user_id != ? AND is_approved = 1 LIMIT 1',
+                         (user_id,)).fetchone()
+    swap = conn.execute('''
+        SELECT id FROM swap_requests WHERE requester_id = ? AND status = 'accepted' LIMIT 1
+    ''', (user_id,)).fetchone()
+    room = conn.execute('''
+        SELECT room_id, MAX(id) FROM room_messages
+        WHERE room_id IN (SELECT room_id FROM room_members WHERE user_id = ?)
+        GROUP BY room_id ORDER BY COUNT(*) DESC LIMIT 1
+    ''', (user_id,)).fetchone()
+    conn.close()
+    return {'skill_id': skill[0] if skill else 0, 'swap_id': swap[0] if swap else 0,
+            'room_id': room[0] if room else 0, 'last_message_id': room[1] if room else 0}
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return round(samples[min(int(len(samples) * p), len(samples) - 1)] * 1000, 3)
+
+
+class ClientSession:
+    """One user's in-process session through the Flask test client"""
+
+    def __init__(self):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        return self.client.open(path, method=method, data=data).status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """One user's cookie-holding session against a running server"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode('utf-8') if data is not None else None
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + path, data=body, method=method)) as r:
+                r.read()
+                return r.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+def fill(value, ids, n):
+    if isinstance(value, dict):
+        return {k: fill(v, ids, n) for k, v in value.items()}
+    return value.format(n=n, **ids) if value is not None else None
+
+
+def run_route(route, make_session, credentials, ids, threads, requests, warmup):
+    name, method, role, path, data = route
+    latencies, codes, spans = [], {}, []
+    lock = threading.Lock()
+    counter = iter(range(10 ** 12))
+    shares = [requests // threads + (1 if n < requests % threads else 0) for n in range(threads)]
+    shares = [share for share in shares if share]
+    # Throughput is timed from when every thread has signed in and warmed up
+    ready = threading.Barrier(len(shares) + 1)
+
+    def worker(share):
+        session = make_session()
+        if role:
+            username, password = credentials[role]
+            session.request('POST', '/login', {'username': username, 'password': password})
+        for _ in range(warmup):
+            n = next(counter)
+            session.request(method, fill(path, ids, n), fill(data, ids, n))
+        ready.wait()
+        began = time.perf_counter()
+        for _ in range(share):
+            n = next(counter)
+            url, form = fill(path, ids, n), fill(data, ids, n)
+            started = time.perf_counter()
+            status = session.request(method, url, form)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                codes[status] = codes.get(status, 0) + 1
+        with lock:
+            spans.append((began, time.perf_counter()))
+
+    workers = [threading.Thread(target=worker, args=(share,)) for share in shares]
+    for thread in workers:
+        thread.start()
+    ready.wait()
+    for thread in workers:
+        thread.join()
+    # Timed by the workers: this thread may not run again until they are done
+    elapsed = max(end for _, end in spans) - min(start for start, _ in spans) if spans else 0
+    complete = len(latencies) >= requests and elapsed > 0
+
+    return {'method': method, 'path': path, 'requests': len(latencies),
+            'errors': sum(count for code, count in codes.items() if code >= 400),
+            'status': {str(code): count for code, count in sorted(codes.items())},
+            'p50_ms': percentile(latencies, 0.50), 'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'throughput': round(len(latencies) / elapsed, 1) if complete else None}
+
+
+def compare(results, baseline, tolerance):
+    """Print p95 and throughput changes against ``baseline``; returns the regressed routes"""
+    regressed = []
+    print('\n%-24s %10s %10s %8s %10s' % ('vs baseline', 'p95 was', 'p95 now', 'change', 'req/s'))
+    for name, now in results.items():
+        was = baseline.get(name)
+        if not was or not was.get('p95_ms') or now['p95_ms'] is None:
+            continue
+        change = now['p95_ms'] / was['p95_ms'] - 1
+        flag = ' REGRESSED' if change > tolerance else ''
+        if flag:
+            regressed.append(name)
+        print('%-24s %10.2f %10.2f %+7.0f%% %+9.0f%%%s' % (
+            name, was['p95_ms'], now['p95_ms'], change * 100,
+            (now['throughput'] / was['throughput'] - 1) * 100 if was.get('throughput') and now['throughput'] else 0,
+            flag))
+    return regressed
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='seeded database to run against (default: seed a temporary one)')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='tiny')
+    parser.add_argument('--driver', choices=('client', 'http'), default='client')
+    parser.add_argument('--url', help='server for the http driver (default: start one in-process)')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per route')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests per thread per route')
+    parser.add_argument('--user', default='user1')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--only', help='comma-separated route names to run')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='earlier --output file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 growth before flagging')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    database = args.database
+    if database is None:
+        database = os.path.join(tmp.name, 'bench.db')
+        conn = connect(database)
+        migrate(conn)
+        seed(conn, password=args.password, **SCALES[args.scale])
+        conn.close()
+
+    app.config['DATABASE'] = database
+    app.config['UPLOAD_FOLDER'] = tmp.name
+    # Every thread signs in; don't let the login throttle turn that into 429s
+    app.config['LOGIN_USER_LIMIT'] = app.config['LOGIN_IP_LIMIT'] = (10 ** 9, 1)
+    init_db()
+
+    credentials = {'user': (args.user, args.password), 'admin': ('admin', args.admin_password)}
+    ids = dict(pick_ids(database, args.user), username=args.user, password=args.password)
+
+    server = None
+    if args.driver == 'http':
+        url = args.url
+        if url is None:
+            from werkzeug.serving import make_server
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = 'http://127.0.0.1:%d' % server.server_port
+
+        def make_session():
+            return HttpSession(url)
+    else:
+        make_session = ClientSession
+
+    only = set(args.only.split(',')) if args.only else None
+    results = {}
+    print('%-24s %8s %6s %9s %9s %9s %9s' % ('route', 'requests', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s'))
+    for route in ROUTES:
+        if only and route[0] not in only:
+            continue
+        result = results[route[0]] = run_route(route, make_session, credentials, ids,
+                                               args.threads, args.requests, args.warmup)
+        print('%-24s %8d %6d %9.2f %9.2f %9.2f %9s' % (
+            route[0], result['requests'], result['errors'], result['p50_ms'], result['p95_ms'],
+            result['p99_ms'], '-' if result['throughput'] is None else '%.1f' % result['throughput']))
+
+    if server:
+        server.shutdown()
+
+    conn = sqlite3.connect(database)
+    sizes = {table: conn.execute('SELECT COUNT(*) FROM %s' % table).fetchone()[0]
+             for table in ('users', 'skills_offered', 'swap_requests', 'rooms', 'room_messages')}
+    conn.close()
+    report = {'meta': {'at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'revision': git_revision(),
+                       'driver': args.driver, 'threads': args.threads, 'requests': args.requests,
+                       'database': args.database or 'seeded:%s' % args.scale, 'rows': sizes,
+                       'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print('\nWrote %s' % args.output)
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f)['results'], args.tolerance)
+        if regressed:
+            print('%d route(s) regressed: %s' % (len(regressed), ', '.join(regressed)))
+            status = 1
+    tmp.cleanup()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark the user dashboard at a given seed scale.
+
+Seeds a throwaway database (default: the small scale, 100k swap requests)
+with seed_data, then for a busy requester, a member of the busiest rooms
+and a typical user compares the six queries the dashboard used to run
+one after another with the consolidated ``load_dashboard`` statement, a
+cache hit (one version lookup), and a full ``/dashboard?format=json``
+request through the test client.
+
+Usage: python benchmarks/bench_dashboard.py [--scale small] [--repeat 50]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from dashboard import DashboardCache, load_dashboard
+from db import connect
+from migrations import migrate
+from seed_data import SCALES, seed
+
+# What the dashboard ran per request before load_dashboard
+LEGACY = (
+    'SELECT * FROM skills_offered WHERE user_id = ? ORDER BY created_at DESC',
+    'SELECT * FROM skills_wanted WHERE user_id = ? ORDER BY created_at DESC',
+    '''
+    SELECT sr.*, u.name as requester_name, so.skill_name as offered_skill
+    FROM swap_requests sr
+    JOIN users u ON sr.requester_id = u.id
+    JOIN skills_offered so ON sr.offered_skill_id = so.id
+    WHERE sr.provider_id = ? AND sr.status = 'pending'
+    ORDER BY sr.created_at DESC
+    ''',
+    '''
+    SELECT sr.*, u.name as provider_name, so.skill_name as offered_skill
+    FROM swap_requests sr
+    JOIN users u ON sr.provider_id = u.id
+    JOIN skills_offered so ON sr.offered_skill_id = so.id
+    WHERE sr.requester_id = ?
+    ORDER BY sr.created_at DESC
+    ''',
+    '''
+    SELECT r.*, rm.joined_at, u.name as creator_name,
+           (SELECT COUNT(*) FROM room_members WHERE room_id = r.id) as member_count
+    FROM rooms r
+    JOIN room_members rm ON r.id = rm.room_id
+    JOIN users u ON r.creator_id = u.id
+    WHERE rm.user_id = ?
+    ORDER BY rm.joined_at DESC
+    ''',
+    '''
+    SELECT m.other_id, m.skill_id, m.they_offer, m.they_want, m.score, u.name, u.location, u.profile_photo
+    FROM skill_matches m
+    JOIN users u ON m.other_id = u.id
+    WHERE m.user_id = ? AND u.is_banned = 0 AND u.is_public = 1
+    ORDER BY m.score DESC, m.other_id
+    LIMIT 6
+    ''',
+)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def pick_users(conn):
+    """(label, user id) for a busy requester, a member of big rooms and a typical user"""
+    requester = conn.execute('''
+        SELECT requester_id FROM swap_requests GROUP BY requester_id ORDER BY COUNT(*) DESC LIMIT 1
+    ''').fetchone()[0]
+    member = conn.execute('''
+        SELECT rm.user_id FROM room_members rm
+        JOIN (SELECT room_id, COUNT(*) as n FROM room_members GROUP BY room_id) c ON c.room_id = rm.room_id
+        GROUP BY rm.user_id ORDER BY SUM(c.n) DESC LIMIT 1
+    ''').fetchone()[0]
+    typical = conn.execute('SELECT id FROM users WHERE is_admin = 0 ORDER BY id LIMIT 1 OFFSET 500').fetchone()[0]
+    return (('busy requester', requester), ('big rooms member', member), ('typical user', typical))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dashboard.db')
+        started = time.perf_counter()
+        conn = connect(path)
+        migrate(conn)
+        seed(conn, **SCALES[args.scale])
+        conn.execute('ANALYZE')
+        conn.commit()
+        print('# seeded %s scale in %.1fs' % (args.scale, time.perf_counter() - started))
+
+        app.config['DATABASE'] = path
+        client = app.test_client()
+        cache = DashboardCache()
+
+        print('%-18s %8s %8s %10s %10s %10s %10s' % ('user', 'sent', 'rooms', 'legacy ms', 'load ms',
+                                                     'hit ms', 'request ms'))
+        for label, user_id in pick_users(conn):
+            dashboard = load_dashboard(conn, user_id)
+            legacy = timed(lambda: [conn.execute(sql, (user_id,)).fetchall() for sql in LEGACY], args.repeat)
+            load = timed(lambda: load_dashboard(conn, user_id), args.repeat)
+            hit = timed(lambda: cache.get(conn, user_id), args.repeat)
+
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+            assert client.get('/dashboard?format=json').status_code == 200
+            request = timed(lambda: client.get('/dashboard?format=json'), args.repeat)
+            print('%-18s %8d %8d %10.3f %10.3f %10.3f %10.3f' % (
+                label, dashboard.sent_count, len(dashboard.user_rooms), legacy, load, hit, request))
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark login throughput and latency under concurrency.
+
+Several threads log in through the Flask test client for a fixed time while
+a probe thread keeps requesting a cheap page, once with hashing on the
+request threads (AUTH_HASH_WORKERS = 0) and once per process-pool size.
+Reports successful logins per second, login p50/p95/p99, 429 rejections
+and the probe's p95, which shows how much a login storm slows other routes.
+
+Usage: python benchmarks/bench_login.py [--threads 16] [--seconds 10] [--pools 0,2,4]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from app import app
+from db import connect
+from migrations import migrate
+
+PASSWORD = 'correct horse battery staple'
+
+
+def build(path, users):
+    conn = connect(path)
+    migrate(conn)
+    # One real hash shared by every account keeps setup fast
+    password_hash = generate_password_hash(PASSWORD, method=app.config['PASSWORD_HASH_METHOD'])
+    conn.executemany('INSERT INTO users (username, email, password_hash, name) VALUES (?, ?, ?, ?)',
+                     (('user%d' % i, 'user%d@example.com' % i, password_hash, 'User %d' % i)
+                      for i in range(users)))
+    conn.commit()
+    conn.close()
+
+
+def percentile(samples, p):
+    if not samples:
+        return float('nan')
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p), len(samples) - 1)] * 1000
+
+
+def run(threads, seconds, users):
+    deadline = time.perf_counter() + seconds
+    latencies, probes, codes = [], [], {}
+    lock = threading.Lock()
+
+    def login(n):
+        client = app.test_client()
+        i = n
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.post('/login', data={'username': 'user%d' % (i % users), 'password': PASSWORD})
+            elapsed = time.perf_counter() - started
+            with lock:
+                codes[response.status_code] = codes.get(response.status_code, 0) + 1
+                if response.status_code == 302:
+                    latencies.append(elapsed)
+            client.get('/logout')
+            i += threads
+
+    def probe():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get('/login')
+            probes.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    workers = [threading.Thread(target=login, args=(n,)) for n in range(threads)]
+    workers.append(threading.Thread(target=probe))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, probes, codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--pools', default='0,2,4', help='AUTH_HASH_WORKERS values to compare')
+    parser.add_argument('--users', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'login.db')
+        build(path, args.users)
+        app.config['DATABASE'] = path
+        # Measure hashing, not the login throttle
+        app.config['LOGIN_USER_LIMIT'] = app.config['LOGIN_IP_LIMIT'] = (10 ** 9, 1)
+
+        print('%8s %10s %9s %9s %9s %8s %12s' % (
+            'workers', 'logins/s', 'p50 ms', 'p95 ms', 'p99 ms', '429s', 'probe p95'))
+        for workers in (int(w) for w in args.pools.split(',')):
+            app.config['AUTH_HASH_WORKERS'] = workers
+            app.extensions.pop('auth', None)
+            app.test_client().post('/login', data={'username': 'user0', 'password': PASSWORD})
+
+            latencies, probes, codes = run(args.threads, args.seconds, args.users)
+            print('%8d %10.1f %9.1f %9.1f %9.1f %8d %12.1f' % (
+                workers, len(latencies) / args.seconds,
+                percentile(latencies, 0.5), percentile(latencies, 0.95), percentile(latencies, 0.99),
+                codes.get(429, 0), percentile(probes, 0.95)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark listing-page latency at different depths and table sizes.
+
+Seeds a throwaway database per size through the real migrations, then
+requests the first, middle and last page of each keyset-paginated listing
+through the Flask test client (queries plus template rendering). With
+keyset pagination every column should stay flat as the table grows.
+
+Usage: python benchmarks/bench_pagination.py [--sizes 10000,100000,1000000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from db import connect
+from migrations import migrate
+from pagination import encode_cursor
+
+LISTINGS = (
+    ('/admin/users', 'SELECT created_at, id FROM users WHERE is_admin = 0'),
+    # The HTML reports page also runs whole-table aggregates; time the paged part
+    ('/admin/reports?format=json', 'SELECT created_at, id FROM users WHERE is_admin = 0'),
+    ('/admin/messages', 'SELECT created_at, id FROM platform_messages'),
+    ('/browse_skills', 'SELECT created_at, id FROM skills_offered WHERE is_approved = 1'),
+)
+
+
+def build(path, size, seed=7):
+    rng = random.Random(seed)
+    conn = connect(path)
+    migrate(conn)
+
+    # Timestamps repeat every few rows so the id tie-breaker is exercised
+    def stamp(i):
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(1700000000 + i // 3))
+
+    conn.execute("INSERT INTO users (username, email, password_hash, name, is_admin) "
+                 "VALUES ('admin', 'admin@example.com', '-', 'Admin', 1)")
+    conn.executemany('INSERT INTO users (username, email, password_hash, name, created_at) VALUES (?, ?, ?, ?, ?)',
+                     (('user%d' % i, 'user%d@example.com' % i, '-', 'User %d' % i, stamp(i))
+                      for i in range(size)))
+    conn.executemany('INSERT INTO skills_offered (user_id, skill_name, description, created_at) VALUES (?, ?, ?, ?)',
+                     ((rng.randint(2, size + 1), 'Skill %d' % i, 'description', stamp(i))
+                      for i in range(size)))
+    conn.executemany('INSERT INTO platform_messages (admin_id, title, message, created_at) VALUES (1, ?, ?, ?)',
+                     (('Title %d' % i, 'message', stamp(i)) for i in range(size // 10)))
+    conn.commit()
+    conn.execute('ANALYZE')
+    return conn
+
+
+def cursor_at(conn, sql, depth):
+    """Cursor that starts a page ``depth`` rows into the listing"""
+    row = conn.execute(sql + ' ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?', (depth,)).fetchone()
+    return encode_cursor(row['created_at'], row['id']) if row else None
+
+
+def timed(client, url, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (url, response.status_code)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('%10s  %-28s %10s %10s %10s' % ('rows', 'listing', 'first ms', 'middle ms', 'last ms'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(',')):
+            path = os.path.join(tmp, 'pages_%d.db' % size)
+            started = time.perf_counter()
+            conn = build(path, size)
+            print('# built %d users/skills in %.1fs' % (size, time.perf_counter() - started))
+
+            app.config['DATABASE'] = path
+            app.extensions.pop('db_pool', None)
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+
+            for url, sql in LISTINGS:
+                total = conn.execute('SELECT COUNT(*) FROM (%s)' % sql).fetchone()[0]
+                results = []
+                for depth in (0, total // 2, max(total - app.config['PAGE_SIZE'], 0)):
+                    cursor = cursor_at(conn, sql, depth) if depth else None
+                    page_url = url + ('%scursor=%s' % ('&' if '?' in url else '?', cursor) if cursor else '')
+                    results.append(timed(client, page_url, args.repeat))
+                print('%10d  %-28s %10.2f %10.2f %10.2f' % ((size, url) + tuple(results)))
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark row materialization and the prepared-statement cache.
+
+Builds a throwaway database of chat messages and times fetching a page of
+them as ``sqlite3.Row`` (the connection default) against the namedtuples
+``repository`` returns: fetch alone, fetch plus reading every column, and
+fetch plus rendering the fields through a Jinja template the way the pages
+do. It then cycles through every hot query in ``migrations.HOT_QUERIES`` on
+connections with different statement-cache sizes, to show what re-preparing
+evicted statements costs once the app runs more distinct statements than
+the cache holds.
+
+Usage: python benchmarks/bench_rows.py [--rows 100000] [--page 50,500,5000] [--repeat 50]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Template
+
+from db import connect
+from migrations import HOT_QUERIES, migrate
+from repository import _CHAT, ChatMessage
+
+PAGE_SQL = '''
+    SELECT %s
+    FROM room_messages rm
+    JOIN users u ON rm.user_id = u.id
+    WHERE rm.room_id = ? AND rm.id < ?
+    ORDER BY rm.id DESC
+    LIMIT ?
+''' % _CHAT
+
+TEMPLATE = Template('{% for m in messages %}<p id="{{ m.id }}">{{ m.name }}: {{ m.message }} '
+                    '{{ m.created_at }}</p>{% endfor %}')
+
+
+def build(path, rows):
+    conn = connect(path)
+    migrate(conn)
+    conn.executemany('INSERT INTO users (username, email, password_hash, name) VALUES (?, ?, ?, ?)',
+                     (('user%d' % i, 'user%d@example.com' % i, '-', 'User %d' % i) for i in range(100)))
+    conn.execute("INSERT INTO rooms (name, creator_id, room_code) VALUES ('Bench', 1, 'BENCH')")
+    conn.executemany('INSERT INTO room_messages (room_id, user_id, message) VALUES (1, ?, ?)',
+                     ((i % 100 + 1, 'message number %d' % i) for i in range(rows)))
+    conn.commit()
+    conn.execute('ANALYZE')
+    return conn
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def as_rows(conn, page):
+    return conn.execute(PAGE_SQL, (1, 2 ** 62, page)).fetchall()
+
+
+def as_tuples(conn, page):
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return list(map(ChatMessage._make, cursor.execute(PAGE_SQL, (1, 2 ** 62, page))))
+
+
+def read_rows(conn, page):
+    for row in as_rows(conn, page):
+        (row['id'], row['room_id'], row['user_id'], row['message'], row['created_at'], row['name'],
+         row['profile_photo'])
+
+
+def read_tuples(conn, page):
+    for row in as_tuples(conn, page):
+        row.id, row.room_id, row.user_id, row.message, row.created_at, row.name, row.profile_photo
+
+
+def statement_cycle(path, cached_statements, rounds):
+    """Run every hot query ``rounds`` times in turn on one connection"""
+    conn = sqlite3.connect(path, cached_statements=cached_statements)
+    conn.row_factory = sqlite3.Row
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for _label, sql, params in HOT_QUERIES:
+            conn.execute(sql, params).fetchall()
+    elapsed = (time.perf_counter() - started) * 1000
+    conn.close()
+    return elapsed / (rounds * len(HOT_QUERIES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--page', default='50,500,5000')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rows.db')
+        conn = build(path, args.rows)
+
+        print('%6s  %-8s %12s %12s %12s' % ('page', 'rows', 'fetch ms', 'read ms', 'render ms'))
+        for page in (int(p) for p in args.page.split(',')):
+            for label, fetch, read in (('Row', as_rows, read_rows), ('tuple', as_tuples, read_tuples)):
+                print('%6d  %-8s %12.3f %12.3f %12.3f' % (
+                    page, label,
+                    timed(lambda: fetch(conn, page), args.repeat),
+                    timed(lambda: read(conn, page), args.repeat),
+                    timed(lambda: TEMPLATE.render(messages=fetch(conn, page)), args.repeat)))
+        conn.close()
+
+        print()
+        print('%d distinct hot queries' % len(HOT_QUERIES))
+        print('%18s %16s' % ('cached statements', 'us per query'))
+        for size in (8, len(HOT_QUERIES) // 2, 128, 512):
+            per_query = statistics.median(statement_cycle(path, size, 20) for _ in range(5))
+            print('%18d %16.1f' % (size, per_query * 1000))
+
+
+if __name__ == '__main__':
+    main()
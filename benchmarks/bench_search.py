@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark skill search latency: leading-wildcard LIKE versus FTS5.
+
+Builds a throwaway database per catalogue size through the real migrations
+(so the FTS triggers populate the index), then times the browse_skills
+search both ways for a handful of terms.
+
+Usage: python benchmarks/bench_search.py [--sizes 10000,100000,1000000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connect
+from migrations import migrate
+from search import search_skills, search_skills_like
+
+WORDS = ('python guitar photoshop excel spanish cooking yoga piano drawing marketing '
+         'javascript chess knitting photography welding calculus french baking sql '
+         'accounting violin pottery woodworking running singing flask gardening').split()
+# Pad the skill vocabulary with made-up words so term selectivity looks like a
+# real catalogue rather than every skill sharing the same two dozen words
+SYLLABLES = 'ka lo mi ne ru ta vo zen qui bar dol fen gri hul jas'.split()
+WORDS += [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES[:4]][:1000]
+FILLER = ('learn teach beginner advanced weekly lessons online practical projects '
+          'fundamentals tips hands-on friendly patient structured course').split()
+TERMS = ('photo', 'guitar lessons', 'sql', 'advanced pottery', 'zzzz')
+
+
+def build(path, size, seed=7):
+    rng = random.Random(seed)
+    conn = connect(path)
+    migrate(conn)
+
+    users = max(size // 10, 1)
+    conn.executemany('INSERT INTO users (username, email, password_hash, name) VALUES (?, ?, ?, ?)',
+                     (('user%d' % i, 'user%d@example.com' % i, '-', 'User %d' % i) for i in range(users)))
+
+    def skill():
+        name = ' '.join(rng.sample(WORDS, 2)).title()
+        description = ' '.join(rng.choice(FILLER + WORDS) for _ in range(12))
+        return rng.randint(1, users), name, description
+
+    batch = 50000
+    for start in range(0, size, batch):
+        conn.executemany('INSERT INTO skills_offered (user_id, skill_name, description) VALUES (?, ?, ?)',
+                         (skill() for _ in range(min(batch, size - start))))
+        conn.commit()
+    conn.execute('ANALYZE')
+    return conn
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('%10s  %-18s %12s %12s %9s' % ('skills', 'term', 'LIKE ms', 'FTS ms', 'speedup'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(',')):
+            started = time.perf_counter()
+            conn = build(os.path.join(tmp, 'search_%d.db' % size), size)
+            print('# built %d skills in %.1fs' % (size, time.perf_counter() - started))
+
+            for term in TERMS:
+                like_ms = timed(lambda: search_skills_like(conn, term), args.repeat)
+                fts_ms = timed(lambda: search_skills(conn, term), args.repeat)
+                print('%10d  %-18s %12.2f %12.2f %8.1fx' % (size, term, like_ms, fts_ms, like_ms / fts_ms))
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
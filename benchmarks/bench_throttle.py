@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark the login throttle's bucket stores at millions of keys.
+
+Feeds a stream of distinct keys (as a credential-stuffing run would) through
+MemoryStore sized for --max-keys, reporting takes per second, buckets kept
+and memory per slot, then times SQLiteStore takes on a throwaway database.
+
+Usage: python benchmarks/bench_throttle.py [--keys 2000000] [--max-keys 1000000] [--sqlite-keys 20000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connect
+from migrations import migrate
+from throttle import MemoryStore, SQLiteStore, _key
+
+# Username limit defaults: 5 attempts refilled over 300 seconds
+BURST, INTERVAL = 5, 300 / 5
+
+
+def feed(store, keys):
+    now = time.time()
+    started = time.perf_counter()
+    for i in range(keys):
+        store.take(_key('user', 'user%d' % i), now, INTERVAL, BURST)
+    return keys / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--keys', type=int, default=2000000)
+    parser.add_argument('--max-keys', type=int, default=1000000)
+    parser.add_argument('--sqlite-keys', type=int, default=20000)
+    args = parser.parse_args()
+
+    store = MemoryStore(args.max_keys)
+    rate = feed(store, args.keys)
+    print('MemoryStore  %d keys fed, %d held, %d evicted: %.0f takes/s'
+          % (args.keys, store.stats()['keys'], store.evicted, rate))
+
+    tracemalloc.start()
+    store = MemoryStore(args.max_keys)
+    feed(store, args.keys)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('MemoryStore  %.1f MB for %d slots (%.0f bytes each)'
+          % (held / 2 ** 20, len(store._tats), held / len(store._tats)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'throttle.db')
+        conn = connect(path)
+        migrate(conn)
+        conn.close()
+        rate = feed(SQLiteStore(path), args.sqlite_keys)
+        print('SQLiteStore  %d keys fed: %.0f takes/s' % (args.sqlite_keys, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent profile photo uploads.
+
+Several threads post photos to /edit_profile through the Flask test client,
+each signed in as its own user. Reports upload request latency (p50/p95),
+uploads per second, how long the pipeline takes to drain afterwards, and
+the bytes a 64px avatar costs compared with the original upload.
+
+Real thumbnails need Pillow; without it the pipeline keeps originals and
+only the request side is measured.
+
+Usage: python benchmarks/bench_uploads.py [--threads 8] [--uploads 200] [--size 2000000]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from db import connect
+from images import Image, get_image_pipeline
+from migrations import migrate
+
+
+def make_photo(size):
+    """A JPEG of roughly ``size`` bytes (random bytes behind a JPEG header without Pillow)"""
+    if Image is None:
+        return b'\xff\xd8\xff\xe0' + os.urandom(size)
+    side = max(64, int((size / 3) ** 0.5))
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=95)
+    return out.getvalue()
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p), len(samples) - 1)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--uploads', type=int, default=200)
+    parser.add_argument('--size', type=int, default=2000000, help='approximate bytes per photo')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'uploads.db')
+        conn = connect(path)
+        migrate(conn)
+        conn.executemany('INSERT INTO users (id, username, email, password_hash, name) VALUES (?, ?, ?, ?, ?)',
+                         ((i, 'user%d' % i, 'user%d@example.com' % i, '-', 'User %d' % i)
+                          for i in range(1, args.threads + 1)))
+        conn.commit()
+        app.config['DATABASE'] = path
+        app.config['UPLOAD_FOLDER'] = tmp
+        app.config['IMAGE_QUEUE_SIZE'] = args.uploads
+
+        photos = [make_photo(args.size) for _ in range(4)]
+        latencies = []
+        per_thread = args.uploads // args.threads
+
+        def upload(user_id):
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+            for n in range(per_thread):
+                data = {'name': 'User %d' % user_id, 'is_public': '1',
+                        'profile_photo': (io.BytesIO(photos[(user_id + n) % len(photos)] + bytes([n % 256])),
+                                          'photo.jpg')}
+                started = time.perf_counter()
+                response = client.post('/edit_profile', data=data, content_type='multipart/form-data')
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 302, response.status_code
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=upload, args=(n + 1,)) for n in range(args.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        pipeline = get_image_pipeline(app)
+        pipeline.join()
+        drained = time.perf_counter() - started
+
+        print('%d uploads of ~%d KB from %d threads' % (len(latencies), args.size // 1024, args.threads))
+        print('upload request  p50 %.1f ms  p95 %.1f ms  %.1f uploads/s'
+              % (percentile(latencies, 0.5), percentile(latencies, 0.95), len(latencies) / elapsed))
+        print('pipeline drained %.2f s after the first upload (%s)'
+              % (drained, 'thumbnails' if Image is not None else 'no Pillow: originals kept'))
+
+        photo = conn.execute('SELECT profile_photo FROM users WHERE id = 1').fetchone()[0]
+        served = os.path.join(tmp, photo if '.' in photo else photo + '_64.webp')
+        print('64px avatar %d bytes vs original %d bytes' % (os.path.getsize(served), len(photos[0])))
+        print(pipeline.stats())
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
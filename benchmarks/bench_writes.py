@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark chat-message writes per second under different storage settings.
+
+Compares the old setup (rollback journal, one commit per post) against WAL
+with tuned PRAGMAs, and against WAL plus the group-commit writer thread.
+Several threads post concurrently, like a burst in a busy room.
+
+Usage: python benchmarks/bench_writes.py [--threads 8] [--posts 500]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import DEFAULT_PRAGMAS, WriteQueue, connect
+
+SCHEMA = '''
+    CREATE TABLE room_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room_id INTEGER,
+        user_id INTEGER,
+        message TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+INSERT = 'INSERT INTO room_messages (room_id, user_id, message) VALUES (?, ?, ?)'
+
+LEGACY_PRAGMAS = (
+    ('journal_mode', 'DELETE'),
+    ('synchronous', 'FULL'),
+    ('busy_timeout', 5000),
+)
+
+
+def fresh_database(directory, name):
+    path = os.path.join(directory, name)
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def run_threads(threads, posts, worker):
+    """Run ``worker(thread_no, post_no)`` posts across threads; return writes/sec"""
+    def loop(n):
+        for i in range(posts):
+            worker(n, i)
+
+    pool = [threading.Thread(target=loop, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return threads * posts / (time.perf_counter() - started)
+
+
+def bench_per_connection(path, pragmas, threads, posts):
+    """Every thread has its own connection and commits each post"""
+    local = threading.local()
+
+    def post(n, i):
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = connect(path, pragmas, timeout=30)
+        conn.execute(INSERT, (1, n, 'message %d' % i))
+        conn.commit()
+
+    return run_threads(threads, posts, post)
+
+
+def bench_write_queue(path, threads, posts):
+    """Every post is handed to the single writer and group-committed"""
+    writer = WriteQueue(path, DEFAULT_PRAGMAS)
+
+    def insert(conn, n, i):
+        return conn.execute(INSERT, (1, n, 'message %d' % i)).lastrowid
+
+    rate = run_threads(threads, posts, lambda n, i: writer.submit(insert, n, i).result())
+    return rate, writer.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--posts', type=int, default=500, help='posts per thread')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [
+            ('rollback journal, synchronous=FULL',
+             bench_per_connection(fresh_database(tmp, 'legacy.db'), LEGACY_PRAGMAS, args.threads, args.posts)),
+            ('WAL, synchronous=NORMAL',
+             bench_per_connection(fresh_database(tmp, 'wal.db'), DEFAULT_PRAGMAS, args.threads, args.posts)),
+        ]
+        rate, stats = bench_write_queue(fresh_database(tmp, 'queue.db'), args.threads, args.posts)
+        results.append(('WAL + group-commit writer', rate))
+
+    print('%d threads x %d posts' % (args.threads, args.posts))
+    baseline = results[0][1]
+    for label, rate in results:
+        print('  %-36s %10.0f writes/sec  (%.1fx)' % (label, rate, rate / baseline))
+    print('  writer batches: %(batches)d, avg batch %(avg_batch)s, largest %(largest_batch)d' % stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check for every SQL statement the routes run.
+
+Seeds a throwaway database at each of ``--scales`` and drives every route
+(bench_app.ROUTES plus the state-changing ones it leaves out) through the
+test client, recording each statement, with the parameters it was
+really called with, through the metrics statement hook. Every distinct
+statement (normalized as on the slow-queries page) is then run under
+``EXPLAIN QUERY PLAN`` and timed (median of ``--repeat`` runs; writes are
+rolled back).
+
+Plans are compared against the committed baseline (query_plans.json next
+to this file). The check fails (exit code 1) when a statement
+
+- gains a full table scan (``SCAN t`` without an index) it did not have, or
+- gains a ``USE TEMP B-TREE`` sort or grouping it did not have,
+
+including new statements that scan or sort from the start. It also fails
+when a route runs more statements per request than the baseline recorded,
+or more at a larger scale than at a smaller one beyond the growth the
+baseline already shows, which is what an N+1 loop looks like. Timings are
+reported per scale with their growth, for reading rather than pass/fail.
+
+After an intended plan change, review the report and re-run with
+``--update`` to rewrite the baseline.
+
+Usage: python benchmarks/check_query_plans.py [--scales tiny,small] [--repeat 5]
+                                              [--output plans.json] [--update]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, init_db
+from bench_app import ROUTES, ClientSession, fill, pick_ids
+from db import connect
+from metrics import Metrics, normalize_sql
+from migrations import full_scans, migrate
+from seed_data import SCALES, seed
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_plans.json')
+
+# Routes bench_app does not drive because they change or destroy state; run
+# after ROUTES, in this order, so each finds what it needs
+STATEFUL_ROUTES = (
+    ('register', 'POST', None, '/register', {'username': 'plancheck', 'email': 'plancheck@example.com',
+                                             'password': 'password', 'name': 'Plan Check'}),
+    ('edit_profile', 'POST', 'user', '/edit_profile', {'name': 'Plan Check', 'location': 'Here',
+                                                      'availability': 'Weekends', 'is_public': '1'}),
+    ('handle_swap_request', 'GET', 'user', '/handle_swap_request/{received_swap_id}/accept', None),
+    ('delete_swap_request', 'GET', 'user', '/delete_swap_request/{sent_swap_id}', None),
+    ('submit_rating', 'POST', 'user', '/submit_rating',
+     {'swap_id': '{swap_id}', 'rating': '5', 'feedback': 'plan check'}),
+    ('join_room_by_code', 'POST', 'user', '/join_room_by_code', {'room_code': '{room_code}'}),
+    ('invite_user_to_room', 'POST', 'user', '/invite_user_to_room',
+     {'room_id': '{own_room_id}', 'username': '{other_username}'}),
+    ('leave_room', 'GET', 'user', '/leave_room/{room_id}', None),
+    ('delete_room', 'POST', 'user', '/delete_room/{own_room_id}', None),
+    ('admin_ban_user', 'GET', 'admin', '/admin/ban_user/{other_user_id}', None),
+    ('admin_unban_user', 'GET', 'admin', '/admin/ban_user/{other_user_id}', None),
+    ('admin_approve_skill', 'GET', 'admin', '/admin/approve_skill/{skill_id}?action=reject', None),
+    ('admin_reapprove_skill', 'GET', 'admin', '/admin/approve_skill/{skill_id}', None),
+    ('admin_send_message', 'POST', 'admin', '/admin/send_message',
+     {'title': 'Plan check', 'message': 'plan check'}),
+    ('admin_delete_message', 'GET', 'admin', '/admin/delete_message/{message_id}', None),
+    ('admin_db_pool', 'GET', 'admin', '/admin/db_pool', None),
+    ('admin_auth', 'GET', 'admin', '/admin/auth', None),
+    ('admin_chat_hub', 'GET', 'admin', '/admin/chat_hub', None),
+    ('admin_images', 'GET', 'admin', '/admin/images', None),
+    ('logout', 'GET', 'user', '/logout', None),
+)
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def pick_stateful_ids(database, username):
+    """Ids for STATEFUL_ROUTES: a swap to accept, one to withdraw, rooms to join and leave, ..."""
+    conn = sqlite3.connect(database)
+    user_id = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()[0]
+
+    def first(sql, *params):
+        row = conn.execute(sql, params).fetchone()
+        return row[0] if row else 0
+
+    other = conn.execute('SELECT id, username FROM users WHERE id != ? AND is_admin = 0 LIMIT 1',
+                         (user_id,)).fetchone()
+    ids = {
+        'received_swap_id': first("SELECT id FROM swap_requests WHERE provider_id = ? AND status = 'pending'",
+                                  user_id),
+        'sent_swap_id': first("SELECT id FROM swap_requests WHERE requester_id = ? AND status = 'pending'",
+                              user_id),
+        'room_code': first('''
+            SELECT room_code FROM rooms WHERE is_public = 1 AND id NOT IN
+                (SELECT room_id FROM room_members WHERE user_id = ?)
+        ''', user_id) or 'NONE',
+        'own_room_id': first('SELECT id FROM rooms WHERE creator_id = ?', user_id),
+        'other_user_id': other[0] if other else 0,
+        'other_username': other[1] if other else '',
+        'message_id': first('SELECT id FROM platform_messages ORDER BY id DESC LIMIT 1'),
+    }
+    conn.close()
+    return ids
+
+
+class Recorder(Metrics):
+    """This worker's Metrics, also keeping every statement (with parameters) per route"""
+
+    def __init__(self):
+        super().__init__(sample_rate=1.0)
+        self.captured = {}
+        self.calls = 0
+        self.route = None
+
+    def observe_statement(self, sql, params, seconds, rows, endpoint=None):
+        super().observe_statement(sql, params, seconds, rows, endpoint)
+        if self.route is None or not sql.lstrip().upper().startswith(('SELECT', 'WITH') + WRITES):
+            return
+        self.calls += 1
+        entry = self.captured.setdefault(normalize_sql(sql), {'sql': sql, 'params': params, 'routes': set()})
+        entry['routes'].add(self.route)
+
+
+def read_plan(conn, sql, params):
+    """(plan lines, full scans, temp b-trees) for ``sql``"""
+    try:
+        rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    except sqlite3.ProgrammingError:
+        # executemany statements are recorded without parameters
+        rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, [None] * sql.count('?')).fetchall()
+    # Older SQLite says "SCAN TABLE t" / "SEARCH TABLE t"
+    plan = [row[3].replace('SCAN TABLE ', 'SCAN ').replace('SEARCH TABLE ', 'SEARCH ') for row in rows]
+    scans = sorted(set(full_scans(plan)))
+    temp = sorted(set(line for line in plan if 'USE TEMP B-TREE' in line))
+    return plan, scans, temp
+
+
+def time_statement(conn, sql, params, repeat):
+    """Median milliseconds for ``sql`` over ``repeat`` runs, rolled back; None if it fails"""
+    samples = []
+    for _ in range(repeat):
+        conn.execute('SAVEPOINT plan_check')
+        try:
+            started = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append(time.perf_counter() - started)
+        except sqlite3.Error:
+            return None
+        finally:
+            conn.execute('ROLLBACK TO plan_check')
+            conn.execute('RELEASE plan_check')
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def capture(scale, repeat, password='password', username='user1'):
+    """Seed at ``scale``, drive every route, then plan and time each statement"""
+    tmp = tempfile.TemporaryDirectory()
+    database = os.path.join(tmp.name, 'plans.db')
+    conn = connect(database)
+    migrate(conn)
+    seed(conn, password=password, **SCALES[scale])
+    conn.close()
+
+    app.config['DATABASE'] = database
+    app.config['UPLOAD_FOLDER'] = tmp.name
+    app.config['METRICS'] = True
+    # Every route must run its queries, not be answered from the page cache
+    app.config['PAGE_CACHE'] = False
+    app.config['LOGIN_USER_LIMIT'] = app.config['LOGIN_IP_LIMIT'] = (10 ** 9, 1)
+    init_db()
+
+    ids = dict(pick_ids(database, username), username=username, password=password)
+    recorder = app.extensions['metrics'] = Recorder()
+    sessions = {None: ClientSession(), 'user': ClientSession(), 'admin': ClientSession()}
+    sessions['user'].request('POST', '/login', {'username': username, 'password': password})
+    sessions['admin'].request('POST', '/login', {'username': 'admin', 'password': 'admin123'})
+
+    per_request = {}
+    for name, method, role, path, data in ROUTES:
+        recorder.route = name
+        # Run twice and count the second, warm request
+        for n in range(2):
+            recorder.calls = 0
+            sessions[role].request(method, fill(path, ids, n), fill(data, ids, n))
+        per_request[name] = recorder.calls
+    for name, method, role, path, data in STATEFUL_ROUTES:
+        # Picked afresh each time: the rooms created above, the message just sent, ...
+        ids.update(pick_stateful_ids(database, username))
+        recorder.route = name
+        recorder.calls = 0
+        sessions[role].request(method, fill(path, ids, 0), fill(data, ids, 0))
+        per_request[name] = recorder.calls
+
+    conn = sqlite3.connect(database)
+    statements = {}
+    for key, entry in recorder.captured.items():
+        plan, scans, temp = read_plan(conn, entry['sql'], entry['params'])
+        statements[key] = {'routes': sorted(entry['routes']), 'plan': plan, 'scans': scans,
+                           'temp_btrees': temp, 'ms': time_statement(conn, entry['sql'], entry['params'], repeat)}
+    sizes = {table: conn.execute('SELECT COUNT(*) FROM %s' % table).fetchone()[0]
+             for table in ('users', 'skills_offered', 'swap_requests', 'rooms', 'room_messages')}
+    conn.close()
+    tmp.cleanup()
+    return {'scale': scale, 'rows': sizes, 'statements': statements, 'per_request': per_request}
+
+
+def run_scale(scale, repeat):
+    """capture() in a fresh interpreter, so no cache or pool outlives its database"""
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--capture', scale,
+                                      '--repeat', str(repeat)])
+    return json.loads(output.decode('utf-8').splitlines()[-1])
+
+
+def merge(runs):
+    """One entry per statement with plans merged over all scales and ms per scale"""
+    statements = {}
+    for run in runs:
+        for key, entry in run['statements'].items():
+            merged = statements.setdefault(key, {'routes': set(), 'scans': set(), 'temp_btrees': set(),
+                                                 'plans': {}, 'ms': {}})
+            merged['routes'].update(entry['routes'])
+            merged['scans'].update(entry['scans'])
+            merged['temp_btrees'].update(entry['temp_btrees'])
+            merged['plans'][run['scale']] = entry['plan']
+            merged['ms'][run['scale']] = entry['ms']
+    for merged in statements.values():
+        for field in ('routes', 'scans', 'temp_btrees'):
+            merged[field] = sorted(merged[field])
+    return statements
+
+
+def regressions(statements, runs, baseline):
+    """Human-readable failures against ``baseline`` and across scales"""
+    failures = []
+    known = baseline.get('statements', {})
+    for key, entry in sorted(statements.items()):
+        was = known.get(key, {'scans': [], 'temp_btrees': []})
+        for field, what in (('scans', 'full scan'), ('temp_btrees', 'temp b-tree')):
+            for line in sorted(set(entry[field]) - set(was[field])):
+                failures.append('%s %s in %s (routes: %s)%s' % (
+                    'new' if key in known else 'new statement with', what, line, ', '.join(entry['routes']),
+                    '\n    ' + key[:200]))
+    counts = baseline.get('per_request', {})
+    for run in runs:
+        for route, count in run['per_request'].items():
+            was = counts.get(run['scale'], {}).get(route)
+            if was is not None and count > was:
+                failures.append('%s runs %d statements per request at %s (baseline %d)' % (
+                    route, count, run['scale'], was))
+    for smaller, larger in zip(runs, runs[1:]):
+        for route, count in larger['per_request'].items():
+            before = smaller['per_request'].get(route)
+            if before is None or count <= before:
+                continue
+            # Some routes fan out by design (admin approval refreshes every affected user's
+            # matches); only growth beyond what the baseline already shows counts
+            grew = counts.get(larger['scale'], {}).get(route, 0) - counts.get(smaller['scale'], {}).get(route, 0)
+            if count - before > grew:
+                failures.append('%s runs %d statements per request at %s but %d at %s (N+1?)' % (
+                    route, count, larger['scale'], before, smaller['scale']))
+    return failures
+
+
+def report(statements, runs):
+    scales = [run['scale'] for run in runs]
+    print('%-64s %s %8s  %s' % ('statement', ' '.join('%9s' % ('%s ms' % s) for s in scales), 'growth', 'plan'))
+    for key, entry in sorted(statements.items(), key=lambda item: -max(v or 0 for v in item[1]['ms'].values())):
+        ms = [entry['ms'].get(scale) for scale in scales]
+        growth = ms[-1] / ms[0] if len(ms) > 1 and ms[0] and ms[-1] is not None else None
+        flags = ', '.join(entry['scans'] + entry['temp_btrees']) or 'indexed'
+        print('%-64s %s %8s  %s' % (key[:64], ' '.join('%9s' % ('-' if v is None else '%.3f' % v) for v in ms),
+                                    '-' if growth is None else 'x%.1f' % growth, flags))
+    print('\n%-26s %s' % ('statements per request', ' '.join('%8s' % s for s in scales)))
+    for route in runs[0]['per_request']:
+        print('%-26s %s' % (route, ' '.join('%8s' % run['per_request'].get(route, '-') for run in runs)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', default='tiny,small', help='comma-separated seed_data scales, smallest first')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per statement')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update', action='store_true', help='accept the current plans as the baseline')
+    parser.add_argument('--output', help='write every plan and timing as JSON')
+    parser.add_argument('--capture', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.capture:
+        # Child mode: one scale, result as the last line of stdout
+        result = capture(args.capture, args.repeat)
+        sys.stdout.write('\n' + json.dumps(result) + '\n')
+        return 0
+
+    runs = []
+    for scale in args.scales.split(','):
+        print('Seeding and capturing at %s...' % scale, flush=True)
+        runs.append(run_scale(scale, args.repeat))
+    statements = merge(runs)
+    print('%d statements from %d routes\n' % (len(statements), len(runs[0]['per_request'])))
+    report(statements, runs)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                                'sqlite': sqlite3.sqlite_version,
+                                'rows': {run['scale']: run['rows'] for run in runs}},
+                       'statements': statements,
+                       'per_request': {run['scale']: run['per_request'] for run in runs}},
+                      f, indent=2, sort_keys=True)
+        print('\nWrote %s' % args.output)
+
+    if args.update:
+        with open(args.baseline, 'w') as f:
+            json.dump({'statements': {key: {'routes': entry['routes'], 'scans': entry['scans'],
+                                            'temp_btrees': entry['temp_btrees']}
+                                      for key, entry in statements.items()},
+                       'per_request': {run['scale']: run['per_request'] for run in runs}},
+                      f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('\nBaseline written to %s' % args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('\nNo baseline at %s; run with --update to create one' % args.baseline)
+        return 0
+    with open(args.baseline) as f:
+        failures = regressions(statements, runs, json.load(f))
+    for failure in failures:
+        print('FAIL  %s' % failure)
+    print('\n%d plan regression(s)' % len(failures))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Content-addressed storage for uploaded photos in ``static/uploads``.
+
+A blob is named after its content hash, so identical uploads share one set
+of files and a name always means the same bytes. A processed photo is the
+thumbnails ``<hash>_<size>.webp``; without Pillow it is ``<hash>.<ext>``;
+photos uploaded before hashing keep their old ``<user>_<name>`` file. In all
+cases the blob key is the value stored in ``users.profile_photo``.
+
+``blobs.refcount`` counts the users pointing at each key. :func:`set_photo`
+moves a user from one blob to another inside the caller's transaction. The
+garbage collector walks the upload folder with ``os.scandir`` and deletes
+files whose blob has no references, checking keys in batches so memory stays
+flat however many files there are. It only considers names the image
+pipeline creates (content-hashed thumbnails and originals, and partial
+uploads in ``incoming/``); anything else in the folder is never touched.
+Files younger than ``min_age`` are left alone because the image pipeline
+writes thumbnails before it commits the reference.
+
+Usage: python blobs.py [--dry-run] [--rebuild] [--min-age 3600] [--folder static/uploads] [database]
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import time
+
+# Content-hashed names, safe to cache forever
+REFERENCED_SQL = 'SELECT key FROM blobs WHERE refcount > 0 AND key IN (%s)'
+RELEASE_SQL = 'UPDATE blobs SET refcount = refcount - 1 WHERE key = ?'
+
+_HASHED = re.compile(r'^[0-9a-f]{32}(?:_\d+\.webp|\.\w+)$')
+_THUMBNAIL = re.compile(r'^([0-9a-f]{32})_\d+\.webp$')
+
+# Only files named like this are ever collected, whatever else shares the folder:
+# thumbnails (and their half-written .tmp), and originals kept without Pillow
+_COLLECTABLE = re.compile(r'^[0-9a-f]{32}(?:_\d+\.webp(?:\.tmp)?|\.(?:jpg|png|gif|webp))$')
+# Partial uploads in incoming/ are named by images.save_upload
+_INCOMING = re.compile(r'^[0-9a-f]{32}$')
+
+
+def is_immutable(name):
+    """True if ``name`` is a content-hashed upload whose bytes never change"""
+    return _HASHED.match(name) is not None
+
+
+def blob_key(name):
+    """Blob key (users.profile_photo value) an upload file belongs to"""
+    match = _THUMBNAIL.match(name)
+    return match.group(1) if match else name
+
+
+def set_photo(conn, user_id, photo):
+    """Point ``user_id`` at blob ``photo`` (None to clear) and move the references
+
+    Runs inside the caller's transaction. Returns the previous value.
+    """
+    row = conn.execute('SELECT profile_photo FROM users WHERE id = ?', (user_id,)).fetchone()
+    old = row[0] if row else None
+    if row is None or old == photo:
+        return old
+    conn.execute('UPDATE users SET profile_photo = ? WHERE id = ?', (photo, user_id))
+    if photo:
+        conn.execute('''
+            INSERT INTO blobs (key, refcount) VALUES (?, 1)
+            ON CONFLICT (key) DO UPDATE SET refcount = refcount + 1
+        ''', (photo,))
+    if old:
+        conn.execute(RELEASE_SQL, (old,))
+    return old
+
+
+def rebuild_refcounts(conn):
+    """Recompute every refcount from users.profile_photo; returns the number of keys changed"""
+    before = dict(conn.execute('SELECT key, refcount FROM blobs'))
+    conn.execute('UPDATE blobs SET refcount = 0')
+    conn.execute('''
+        INSERT INTO blobs (key, refcount)
+        SELECT profile_photo, COUNT(*) FROM users
+        WHERE profile_photo IS NOT NULL AND profile_photo != ''
+        GROUP BY profile_photo
+        ON CONFLICT (key) DO UPDATE SET refcount = excluded.refcount
+    ''')
+    after = dict(conn.execute('SELECT key, refcount FROM blobs'))
+    return sum(1 for key, count in after.items() if before.get(key) != count)
+
+
+def _referenced(conn, keys):
+    rows = conn.execute(REFERENCED_SQL % ','.join('?' * len(keys)), keys)
+    return {row[0] for row in rows}
+
+
+def collect_garbage(conn, folder, min_age=3600, dry_run=False, batch_size=500):
+    """Delete unreferenced upload files; returns (files removed, bytes freed)
+
+    Also drops blob rows left with no references and stale partial uploads
+    in ``incoming/``.
+    """
+    cutoff = time.time() - min_age
+    removed = freed = 0
+
+    def sweep(batch):
+        nonlocal removed, freed
+        live = _referenced(conn, sorted({key for key, _ in batch}))
+        for key, entry in batch:
+            if key in live:
+                continue
+            removed += 1
+            freed += entry.stat().st_size
+            if not dry_run:
+                os.unlink(entry.path)
+
+    batch = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if (not entry.is_file() or not _COLLECTABLE.match(entry.name)
+                    or entry.stat().st_mtime > cutoff):
+                continue
+            batch.append((blob_key(entry.name), entry))
+            if len(batch) >= batch_size:
+                sweep(batch)
+                batch = []
+    if batch:
+        sweep(batch)
+
+    incoming = os.path.join(folder, 'incoming')
+    if os.path.isdir(incoming):
+        with os.scandir(incoming) as entries:
+            for entry in entries:
+                if entry.is_file() and _INCOMING.match(entry.name) and entry.stat().st_mtime <= cutoff:
+                    removed += 1
+                    freed += entry.stat().st_size
+                    if not dry_run:
+                        os.unlink(entry.path)
+
+    if not dry_run:
+        conn.execute('DELETE FROM blobs WHERE refcount <= 0')
+        conn.commit()
+    return removed, freed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Delete uploaded files no user references')
+    parser.add_argument('database', nargs='?', default='skillswap.db')
+    parser.add_argument('--folder', default='static/uploads')
+    parser.add_argument('--min-age', type=int, default=3600, help='seconds before a new file may be collected')
+    parser.add_argument('--rebuild', action='store_true', help='recompute refcounts from users first')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be deleted')
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.database)
+    conn.execute('PRAGMA busy_timeout = 5000')
+    if args.rebuild:
+        print('Rebuilt refcounts; %d blobs changed' % rebuild_refcounts(conn))
+        conn.commit()
+    removed, freed = collect_garbage(conn, args.folder, args.min_age, args.dry_run)
+    print('%s %d files, %.1f MB' % ('Would remove' if args.dry_run else 'Removed', removed, freed / 2 ** 20))
+    conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
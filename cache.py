@@ -0,0 +1,73 @@
+"""
+Small per-worker caches for data shown on high-traffic pages.
+
+``CachedValue`` holds one loaded value for a TTL. ``SamplePool`` holds a
+precomputed pool of ids to draw random subsets from, so pages such as the
+home page no longer sort a whole table with ``ORDER BY RANDOM()``.
+
+Both refresh lazily: the first request after expiry or ``invalidate()``
+reloads, while concurrent requests keep serving the previous value instead
+of piling onto the same query.
+"""
+
+import os
+import random
+import threading
+import time
+from array import array
+
+
+class CachedValue:
+    """A value produced by ``loader()`` and reused for ``ttl`` seconds"""
+
+    def __init__(self, ttl):
+        self.pid = os.getpid()
+        self.ttl = ttl
+        self._value = None
+        self._loaded = False
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'loads': 0, 'invalidations': 0}
+
+    def get(self, loader):
+        if self._loaded and time.monotonic() < self._expires:
+            self._stats['hits'] += 1
+            return self._value
+
+        # Only one thread reloads; the rest use the stale value if there is one
+        if not self._lock.acquire(blocking=not self._loaded):
+            self._stats['hits'] += 1
+            return self._value
+        try:
+            if not self._loaded or time.monotonic() >= self._expires:
+                self._value = loader()
+                self._loaded = True
+                self._expires = time.monotonic() + self.ttl
+                self._stats['loads'] += 1
+            return self._value
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        """Reload on next use"""
+        self._expires = 0.0
+        self._stats['invalidations'] += 1
+
+    def stats(self):
+        return dict(self._stats, ttl=self.ttl)
+
+
+class SamplePool(CachedValue):
+    """A cached pool of integer ids to draw random samples from
+
+    ``loader()`` returns an iterable of ids; they are packed into an array
+    (8 bytes per id) so even a large catalogue stays compact.
+    """
+
+    def sample(self, loader, k, rng=random):
+        """Up to ``k`` distinct ids from the pool in random order, in O(k)"""
+        pool = self.get(lambda: array('q', loader()))
+        return rng.sample(pool, min(k, len(pool)))
+
+    def stats(self):
+        return dict(super().stats(), size=len(self._value) if self._loaded else 0)
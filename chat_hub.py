@@ -0,0 +1,219 @@
+"""
+In-process pub/sub hub that pushes room chat events to Server-Sent Events
+subscribers.
+
+A published event is fanned out once to every subscriber of the room. Each
+subscriber has a bounded queue; a subscriber that falls behind is dropped
+rather than buffered without limit, and its client reconnects with
+``Last-Event-ID`` to catch up from the database.
+
+The backend decides how events reach the hub. ``LocalBackend`` delivers
+directly and only works within one process. ``SQLiteBackend`` appends events
+to the ``hub_events`` table and every worker polls it, so several gunicorn
+workers can share one logical hub without an external broker.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+
+from db import per_worker
+
+
+class Subscription:
+    """One SSE client listening to one room"""
+
+    def __init__(self, room_id, maxsize):
+        self.room_id = room_id
+        self.queue = queue.Queue(maxsize)
+        self.dropped = False
+
+    def get(self, timeout):
+        """Next event, or None if nothing arrived before ``timeout``"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChatHub:
+    """Fan-out of room events to bounded per-client queues"""
+
+    def __init__(self, backend, queue_size=100):
+        self.pid = os.getpid()
+        self.queue_size = queue_size
+        self._rooms = {}
+        self._lock = threading.Lock()
+        self._stats = {'published': 0, 'delivered': 0, 'dropped_clients': 0}
+        self.backend = backend
+        backend.start(self)
+
+    def subscribe(self, room_id):
+        sub = Subscription(room_id, self.queue_size)
+        with self._lock:
+            self._rooms.setdefault(room_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._rooms.get(sub.room_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._rooms[sub.room_id]
+
+    def publish(self, room_id, event):
+        """Send ``event`` (a dict with an ``id``) to every subscriber of the room"""
+        self._stats['published'] += 1
+        self.backend.publish(room_id, event)
+
+    def fanout(self, room_id, event):
+        """Deliver an event to local subscribers; called by the backend"""
+        with self._lock:
+            subs = list(self._rooms.get(room_id, ()))
+
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(event)
+                self._stats['delivered'] += 1
+            except queue.Full:
+                # Too slow to keep up: drop it and let the client reconnect
+                sub.dropped = True
+                self.unsubscribe(sub)
+                self._stats['dropped_clients'] += 1
+
+    def stats(self):
+        with self._lock:
+            rooms = len(self._rooms)
+            clients = sum(len(subs) for subs in self._rooms.values())
+        return dict(self._stats, rooms=rooms, clients=clients,
+                    backend=type(self.backend).__name__)
+
+
+class LocalBackend:
+    """Deliver events directly within this process"""
+
+    def start(self, hub):
+        self.hub = hub
+
+    def publish(self, room_id, event):
+        self.hub.fanout(room_id, event)
+
+
+class SQLiteBackend:
+    """Share events between worker processes through the ``hub_events`` table
+
+    Publishing appends a row; a poller thread in each worker reads rows it has
+    not seen yet and fans them out locally. Old rows are pruned periodically.
+    """
+
+    def __init__(self, database, poll_interval=0.5, retention=300):
+        self.database = database
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._write_lock = threading.Lock()
+        self._writer = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout = 5000')
+        return conn
+
+    def start(self, hub):
+        self.hub = hub
+        self._writer = self._connect()
+        row = self._writer.execute('SELECT MAX(id) FROM hub_events').fetchone()
+        self._last_id = row[0] or 0
+        threading.Thread(target=self._poll, name='chat-hub-poller', daemon=True).start()
+
+    def publish(self, room_id, event):
+        with self._write_lock:
+            self._writer.execute('INSERT INTO hub_events (room_id, payload) VALUES (?, ?)',
+                                 (room_id, json.dumps(event)))
+
+    def _poll(self):
+        conn = self._connect()
+        last_prune = time.monotonic()
+        while True:
+            try:
+                rows = conn.execute('''
+                    SELECT id, room_id, payload FROM hub_events WHERE id > ? ORDER BY id
+                ''', (self._last_id,)).fetchall()
+                for event_id, room_id, payload in rows:
+                    self._last_id = event_id
+                    self.hub.fanout(room_id, json.loads(payload))
+
+                if time.monotonic() - last_prune > self.retention:
+                    conn.execute("DELETE FROM hub_events WHERE created_at < datetime('now', ?)",
+                                 ('-%d seconds' % self.retention,))
+                    last_prune = time.monotonic()
+            except sqlite3.Error:
+                # Locked or briefly unavailable; try again on the next tick
+                pass
+            time.sleep(self.poll_interval)
+
+
+def get_hub(app=None):
+    """Return this worker's hub, built from the CHAT_HUB_* settings"""
+    app = app or current_app
+
+    def build():
+        if app.config['CHAT_HUB_BACKEND'] == 'sqlite':
+            backend = SQLiteBackend(app.config['DATABASE'],
+                                    poll_interval=app.config['CHAT_HUB_POLL_INTERVAL'])
+        else:
+            backend = LocalBackend()
+        return ChatHub(backend, queue_size=app.config['CHAT_HUB_QUEUE_SIZE'])
+
+    return per_worker(app, 'chat_hub', build)
+
+
+def format_sse(data, event_id=None, event=None):
+    """Encode one Server-Sent Events frame"""
+    lines = []
+    if event_id is not None:
+        lines.append('id: %s' % event_id)
+    if event is not None:
+        lines.append('event: %s' % event)
+    lines.append('data: %s' % json.dumps(data))
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_room(hub, sub, backlog, last_id, heartbeat=15.0, reset=False):
+    """Generator of SSE frames: ``backlog`` first, then live events for ``sub``
+
+    The caller subscribes before loading the backlog so no message can slip
+    between the two; anything delivered twice is skipped by id. ``reset``
+    tells the client its gap was too large to replay and it should reload.
+    """
+    try:
+        # Tell the browser how quickly to reconnect after a drop
+        yield 'retry: 3000\n\n'
+
+        if reset:
+            yield format_sse({}, event='reset')
+            return
+
+        for event in backlog:
+            last_id = max(last_id, event['id'])
+            yield format_sse(event, event_id=event['id'])
+
+        while True:
+            event = sub.get(timeout=heartbeat)
+            if sub.dropped:
+                # Ending the stream makes EventSource reconnect with Last-Event-ID
+                return
+            if event is None:
+                yield ': heartbeat\n\n'
+                continue
+            if event['id'] <= last_id:
+                continue
+            last_id = event['id']
+            yield format_sse(event, event_id=event['id'])
+    finally:
+        hub.unsubscribe(sub)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Platform-wide counters for the admin pages.
+
+``platform_counters`` holds one row per statistic (users, skills, swaps by
+status) and ``skill_counts`` the number of approved skills per name. The
+routes that insert, delete or change the status of those rows bump the
+counters inside the same transaction, so the admin pages read a handful of
+rows instead of scanning whole tables.
+
+A reconciliation pass recomputes everything from the base tables, fixing any
+drift (for example rows changed by the maintenance scripts). It runs in a
+background thread every ``COUNTERS_RECONCILE_INTERVAL`` seconds and can be
+run by hand.
+
+Usage: python counters.py [database]    # reconcile now and report drift
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from flask import current_app
+
+from db import connect, per_worker
+
+# Each counter and the query that recomputes it from the base tables
+COUNTERS = {
+    'total_users': 'SELECT COUNT(*) FROM users WHERE is_admin = 0',
+    'total_skills': 'SELECT COUNT(*) FROM skills_offered',
+    'swaps_total': 'SELECT COUNT(*) FROM swap_requests',
+    'swaps_pending': "SELECT COUNT(*) FROM swap_requests WHERE status = 'pending'",
+    'swaps_accepted': "SELECT COUNT(*) FROM swap_requests WHERE status = 'accepted'",
+    'swaps_rejected': "SELECT COUNT(*) FROM swap_requests WHERE status = 'rejected'",
+}
+
+# Stored values of the counters named in the IN list
+COUNTERS_SQL = 'SELECT name, value, reconciled_at FROM platform_counters WHERE name IN (%s)'
+
+TOP_SKILLS_SQL = '''
+    SELECT skill_name, count FROM skill_counts
+    WHERE count > 0
+    ORDER BY count DESC
+    LIMIT ?
+'''
+
+_SWAP_STATUS = {'pending': 'swaps_pending', 'accepted': 'swaps_accepted', 'rejected': 'swaps_rejected'}
+
+
+def bump_counters(conn, **deltas):
+    """Add ``deltas`` (counter=amount) inside the caller's transaction"""
+    for name, delta in deltas.items():
+        if name not in COUNTERS:
+            raise ValueError('Unknown platform counter: %s' % name)
+        if delta:
+            conn.execute('''
+                INSERT INTO platform_counters (name, value) VALUES (?, ?)
+                ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+            ''', (name, delta))
+
+
+def swap_moved(conn, old_status, new_status):
+    """Count a swap request created (old None), deleted (new None) or re-statused"""
+    deltas = {}
+    if old_status is None:
+        deltas['swaps_total'] = 1
+    if new_status is None:
+        deltas['swaps_total'] = -1
+    if old_status in _SWAP_STATUS:
+        deltas[_SWAP_STATUS[old_status]] = -1
+    if new_status in _SWAP_STATUS:
+        name = _SWAP_STATUS[new_status]
+        deltas[name] = deltas.get(name, 0) + 1
+    bump_counters(conn, **deltas)
+
+
+def skill_approved(conn, skill_name, delta):
+    """Count an approved skill name gained (+1) or lost (-1)"""
+    conn.execute('''
+        INSERT INTO skill_counts (skill_name, count) VALUES (?, ?)
+        ON CONFLICT (skill_name) DO UPDATE SET count = count + excluded.count
+    ''', (skill_name, delta))
+
+
+def get_counters(conn):
+    """All counters as a dict, plus ``reconciled_at`` (oldest reconciliation)"""
+    counters = dict.fromkeys(COUNTERS, 0)
+    reconciled = []
+    for name, value, reconciled_at in conn.execute(
+            COUNTERS_SQL % ','.join('?' * len(COUNTERS)), tuple(COUNTERS)):
+        counters[name] = value
+        reconciled.append(reconciled_at)
+    counters['reconciled_at'] = None if None in reconciled or not reconciled else min(reconciled)
+    return counters
+
+
+def top_skills(conn, limit=10):
+    """Most offered approved skill names, highest count first"""
+    return conn.execute(TOP_SKILLS_SQL, (limit,)).fetchall()
+
+
+def recompute(conn):
+    """Overwrite every counter from the base tables; returns {name: (stored, actual)} for drifted ones
+
+    Must run inside a write transaction so no bump lands between the count
+    and the overwrite.
+    """
+    stored = {name: value for name, value in conn.execute('SELECT name, value FROM platform_counters')}
+    drift = {}
+    for name, sql in COUNTERS.items():
+        actual = conn.execute(sql).fetchone()[0]
+        if stored.get(name) != actual:
+            drift[name] = (stored.get(name), actual)
+        conn.execute('''
+            INSERT INTO platform_counters (name, value, reconciled_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (name) DO UPDATE SET value = excluded.value, reconciled_at = excluded.reconciled_at
+        ''', (name, actual))
+
+    conn.execute('DELETE FROM skill_counts')
+    conn.execute('''
+        INSERT INTO skill_counts (skill_name, count)
+        SELECT skill_name, COUNT(*) FROM skills_offered WHERE is_approved = 1 GROUP BY skill_name
+    ''')
+    return drift
+
+
+def reconcile(conn, min_age=0):
+    """Recompute the counters unless they were reconciled less than ``min_age`` seconds ago
+
+    Returns the drift found, or None if the counters were fresh enough.
+    Several workers may call this; the age check inside the write
+    transaction makes all but one of them skip.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        stale = conn.execute('''
+            SELECT COUNT(*) FROM platform_counters
+            WHERE reconciled_at IS NULL OR reconciled_at <= datetime('now', ?)
+        ''', ('-%d seconds' % min_age,)).fetchone()[0]
+        missing = len(COUNTERS) - conn.execute('SELECT COUNT(*) FROM platform_counters').fetchone()[0]
+        if not stale and missing <= 0:
+            conn.rollback()
+            return None
+        drift = recompute(conn)
+        conn.commit()
+        return drift
+    except Exception:
+        conn.rollback()
+        raise
+
+
+class Reconciler:
+    """Background thread reconciling the counters every ``interval`` seconds"""
+
+    def __init__(self, database, pragmas, interval):
+        self.pid = os.getpid()
+        self.database = database
+        self.pragmas = pragmas
+        self.interval = interval
+        self.runs = 0
+        self.last_drift = None
+        threading.Thread(target=self._run, name='counters-reconciler', daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                conn = connect(self.database, self.pragmas, check_same_thread=False)
+                try:
+                    drift = reconcile(conn, min_age=self.interval)
+                finally:
+                    conn.close()
+                if drift is not None:
+                    self.runs += 1
+                    self.last_drift = drift
+            except sqlite3.Error:
+                # Busy or locked; the next round will try again
+                pass
+            time.sleep(self.interval)
+
+
+def get_reconciler(app=None):
+    """Start (once per worker) and return the background reconciler"""
+    app = app or current_app
+    return per_worker(app, 'counters_reconciler', lambda: Reconciler(
+        app.config['DATABASE'], app.config['SQLITE_PRAGMAS'], app.config['COUNTERS_RECONCILE_INTERVAL']))
+
+
+if __name__ == '__main__':
+    conn = connect(sys.argv[1] if len(sys.argv) > 1 else 'skillswap.db')
+    drift = reconcile(conn)
+    for name, (stored, actual) in sorted(drift.items()):
+        print('%s: %s -> %s' % (name, stored, actual))
+    print('Reconciled %d counters (%d drifted)' % (len(COUNTERS), len(drift)))
+    conn.close()
@@ -0,0 +1,200 @@
+"""
+Everything the dashboard shows for one user, in one statement, cached per user.
+
+``load_dashboard`` gathers the user's skills, swap requests, rooms and
+matches with a single SELECT: each list is a column built with
+``json_group_array`` over an ordered subquery, and is decoded into the same
+namedtuples ``repository`` returns. Swap request lists are capped at
+``DASHBOARD_LIST_LIMIT`` and come with their full counts.
+
+The triggers from ``install_dashboard_triggers`` bump a per-user number in
+``dashboard_versions`` for every user whose dashboard a write changes: the
+owner of a skill, match or room membership row and both sides of a swap
+request. Changes to what the dashboard shows of other users and rooms bump
+the users showing them: a user's name, photo, ban or visibility for their
+match partners, their name for the other side of their swap requests and
+the members of rooms they created, and a room's name or visibility for its
+members. ``DashboardCache`` keeps each user's dashboard with the version it
+was loaded at, so a hit costs one primary-key lookup and stays correct
+across workers whatever code path made the write. Only rooms' member and
+message counts are not tracked (bumping every member of a room on each join
+would make deleting a room quadratic); an entry is reloaded after
+``DASHBOARD_CACHE_TTL`` seconds to pick those up.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+
+from db import per_worker
+from repository import _ROOM, _SWAP, MemberRoom, ReceivedSwap, SentSwap, Skill, WantedSkill
+
+Match = namedtuple('Match', 'other_id skill_id they_offer they_want score name location profile_photo')
+Dashboard = namedtuple('Dashboard', 'version skills_offered skills_wanted pending_requests pending_count '
+                                    'sent_requests sent_count user_rooms matches')
+
+# Whose dashboard a write to each table changes, by column of the written row
+_OWNERS = {
+    'skills_offered': ('user_id',),
+    'skills_wanted': ('user_id',),
+    'swap_requests': ('requester_id', 'provider_id'),
+    'skill_matches': ('user_id',),
+    'room_members': ('user_id',),
+}
+
+# Triggers for writes to other users and rooms: (trigger name, table, columns,
+# SELECT of the users whose dashboard shows them, over the NEW row)
+_DEPENDENTS = (
+    ('trg_users_dashboard_matches', 'users', ('name', 'location', 'profile_photo', 'is_banned', 'is_public'),
+     # Pairs are stored both ways, so these are the users listing NEW among their matches
+     'SELECT other_id FROM skill_matches WHERE user_id = NEW.id'),
+    ('trg_users_dashboard_name', 'users', ('name',), '''
+        SELECT provider_id FROM swap_requests WHERE requester_id = NEW.id
+        UNION SELECT requester_id FROM swap_requests WHERE provider_id = NEW.id
+        UNION SELECT rm.user_id FROM rooms r JOIN room_members rm ON rm.room_id = r.id
+        WHERE r.creator_id = NEW.id'''),
+    ('trg_rooms_dashboard_upd', 'rooms', ('name', 'description', 'is_public', 'room_code', 'creator_id'),
+     'SELECT user_id FROM room_members WHERE room_id = NEW.id'),
+)
+
+_BUMP = '''
+    INSERT INTO dashboard_versions (user_id, version) %s
+    ON CONFLICT (user_id) DO UPDATE SET version = version + 1;'''
+
+VERSION_SQL = 'SELECT version FROM dashboard_versions WHERE user_id = ?'
+
+DASHBOARD_SQL = '''
+    SELECT
+        (SELECT version FROM dashboard_versions WHERE user_id = :user_id),
+        (SELECT json_group_array(json_array(id, user_id, skill_name, description, is_approved, created_at))
+         FROM (SELECT * FROM skills_offered WHERE user_id = :user_id ORDER BY created_at DESC)),
+        (SELECT json_group_array(json_array(id, user_id, skill_name, description, created_at))
+         FROM (SELECT * FROM skills_wanted WHERE user_id = :user_id ORDER BY created_at DESC)),
+        (SELECT json_group_array(json_array(%(swap)s, requester_name, offered_skill))
+         FROM (SELECT sr.*, u.name as requester_name, so.skill_name as offered_skill
+               FROM swap_requests sr
+               JOIN users u ON sr.requester_id = u.id
+               JOIN skills_offered so ON sr.offered_skill_id = so.id
+               WHERE sr.provider_id = :user_id AND sr.status = 'pending'
+               ORDER BY sr.created_at DESC
+               LIMIT :limit) sr),
+        (SELECT COUNT(*) FROM swap_requests WHERE provider_id = :user_id AND status = 'pending'),
+        (SELECT json_group_array(json_array(%(swap)s, provider_name, offered_skill))
+         FROM (SELECT sr.*, u.name as provider_name, so.skill_name as offered_skill
+               FROM swap_requests sr
+               JOIN users u ON sr.provider_id = u.id
+               JOIN skills_offered so ON sr.offered_skill_id = so.id
+               WHERE sr.requester_id = :user_id
+               ORDER BY sr.created_at DESC
+               LIMIT :limit) sr),
+        (SELECT COUNT(*) FROM swap_requests WHERE requester_id = :user_id),
+        (SELECT json_group_array(json_array(%(room)s, creator_name, joined_at))
+         FROM (SELECT r.*, u.name as creator_name, rm.joined_at
+               FROM room_members rm
+               JOIN rooms r ON r.id = rm.room_id
+               JOIN users u ON r.creator_id = u.id
+               WHERE rm.user_id = :user_id
+               ORDER BY rm.joined_at DESC) r),
+        (SELECT json_group_array(json_array(other_id, skill_id, they_offer, they_want, score,
+                                            name, location, profile_photo))
+         FROM (SELECT m.*, u.name, u.location, u.profile_photo
+               FROM skill_matches m
+               JOIN users u ON m.other_id = u.id
+               WHERE m.user_id = :user_id AND u.is_banned = 0 AND u.is_public = 1
+               ORDER BY m.score DESC, m.other_id
+               LIMIT :matches))
+''' % {'swap': _SWAP.replace('sr.', ''), 'room': _ROOM.replace('r.', '')}
+
+
+def install_dashboard_triggers(conn):
+    """Create ``dashboard_versions`` and the triggers that bump it for each affected user"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS dashboard_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    for table, columns in _OWNERS.items():
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            users = ' UNION '.join('SELECT %s.%s' % (row, column) for column in columns)
+            conn.execute('CREATE TRIGGER IF NOT EXISTS trg_%s_dashboard_%s AFTER %s ON %s BEGIN %s END'
+                         % (table, event[:3].lower(), event, table,
+                            _BUMP % ('SELECT *, 1 FROM (%s) WHERE true' % users)))
+    for name, table, columns, users in _DEPENDENTS:
+        changed = ' OR '.join('OLD.%s IS NOT NEW.%s' % (column, column) for column in columns)
+        conn.execute('CREATE TRIGGER IF NOT EXISTS %s AFTER UPDATE OF %s ON %s WHEN %s BEGIN %s END'
+                     % (name, ', '.join(columns), table, changed,
+                        _BUMP % ('SELECT *, 1 FROM (%s) WHERE true' % users)))
+
+
+def load_dashboard(conn, user_id, limit=50, matches=6):
+    """Dashboard for ``user_id`` with at most ``limit`` rows per swap request list"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    row = cursor.execute(DASHBOARD_SQL, {'user_id': user_id, 'limit': limit, 'matches': matches}).fetchone()
+
+    def rows(column, row_type):
+        return [row_type._make(values) for values in json.loads(column)]
+
+    return Dashboard(row[0] or 0, rows(row[1], Skill), rows(row[2], WantedSkill), rows(row[3], ReceivedSwap),
+                     row[4], rows(row[5], SentSwap), row[6], rows(row[7], MemberRoom), rows(row[8], Match))
+
+
+def dashboard_version(conn, user_id):
+    row = conn.execute(VERSION_SQL, (user_id,)).fetchone()
+    return row[0] if row else 0
+
+
+class DashboardCache:
+    """Bounded per-worker cache of dashboards, checked against ``dashboard_versions``"""
+
+    def __init__(self, ttl=30, max_size=10000, limit=50):
+        self.pid = os.getpid()
+        self.ttl = ttl
+        self.max_size = max_size
+        self.limit = limit
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0}
+
+    def get(self, conn, user_id):
+        """Current dashboard for ``user_id``; one version lookup when cached"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry and now - entry[1] < self.ttl:
+            if entry[0].version == dashboard_version(conn, user_id):
+                with self._lock:
+                    self._stats['hits'] += 1
+                    if user_id in self._entries:
+                        self._entries.move_to_end(user_id)
+                return entry[0]
+            with self._lock:
+                self._stats['stale'] += 1
+
+        # The version is read in the same statement as the data, so it matches it
+        dashboard = load_dashboard(conn, user_id, self.limit)
+        with self._lock:
+            self._stats['misses'] += 1
+            self._entries[user_id] = (dashboard, now)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return dashboard
+
+    def stats(self):
+        lookups = self._stats['hits'] + self._stats['misses']
+        return dict(self._stats, size=len(self._entries), max_size=self.max_size, ttl=self.ttl,
+                    hit_rate=round(self._stats['hits'] / lookups, 4) if lookups else None)
+
+
+def get_dashboards(app=None):
+    """Return this worker's dashboard cache, built from the DASHBOARD_* settings"""
+    app = app or current_app
+    return per_worker(app, 'dashboards', lambda: DashboardCache(
+        ttl=app.config['DASHBOARD_CACHE_TTL'], max_size=app.config['DASHBOARD_CACHE_SIZE'],
+        limit=app.config['DASHBOARD_LIST_LIMIT']))
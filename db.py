@@ -0,0 +1,326 @@
+"""
+SQLite connection handling for the Skill Swap Platform.
+
+Each worker process keeps a bounded pool of pre-configured connections.
+A request borrows one connection through ``get_db()`` (cached on ``g``) and
+the teardown hook always hands it back, so routes never close it by hand.
+
+Every connection gets the same storage PRAGMAs (WAL, relaxed fsync, busy
+timeout, mmap and page cache). Writes can optionally be funnelled through a
+single writer thread that group-commits concurrent jobs in one transaction.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from flask import current_app, g
+
+
+# Applied to every connection, in order. journal_mode is persistent in the
+# database file; the rest are per-connection settings.
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),         # ms to retry on a locked database
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -16000),         # negative means KiB, so ~16MB
+    ('temp_store', 'MEMORY'),
+)
+
+
+def configure_connection(conn, pragmas=DEFAULT_PRAGMAS):
+    """Apply storage PRAGMAs to a freshly opened connection"""
+    for name, value in pragmas:
+        conn.execute('PRAGMA %s = %s' % (name, value))
+    return conn
+
+
+def connect(database, pragmas=DEFAULT_PRAGMAS, **kwargs):
+    """Open a configured connection outside the request cycle"""
+    conn = sqlite3.connect(database, **kwargs)
+    conn.row_factory = sqlite3.Row
+    return configure_connection(conn, pragmas)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free in time"""
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections for one worker process"""
+
+    def __init__(self, database, max_size=8, timeout=5.0, pragmas=DEFAULT_PRAGMAS, factory=sqlite3.Connection,
+                 cached_statements=128):
+        self.database = database
+        self.pragmas = pragmas
+        self.factory = factory
+        self.cached_statements = cached_statements
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = deque()
+        self._created = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'hits': 0,        # served from an idle connection
+            'misses': 0,      # had to open a new connection
+            'waits': 0,       # pool was exhausted and the caller blocked
+            'wait_time': 0.0,  # total seconds spent blocked
+            'timeouts': 0,    # gave up waiting
+            'discarded': 0,   # broken connections thrown away on release
+        }
+
+    def _connect(self):
+        """Open and configure a new connection"""
+        return connect(self.database, self.pragmas, check_same_thread=False, factory=self.factory,
+                       cached_statements=self.cached_statements)
+
+    def acquire(self):
+        """Borrow a connection, waiting up to ``timeout`` seconds if exhausted"""
+        with self._cond:
+            if self._idle:
+                self._stats['hits'] += 1
+                return self._idle.pop()
+
+            if self._created >= self.max_size:
+                self._stats['waits'] += 1
+                started = time.monotonic()
+                deadline = started + self.timeout
+                while not self._idle and self._created >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        self._stats['wait_time'] += time.monotonic() - started
+                        raise PoolTimeout('No database connection available after %.1fs' % self.timeout)
+                    self._cond.wait(remaining)
+                self._stats['wait_time'] += time.monotonic() - started
+                if self._idle:
+                    self._stats['hits'] += 1
+                    return self._idle.pop()
+
+            # Reserve a slot, then connect outside the lock
+            self._created += 1
+            self._stats['misses'] += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        """Return a borrowed connection to the pool"""
+        try:
+            # Never hand an open transaction to the next request
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._cond:
+                self._created -= 1
+                self._stats['discarded'] += 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._created -= 1
+
+    def stats(self):
+        """Snapshot of pool usage counters for sizing"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._created
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._created - len(self._idle)
+        stats['max_size'] = self.max_size
+        stats['pid'] = self.pid
+        requests = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / requests, 4) if requests else None
+        return stats
+
+
+class WriteQueue:
+    """Single writer thread that group-commits queued write jobs
+
+    Each job is a callable taking the writer's connection. Jobs that arrive
+    while a transaction is being committed are drained together and run
+    inside one ``BEGIN IMMEDIATE ... COMMIT``, each under its own savepoint
+    so a failing job only rolls back its own changes.
+    """
+
+    def __init__(self, database, pragmas=DEFAULT_PRAGMAS, max_batch=64, linger=0.0):
+        self.database = database
+        self.pragmas = pragmas
+        self.max_batch = max_batch
+        self.linger = linger
+        self.pid = os.getpid()
+        self._queue = queue.Queue()
+        self._stats = {'jobs': 0, 'batches': 0, 'failed': 0, 'largest_batch': 0}
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        """Queue ``fn(conn, *args)`` and return a Future for its result"""
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    def _drain(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        return batch
+
+    def _run(self):
+        conn = connect(self.database, self.pragmas, isolation_level=None)
+        while True:
+            batch = self._drain()
+            results = []
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                for future, fn, args in batch:
+                    conn.execute('SAVEPOINT job')
+                    try:
+                        results.append((future, fn(conn, *args), None))
+                    except Exception as exc:
+                        conn.execute('ROLLBACK TO job')
+                        results.append((future, None, exc))
+                    conn.execute('RELEASE job')
+                conn.execute('COMMIT')
+            except Exception as exc:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                results = [(future, None, exc) for future, _, _ in batch]
+
+            self._stats['batches'] += 1
+            self._stats['jobs'] += len(batch)
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], len(batch))
+            for future, result, exc in results:
+                if exc is None:
+                    future.set_result(result)
+                else:
+                    self._stats['failed'] += 1
+                    future.set_exception(exc)
+
+    def stats(self):
+        """Snapshot of writer counters"""
+        stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize()
+        stats['avg_batch'] = round(stats['jobs'] / stats['batches'], 2) if stats['batches'] else None
+        return stats
+
+
+# Reentrant: a factory may build the per-worker objects it depends on
+_worker_lock = threading.RLock()
+
+
+def per_worker(app, key, factory):
+    """Return ``app.extensions[key]``, rebuilding it in a forked worker"""
+    obj = app.extensions.get(key)
+    if obj is None or obj.pid != os.getpid():
+        with _worker_lock:
+            obj = app.extensions.get(key)
+            if obj is None or obj.pid != os.getpid():
+                obj = factory()
+                app.extensions[key] = obj
+    return obj
+
+
+def get_pool(app=None):
+    """Return this worker's pool, creating a fresh one after a fork"""
+    app = app or current_app
+    return per_worker(app, 'db_pool', lambda: ConnectionPool(
+        app.config['DATABASE'],
+        max_size=app.config['DB_POOL_SIZE'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        pragmas=app.config['SQLITE_PRAGMAS'],
+        factory=app.config['DB_CONNECTION_FACTORY'],
+        cached_statements=app.config['DB_STATEMENT_CACHE']))
+
+
+def get_write_queue(app=None):
+    """Return this worker's writer thread"""
+    app = app or current_app
+    return per_worker(app, 'db_write_queue', lambda: WriteQueue(
+        app.config['DATABASE'],
+        pragmas=app.config['SQLITE_PRAGMAS'],
+        max_batch=app.config['DB_WRITE_BATCH'],
+        linger=app.config['DB_WRITE_LINGER']))
+
+
+def write(fn, *args):
+    """Run the write job ``fn(conn, *args)`` and commit it
+
+    With ``DB_WRITE_QUEUE`` enabled the job is handed to the writer thread and
+    committed together with whatever else is queued; otherwise it runs on the
+    request's own connection.
+    """
+    if current_app.config['DB_WRITE_QUEUE']:
+        return get_write_queue().submit(fn, *args).result()
+
+    conn = get_db()
+    result = fn(conn, *args)
+    conn.commit()
+    return result
+
+
+def _execute(conn, sql, params):
+    return conn.execute(sql, params).lastrowid
+
+
+def execute_write(sql, params=()):
+    """Run a single INSERT/UPDATE/DELETE through ``write()``; returns lastrowid"""
+    return write(_execute, sql, params)
+
+
+def get_db():
+    """Get the database connection for the current request"""
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+def close_db(exc=None):
+    """Return the request's connection to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+def init_app(app):
+    """Register pool defaults and the teardown hook on the app"""
+    app.config.setdefault('DATABASE', 'skillswap.db')
+    app.config.setdefault('DB_POOL_SIZE', 8)
+    app.config.setdefault('DB_POOL_TIMEOUT', 5.0)
+    app.config.setdefault('SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+    app.config.setdefault('DB_CONNECTION_FACTORY', sqlite3.Connection)
+    app.config.setdefault('DB_STATEMENT_CACHE', 128)
+    app.config.setdefault('DB_WRITE_QUEUE', False)
+    app.config.setdefault('DB_WRITE_BATCH', 64)
+    app.config.setdefault('DB_WRITE_LINGER', 0.0)
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,132 @@
+"""
+Streaming exports of the admin reports as CSV or NDJSON.
+
+Each report is a query whose rows are read with ``fetchmany`` in batches and
+written out as they arrive, so a full dump costs one batch of memory however
+many rows it has. The generator borrows its own pooled connection because it
+keeps running after the view function has returned.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+# name -> (columns, query, date column used by ?since= / ?until=)
+REPORTS = {
+    'user_activity': (
+        ('id', 'name', 'username', 'created_at', 'skills_offered', 'skills_wanted',
+         'total_swaps', 'swaps_completed', 'avg_rating'),
+        '''
+        SELECT u.id, u.name, u.username, u.created_at,
+               COALESCE(s.skills_offered, 0), COALESCE(s.skills_wanted, 0),
+               COALESCE(s.swap_requests, 0), COALESCE(s.swaps_completed, 0),
+               ROUND(1.0 * s.rating_sum / NULLIF(s.rating_count, 0), 2)
+        FROM users u
+        LEFT JOIN user_stats s ON s.user_id = u.id
+        WHERE u.is_admin = 0 AND {range}
+        ORDER BY u.created_at, u.id
+        ''',
+        'u.created_at',
+    ),
+    'swap_stats': (
+        ('day', 'total_requests', 'pending', 'accepted', 'rejected'),
+        '''
+        SELECT date(created_at) AS day, COUNT(*),
+               SUM(status = 'pending'), SUM(status = 'accepted'), SUM(status = 'rejected')
+        FROM swap_requests
+        WHERE {range}
+        GROUP BY day
+        ORDER BY day
+        ''',
+        'created_at',
+    ),
+    'top_skills': (
+        ('skill_name', 'count'),
+        '''
+        SELECT skill_name, COUNT(*) AS count
+        FROM skills_offered
+        WHERE is_approved = 1 AND {range}
+        GROUP BY skill_name
+        ORDER BY count DESC, skill_name
+        ''',
+        'created_at',
+    ),
+    'ratings': (
+        ('id', 'swap_request_id', 'rater_id', 'rater_username', 'rated_id', 'rated_username',
+         'rating', 'feedback', 'created_at'),
+        '''
+        SELECT r.id, r.swap_request_id, r.rater_id, u1.username, r.rated_id, u2.username,
+               r.rating, r.feedback, r.created_at
+        FROM ratings r
+        LEFT JOIN users u1 ON r.rater_id = u1.id
+        LEFT JOIN users u2 ON r.rated_id = u2.id
+        WHERE {range}
+        ORDER BY r.created_at, r.id
+        ''',
+        'r.created_at',
+    ),
+}
+
+FORMATS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+_STAMP = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_day(value):
+    """'YYYY-MM-DD' -> datetime, None if empty; ValueError if malformed"""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def build_query(report, since=None, until=None):
+    """Columns, SQL and params for ``report`` between two days, both inclusive
+
+    ``since``/``until`` are 'YYYY-MM-DD' strings (either may be None).
+    Raises KeyError for an unknown report and ValueError for a bad date.
+    """
+    columns, sql, date_column = REPORTS[report]
+    conditions, params = [], []
+    start, end = parse_day(since), parse_day(until)
+    if start:
+        conditions.append('%s >= ?' % date_column)
+        params.append(start.strftime(_STAMP))
+    if end:
+        conditions.append('%s < ?' % date_column)
+        params.append((end + timedelta(days=1)).strftime(_STAMP))
+    return columns, sql.format(range=' AND '.join(conditions) or '1 = 1'), params
+
+
+def count_rows(conn, sql, params):
+    """Number of rows the export will produce"""
+    return conn.execute('SELECT COUNT(*) FROM (%s)' % sql, params).fetchone()[0]
+
+
+def _encode(fmt, columns, rows):
+    if fmt == 'ndjson':
+        return ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def stream_export(pool, fmt, columns, sql, params, batch_size=1000):
+    """Generator of encoded chunks, one per ``fetchmany`` batch
+
+    Borrows a connection from ``pool`` for the life of the stream and gives
+    it back when the client finishes or disconnects.
+    """
+    conn = pool.acquire()
+    try:
+        if fmt == 'csv':
+            yield _encode(fmt, columns, [columns])
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield _encode(fmt, columns, [tuple(row) for row in rows])
+        cursor.close()
+    finally:
+        pool.release(conn)
@@ -0,0 +1,225 @@
+"""
+Profile photo uploads: stream to disk, make thumbnails in the background.
+
+``save_upload`` copies the upload to a temporary file in fixed-size chunks,
+hashing it on the way, so the request thread never holds the whole image in
+memory. ``ImagePipeline`` then resizes it on a background thread into square
+WebP thumbnails (``THUMBNAIL_SIZES``) named ``<hash>_<size>.webp`` and points
+``users.profile_photo`` at the hash. Identical uploads share one set of
+thumbnails (see blobs.py for reference counting and garbage collection).
+
+Thumbnails need Pillow. Without it the pipeline keeps the original under its
+content-hash name instead, and ``avatar_url`` serves that.
+"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+from flask import current_app, url_for
+
+from blobs import set_photo
+from db import connect, per_worker
+from sessions import get_principals
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: originals are served as-is
+    Image = None
+
+THUMBNAIL_SIZES = (64, 128, 256)
+
+# Leading bytes of the formats accepted as profile photos
+_SIGNATURES = {
+    b'\xff\xd8\xff': 'jpg',
+    b'\x89PNG\r\n\x1a\n': 'png',
+    b'GIF87a': 'gif',
+    b'GIF89a': 'gif',
+}
+
+
+class UploadRejected(Exception):
+    """The upload is not an image we accept"""
+
+
+class UploadBusy(Exception):
+    """The processing queue is full; the caller should retry later"""
+
+
+def _sniff(head):
+    for signature, ext in _SIGNATURES.items():
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    raise UploadRejected('Profile photos must be JPEG, PNG, GIF or WebP images')
+
+
+def save_upload(stream, folder, chunk_size=64 * 1024):
+    """Copy ``stream`` into ``folder`` chunk by chunk; returns (path, sha256 hex, extension)"""
+    incoming = os.path.join(folder, 'incoming')
+    os.makedirs(incoming, exist_ok=True)
+    path = os.path.join(incoming, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    ext = None
+    try:
+        with open(path, 'wb') as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                if ext is None:
+                    ext = _sniff(chunk)
+                digest.update(chunk)
+                out.write(chunk)
+        if ext is None:
+            raise UploadRejected('The uploaded file is empty')
+    except Exception:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest(), ext
+
+
+def photo_key(digest):
+    """Value stored in users.profile_photo for a processed upload"""
+    return digest[:32]
+
+
+def avatar_url(photo, size):
+    """URL of ``photo`` (a users.profile_photo value) for a ``size`` px square
+
+    Processed uploads have no extension and come in THUMBNAIL_SIZES; the
+    smallest one at least ``size`` wide is used. Older values are full-size
+    originals.
+    """
+    if not photo:
+        return None
+    if '.' in photo:
+        return url_for('media', name=photo)
+    size = next((s for s in THUMBNAIL_SIZES if s >= size), THUMBNAIL_SIZES[-1])
+    return url_for('media', name='%s_%d.webp' % (photo, size))
+
+
+def make_thumbnails(source, folder, key, sizes=THUMBNAIL_SIZES, quality=80):
+    """Write ``<key>_<size>.webp`` centre crops of ``source`` into ``folder``"""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for size in sizes:
+            thumb = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            tmp = os.path.join(folder, '%s_%d.webp.tmp' % (key, size))
+            thumb.save(tmp, 'WEBP', quality=quality, method=4)
+            # Rename last so a half-written thumbnail is never served
+            os.replace(tmp, os.path.join(folder, '%s_%d.webp' % (key, size)))
+
+
+class ImagePipeline:
+    """Background threads turning saved uploads into thumbnails
+
+    At most ``queue_size`` uploads wait; past that ``submit`` raises
+    ``UploadBusy``. When a job finishes, the user's profile_photo is updated
+    and ``on_done(user_id)`` is called, unless a newer upload from the same
+    user has been submitted meanwhile.
+    """
+
+    def __init__(self, database, pragmas, folder, workers=1, queue_size=100, on_done=None):
+        self.pid = os.getpid()
+        self.database = database
+        self.pragmas = pragmas
+        self.folder = folder
+        self.on_done = on_done
+        self._queue = queue.Queue(queue_size)
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._latency = deque(maxlen=1000)
+        self._stats = {'submitted': 0, 'processed': 0, 'deduplicated': 0, 'fallback': 0,
+                       'failed': 0, 'superseded': 0, 'rejected': 0}
+        for n in range(workers):
+            threading.Thread(target=self._run, name='image-pipeline-%d' % n, daemon=True).start()
+
+    def submit(self, user_id, path, digest, ext):
+        """Queue a saved upload for ``user_id``"""
+        job = (user_id, path, digest, ext, time.monotonic())
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._stats['rejected'] += 1
+                raise UploadBusy()
+            self._latest[user_id] = job
+            self._stats['submitted'] += 1
+
+    def _process(self, path, digest, ext):
+        """Thumbnails (or the original, without Pillow) for an upload; returns the profile_photo value"""
+        key = photo_key(digest)
+        if Image is None:
+            self._stats['fallback'] += 1
+            name = '%s.%s' % (key, ext)
+            os.replace(path, os.path.join(self.folder, name))
+            return name
+        try:
+            names = [os.path.join(self.folder, '%s_%d.webp' % (key, size)) for size in THUMBNAIL_SIZES]
+            if all(os.path.exists(name) for name in names):
+                # Same content as an existing blob; touch it so the GC grace period covers the new reference
+                for name in names:
+                    os.utime(name)
+                self._stats['deduplicated'] += 1
+            else:
+                make_thumbnails(path, self.folder, key)
+        finally:
+            os.unlink(path)
+        return key
+
+    def _run(self):
+        conn = connect(self.database, self.pragmas, check_same_thread=False)
+        while True:
+            job = self._queue.get()
+            user_id, path, digest, ext, queued_at = job
+            try:
+                photo = self._process(path, digest, ext)
+                with self._lock:
+                    current = self._latest.get(user_id) is job
+                    if current:
+                        del self._latest[user_id]
+                if not current:
+                    self._stats['superseded'] += 1
+                    continue
+                set_photo(conn, user_id, photo)
+                conn.commit()
+                if self.on_done:
+                    self.on_done(user_id)
+                self._stats['processed'] += 1
+                self._latency.append(time.monotonic() - queued_at)
+            except Exception:
+                # Unreadable image, disk or database trouble; the old photo stays
+                self._stats['failed'] += 1
+                with self._lock:
+                    if self._latest.get(user_id) is job:
+                        del self._latest[user_id]
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Wait until every queued upload has been handled"""
+        self._queue.join()
+
+    def stats(self):
+        samples = sorted(self._latency)
+
+        def percentile(p):
+            return round(samples[min(int(len(samples) * p), len(samples) - 1)] * 1000, 2) if samples else None
+
+        return dict(self._stats, queued=self._queue.qsize(), thumbnails=Image is not None,
+                    latency_ms={'p50': percentile(0.5), 'p95': percentile(0.95), 'samples': len(samples)})
+
+
+def get_image_pipeline(app=None):
+    """Return this worker's image pipeline, built from the IMAGE_* settings"""
+    app = app or current_app
+    return per_worker(app, 'image_pipeline', lambda: ImagePipeline(
+        app.config['DATABASE'], app.config['SQLITE_PRAGMAS'], app.config['UPLOAD_FOLDER'],
+        workers=app.config['IMAGE_WORKERS'], queue_size=app.config['IMAGE_QUEUE_SIZE'],
+        on_done=get_principals(app).invalidate))
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Reciprocal skill matching: who offers what I want and wants what I offer.
+
+Skill names are reduced to a normalized ``skill_key`` stored next to every
+offered and wanted skill; the ``(skill_key, user_id)`` indexes act as the
+inverted index from a skill to the users offering or wanting it.
+
+Two-way matches are materialized in ``skill_matches`` (one row per direction),
+but only each user's best ``MATCHES_PER_USER`` by score: with a few popular
+skills nearly every pair of users matches, so storing them all grows with
+the square of the user count. A pair is kept while it is in the top list of
+either side. ``_TOP_PARTNERS`` finds one user's best partners in SQL, so a
+full rebuild streams user by user and never holds more than one user's
+candidates. When a user's skill with key K changes, their own list is
+recomputed and their stored pairs with users on the other side of K are
+refreshed, and the pair is added for anyone whose own top list they now
+make. A partner who loses a match keeps the pairs below it and is only
+recomputed once their list runs short, so the last places of a list can
+lag until the next full rebuild (``python matching.py``). Three-way cycles
+(A learns from B, B from C, C from A) are found on request by a bounded
+walk over the same inverted index.
+
+That update reads every user on the other side of K, so routes do not run
+it: they add the change to ``match_queue`` in their own transaction and a
+background thread per worker (``MatchQueue``) applies it after the commit,
+one change per transaction. The full rebuild is too slow for a migration
+or a running site; run it offline after upgrading an existing database.
+
+Usage: python matching.py [database]    # rebuild every match from scratch
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+from flask import current_app
+
+from db import connect, per_worker
+
+_NON_WORD = re.compile(r'[^\w+#]+', re.UNICODE)
+
+# Matches kept per user; get_matches never reads past this many
+MATCHES_PER_USER = 50
+
+# The best ``:limit`` reciprocal partners of ``:user_id``, scored by skills
+# taught each way, with the [id, name] skills of each direction as JSON.
+# With ``:theirs`` set, also every partner whose own stored top ``:limit``
+# the user now belongs in, unless that pair is already stored as it is.
+_TOP_PARTNERS = '''
+    WITH learners AS (
+        SELECT sw.user_id AS other_id, COUNT(DISTINCT so.id) AS n
+        FROM skills_offered so
+        JOIN skills_wanted sw ON sw.skill_key = so.skill_key
+        WHERE so.user_id = :user_id AND so.is_approved = 1 AND sw.user_id != :user_id
+        GROUP BY sw.user_id
+    ), teachers AS (
+        SELECT so.user_id AS other_id, COUNT(*) AS n
+        FROM skills_offered so
+        WHERE so.skill_key IN (SELECT skill_key FROM skills_wanted WHERE user_id = :user_id)
+        AND so.is_approved = 1 AND so.user_id != :user_id
+        GROUP BY so.user_id
+    ), partners AS (
+        SELECT teachers.other_id, teachers.n + learners.n AS score
+        FROM teachers
+        JOIN learners ON learners.other_id = teachers.other_id
+    ), top AS (
+        SELECT other_id FROM (SELECT other_id FROM partners ORDER BY score DESC, other_id LIMIT :limit)
+        UNION
+        SELECT other_id FROM partners
+        WHERE :theirs
+        AND NOT EXISTS (SELECT 1 FROM skill_matches
+                        WHERE user_id = :user_id AND other_id = partners.other_id AND score = partners.score)
+        AND (
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM skill_matches m
+                WHERE m.user_id = partners.other_id AND m.other_id != :user_id
+                AND (m.score > partners.score OR (m.score = partners.score AND m.other_id < :user_id))
+                LIMIT :limit)) < :limit
+    )
+    SELECT other_id,
+           (SELECT json_group_array(json_array(id, skill_name)) FROM (
+                SELECT so.id, so.skill_name FROM skills_offered so
+                WHERE so.user_id = top.other_id AND so.is_approved = 1
+                AND so.skill_key IN (SELECT skill_key FROM skills_wanted WHERE user_id = :user_id)
+                ORDER BY so.id)),
+           (SELECT json_group_array(json_array(id, skill_name)) FROM (
+                SELECT so.id, so.skill_name FROM skills_offered so
+                WHERE so.user_id = :user_id AND so.is_approved = 1
+                AND so.skill_key IN (SELECT skill_key FROM skills_wanted WHERE user_id = top.other_id)
+                ORDER BY so.id))
+    FROM top
+'''
+
+
+def normalize_skill(name):
+    """Key used to compare skills: 'Guitar  (Acoustic)' -> 'guitar acoustic'"""
+    return _NON_WORD.sub(' ', (name or '').lower()).strip()
+
+
+def _teachable(conn, teacher_id, learner_id):
+    """Approved skills ``teacher_id`` offers that ``learner_id`` wants"""
+    return conn.execute('''
+        SELECT so.id, so.skill_name
+        FROM skills_offered so
+        WHERE so.user_id = ? AND so.is_approved = 1
+        AND so.skill_key IN (SELECT skill_key FROM skills_wanted WHERE user_id = ?)
+        ORDER BY so.id
+    ''', (teacher_id, learner_id)).fetchall()
+
+
+# Rows that have not changed are left alone, so their dashboards stay cached
+_UPSERT = '''
+    INSERT INTO skill_matches (user_id, other_id, skill_id, they_offer, they_want, score)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, other_id) DO UPDATE SET
+        skill_id = excluded.skill_id,
+        they_offer = excluded.they_offer,
+        they_want = excluded.they_want,
+        score = excluded.score,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE skill_id IS NOT excluded.skill_id OR they_offer != excluded.they_offer
+    OR they_want != excluded.they_want OR score != excluded.score
+'''
+
+
+def _directions(a, b, b_teaches_a, a_teaches_b):
+    """The two ``skill_matches`` rows of a pair, one per direction"""
+    score = len(b_teaches_a) + len(a_teaches_b)
+    return [(user_id, other_id, they_offer[0][0],
+             ', '.join(sorted({name for _, name in they_offer})),
+             ', '.join(sorted({name for _, name in they_want})),
+             score)
+            for user_id, other_id, they_offer, they_want in ((a, b, b_teaches_a, a_teaches_b),
+                                                             (b, a, a_teaches_b, b_teaches_a))]
+
+
+def _store_pair(conn, a, b, b_teaches_a, a_teaches_b):
+    conn.executemany(_UPSERT, _directions(a, b, b_teaches_a, a_teaches_b))
+
+
+def _delete_pair(conn, a, b):
+    conn.execute('''
+        DELETE FROM skill_matches WHERE (user_id = ? AND other_id = ?) OR (user_id = ? AND other_id = ?)
+    ''', (a, b, b, a))
+
+
+def _store_top(conn, user_id, limit, theirs=False):
+    """Store the best ``limit`` matches of ``user_id``; returns ``{other_id: score}``
+
+    ``theirs`` also stores the pairs that now make a partner's own top list.
+    """
+    scores = {}
+    rows = []
+    for other_id, they_offer, they_want in conn.execute(_TOP_PARTNERS, {'user_id': user_id, 'limit': limit,
+                                                                        'theirs': theirs}).fetchall():
+        they_offer, they_want = json.loads(they_offer), json.loads(they_want)
+        rows.extend(_directions(user_id, other_id, they_offer, they_want))
+        scores[other_id] = len(they_offer) + len(they_want)
+    conn.executemany(_UPSERT, rows)
+    return scores
+
+
+# Stored partners of ``user_id`` on the other side of a changed skill_key,
+# by the kind of skill that changed
+_STORED_ON_SKILL = {
+    'offered': '''
+        SELECT m.other_id, m.score FROM skill_matches m
+        WHERE m.user_id = ? AND EXISTS (SELECT 1 FROM skills_wanted WHERE user_id = m.other_id AND skill_key = ?)
+    ''',
+    'wanted': '''
+        SELECT m.other_id, m.score FROM skill_matches m
+        WHERE m.user_id = ? AND EXISTS (SELECT 1 FROM skills_offered
+                                        WHERE user_id = m.other_id AND skill_key = ? AND is_approved = 1)
+    ''',
+}
+
+# Stored matches of ``user_id`` ranked above (score, other_id), up to a limit
+_RANK = '''
+    SELECT COUNT(*) FROM (
+        SELECT 1 FROM skill_matches
+        WHERE user_id = ? AND (score > ? OR (score = ? AND other_id < ?))
+        LIMIT ?)
+'''
+
+_MATCHES = '''
+    SELECT m.other_id, m.skill_id, m.they_offer, m.they_want, m.score,
+           u.name, u.location, u.profile_photo
+    FROM skill_matches m
+    JOIN users u ON m.other_id = u.id
+    WHERE m.user_id = ? AND u.is_banned = 0 AND u.is_public = 1
+    ORDER BY m.score DESC, m.other_id
+    LIMIT ?
+'''
+
+
+def _drop_displaced(conn, user_id, limit):
+    """Delete the pair just below ``user_id``'s top ``limit`` unless the partner still ranks it"""
+    row = conn.execute('''
+        SELECT other_id, score FROM skill_matches WHERE user_id = ? ORDER BY score DESC, other_id LIMIT 1 OFFSET ?
+    ''', (user_id, limit)).fetchone()
+    if row and not _in_top(conn, row[0], user_id, row[1], limit):
+        _delete_pair(conn, user_id, row[0])
+
+
+def _in_top(conn, user_id, other_id, score, limit):
+    """Whether a match with ``other_id`` at ``score`` is among the best ``limit`` stored for ``user_id``"""
+    better = conn.execute(_RANK, (user_id, score, score, other_id, limit)).fetchone()[0]
+    return better < limit
+
+
+def _stored(conn, user_id):
+    return conn.execute('SELECT COUNT(*) FROM skill_matches WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+
+def refresh_pair(conn, a, b):
+    """Recompute the match between users ``a`` and ``b`` in both directions; returns its score"""
+    b_teaches_a = _teachable(conn, b, a)
+    a_teaches_b = _teachable(conn, a, b) if b_teaches_a else []
+
+    if b_teaches_a and a_teaches_b:
+        _store_pair(conn, a, b, b_teaches_a, a_teaches_b)
+        return len(b_teaches_a) + len(a_teaches_b)
+
+    _delete_pair(conn, a, b)
+    return 0
+
+
+def skill_changed(conn, user_id, skill_key, kind, limit=MATCHES_PER_USER):
+    """Update matches after ``user_id`` added/removed/approved a skill
+
+    ``kind`` is 'offered' or 'wanted'. One query stores the user's top
+    ``limit`` matches and every match that now makes the partner's own top
+    list. Of the user's other stored pairs, only those with someone on the
+    other side of ``skill_key`` can have changed, and only those and the
+    ones pushed out of the user's top list are looked at; each stays while
+    it is in the partner's top ``limit``. A partner whose match got worse
+    has their top list recomputed only once it holds fewer than ``limit``
+    pairs. Runs inside the caller's transaction.
+    """
+    changed = dict(conn.execute(_STORED_ON_SKILL[kind], (user_id, skill_key)).fetchall())
+    stored = conn.execute('SELECT other_id, score FROM skill_matches WHERE user_id = ?', (user_id,)).fetchall()
+    # Pairs that may fall out of the user's own top list
+    previous = dict(sorted(stored, key=lambda row: (-row[1], row[0]))[:limit])
+    previous.update(changed)
+    stored = dict(stored)
+
+    current = _store_top(conn, user_id, limit, theirs=True)
+    worse = []
+    for other_id, score in previous.items():
+        new_score = current.get(other_id)
+        if new_score is None:
+            new_score = refresh_pair(conn, user_id, other_id) if other_id in changed else score
+            if new_score and not _in_top(conn, other_id, user_id, new_score, limit):
+                _delete_pair(conn, user_id, other_id)
+        if new_score < score:
+            worse.append(other_id)
+
+    for other_id in worse:
+        if _stored(conn, other_id) < limit:
+            _store_top(conn, other_id, limit)
+    # Joining a partner's top list pushes their last pair out of it
+    for other_id, score in current.items():
+        if score > stored.get(other_id, 0):
+            _drop_displaced(conn, other_id, limit)
+
+
+def queue_skill_change(conn, user_id, skill_key, kind):
+    """Queue ``skill_changed`` to run once the caller's transaction commits"""
+    conn.execute('INSERT INTO match_queue (user_id, skill_key, kind) VALUES (?, ?, ?)', (user_id, skill_key, kind))
+
+
+def apply_queued(conn, batch=100, limit=MATCHES_PER_USER):
+    """Run up to ``batch`` queued skill changes, each in its own transaction; returns how many ran
+
+    A change queued twice before it runs is applied once: the second copy
+    was committed before the first one's matches were read.
+    """
+    jobs = conn.execute('''
+        SELECT MAX(id), user_id, skill_key, kind FROM match_queue
+        GROUP BY user_id, skill_key, kind
+        ORDER BY MIN(id)
+        LIMIT ?
+    ''', (batch,)).fetchall()
+    for last_id, user_id, skill_key, kind in jobs:
+        try:
+            skill_changed(conn, user_id, skill_key, kind, limit)
+            conn.execute('''
+                DELETE FROM match_queue WHERE user_id = ? AND skill_key = ? AND kind = ? AND id <= ?
+            ''', (user_id, skill_key, kind, last_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(jobs)
+
+
+class MatchQueue:
+    """Background thread applying queued skill changes
+
+    ``notify`` wakes it after a request commits a change; changes queued by
+    other worker processes are picked up every ``interval`` seconds. Each
+    change commits on its own, so the write lock is only held for one at a
+    time.
+    """
+
+    def __init__(self, database, pragmas, batch=100, interval=5.0):
+        self.pid = os.getpid()
+        self.database = database
+        self.pragmas = pragmas
+        self.batch = batch
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stats = {'applied': 0, 'failed': 0}
+        threading.Thread(target=self._run, name='match-queue', daemon=True).start()
+
+    def notify(self):
+        """Apply queued changes now instead of at the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        conn = connect(self.database, self.pragmas, check_same_thread=False)
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                while True:
+                    applied = apply_queued(conn, self.batch)
+                    self._stats['applied'] += applied
+                    if applied < self.batch:
+                        break
+            except Exception:
+                # Busy, locked or a failing change; it stays queued for the next round
+                self._stats['failed'] += 1
+
+    def stats(self):
+        """Counters plus the number of changes still queued"""
+        conn = connect(self.database, self.pragmas)
+        try:
+            pending = conn.execute('SELECT COUNT(*) FROM match_queue').fetchone()[0]
+        finally:
+            conn.close()
+        return dict(self._stats, pending=pending)
+
+
+def get_match_queue(app=None):
+    """Start (once per worker) and return the background match updater"""
+    app = app or current_app
+    return per_worker(app, 'match_queue', lambda: MatchQueue(
+        app.config['DATABASE'], app.config['SQLITE_PRAGMAS'],
+        batch=app.config['MATCH_QUEUE_BATCH'], interval=app.config['MATCH_QUEUE_INTERVAL']))
+
+
+def get_matches(conn, user_id, limit=10):
+    """Two-way matches for ``user_id``, best first, hiding banned/private users"""
+    return conn.execute(_MATCHES, (user_id, limit)).fetchall()
+
+
+def _teachers(conn, learner_id, limit):
+    """Users offering something ``learner_id`` wants, via the skill_key index"""
+    return [row[0] for row in conn.execute('''
+        SELECT DISTINCT so.user_id
+        FROM skills_wanted sw
+        JOIN skills_offered so ON so.skill_key = sw.skill_key AND so.is_approved = 1
+        JOIN users u ON so.user_id = u.id
+        WHERE sw.user_id = ? AND so.user_id != ? AND u.is_banned = 0 AND u.is_public = 1
+        LIMIT ?
+    ''', (learner_id, learner_id, limit))]
+
+
+def _learners(conn, teacher_id, limit):
+    """Users wanting something ``teacher_id`` offers"""
+    return [row[0] for row in conn.execute('''
+        SELECT DISTINCT sw.user_id
+        FROM skills_offered so
+        JOIN skills_wanted sw ON sw.skill_key = so.skill_key
+        WHERE so.user_id = ? AND so.is_approved = 1 AND sw.user_id != ?
+        LIMIT ?
+    ''', (teacher_id, teacher_id, limit))]
+
+
+def find_cycles(conn, user_id, fanout=25, limit=5):
+    """Three-way swap cycles starting at ``user_id``
+
+    Returns lists ``[user_id, b, c]`` where user_id learns from b, b from c
+    and c from user_id. ``fanout`` caps the neighbours explored per hop, so
+    the walk costs at most fanout^2 index lookups.
+    """
+    cycles = []
+    teachers_of_me = set(_teachers(conn, user_id, fanout))
+    learners_from_me = set(_learners(conn, user_id, fanout * fanout))
+    for b in teachers_of_me:
+        for c in _teachers(conn, b, fanout):
+            if c != user_id and c != b and c in learners_from_me:
+                cycles.append([user_id, b, c])
+                if len(cycles) >= limit:
+                    return cycles
+    return cycles
+
+
+def rebuild_matches(conn, limit=MATCHES_PER_USER):
+    """Recompute every user's top ``limit`` matches, one user at a time; returns the rows stored"""
+    conn.execute('DELETE FROM skill_matches')
+    # Every queued change is covered by the rebuild
+    conn.execute('DELETE FROM match_queue')
+    # Only users who want something can match anyone
+    learners = conn.cursor()
+    for (user_id,) in learners.execute('SELECT DISTINCT user_id FROM skills_wanted ORDER BY user_id'):
+        _store_top(conn, user_id, limit)
+    return conn.execute('SELECT COUNT(*) FROM skill_matches').fetchone()[0]
+
+
+if __name__ == '__main__':
+    conn = connect(sys.argv[1] if len(sys.argv) > 1 else 'skillswap.db')
+    print('Rebuilt %d matches' % rebuild_matches(conn))
+    conn.commit()
+    conn.close()
@@ -0,0 +1,350 @@
+"""
+Request and SQL statement timings, exported in Prometheus text format.
+
+``init_app`` times every request into a latency histogram per endpoint.
+For a sampled fraction of requests (``METRICS_SQL_SAMPLE_RATE``), every
+statement run on a pooled connection is timed too, from ``execute`` until
+its rows have been fetched, and aggregated under its normalized SQL
+(literals and IN lists folded to ``?``) with the rows it returned.
+Statements slower than ``METRICS_SLOW_QUERY_MS`` are kept as samples for
+the admin slow-queries page, with their parameters reduced to types so no
+user data is stored.
+
+Timing works through ``TimedConnection``, which ``init_app`` installs as the
+pool's connection factory. Outside a sampled request (background threads,
+scripts, unsampled requests) it costs one thread-local lookup per statement.
+
+Numbers are per worker process; each series carries a ``worker`` label.
+"""
+
+import bisect
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from flask import current_app, g, request
+
+from db import per_worker
+
+# Latency histogram bounds in seconds; finer than the Prometheus client's
+# defaults at the low end, where most pages here finish
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Distinct normalized statements tracked; the rest are counted as '(other)'
+MAX_STATEMENTS = 1000
+
+_local = threading.local()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """``sql`` with literals replaced by ``?``, IN lists collapsed and whitespace squeezed"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    return _IN_LIST.sub('(?...)', sql)
+
+
+def redact(params):
+    """Types (and sizes) of bound parameters, never their values"""
+    def describe(value):
+        if value is None:
+            return 'NULL'
+        if isinstance(value, (str, bytes)):
+            return '%s(%d)' % (type(value).__name__, len(value))
+        return type(value).__name__
+    if isinstance(params, dict):
+        return {name: describe(value) for name, value in params.items()}
+    return [describe(value) for value in params]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile"""
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return None
+
+
+class Metrics:
+    """Request histograms, statement totals and slow samples for one worker"""
+
+    def __init__(self, sample_rate=1.0, slow_ms=25.0, slow_samples=100):
+        self.pid = os.getpid()
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._responses = {}
+        self._statements = {}
+        self._slow = deque(maxlen=slow_samples)
+        self._slow_total = 0
+
+    def observe_request(self, endpoint, status, seconds):
+        with self._lock:
+            histogram = self._latency.get(endpoint)
+            if histogram is None:
+                histogram = self._latency[endpoint] = Histogram()
+            histogram.observe(seconds)
+            key = (endpoint, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def observe_statement(self, sql, params, seconds, rows, endpoint=None):
+        statement = normalize_sql(sql)
+        with self._lock:
+            totals = self._statements.get(statement)
+            if totals is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    statement = '(other)'
+                totals = self._statements.setdefault(statement, [0, 0.0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += rows
+            totals[3] = max(totals[3], seconds)
+            if seconds * 1000 >= self.slow_ms:
+                self._slow_total += 1
+                self._slow.append({'at': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
+                                   'endpoint': endpoint, 'ms': round(seconds * 1000, 2), 'rows': rows,
+                                   'sql': statement, 'params': redact(params)})
+
+    def statements(self, limit=50):
+        """Statements by total time spent, busiest first"""
+        with self._lock:
+            items = [(sql, list(totals)) for sql, totals in self._statements.items()]
+        items.sort(key=lambda item: item[1][1], reverse=True)
+        return [{'sql': sql, 'calls': calls, 'total_ms': round(seconds * 1000, 2),
+                 'mean_ms': round(seconds * 1000 / calls, 3), 'max_ms': round(slowest * 1000, 2),
+                 'rows': rows, 'rows_per_call': round(rows / calls, 1)}
+                for sql, (calls, seconds, rows, slowest) in items[:limit]]
+
+    def slow_queries(self):
+        """Recent slow statements, newest first"""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def endpoints(self):
+        """Request count and approximate p50/p95/p99 per endpoint"""
+        with self._lock:
+            return {endpoint: {'requests': h.count, 'mean_ms': round(h.sum * 1000 / h.count, 2),
+                               'p50_le': h.quantile(0.5), 'p95_le': h.quantile(0.95),
+                               'p99_le': h.quantile(0.99)}
+                    for endpoint, h in self._latency.items()}
+
+    def prometheus(self, page_cache=None):
+        """All metrics in Prometheus text exposition format"""
+        worker = 'worker="%d"' % self.pid
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append('# HELP skillswap_%s %s' % (name, help_text))
+            lines.append('# TYPE skillswap_%s %s' % (name, kind))
+
+        with self._lock:
+            metric('request_duration_seconds', 'histogram', 'Request latency by endpoint')
+            for endpoint, h in sorted(self._latency.items()):
+                labels = '%s,endpoint="%s"' % (worker, _escape(endpoint))
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float('inf'),), h.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('skillswap_request_duration_seconds_bucket{%s,le="%s"} %d'
+                                 % (labels, le, cumulative))
+                lines.append('skillswap_request_duration_seconds_sum{%s} %r' % (labels, h.sum))
+                lines.append('skillswap_request_duration_seconds_count{%s} %d' % (labels, h.count))
+
+            metric('responses_total', 'counter', 'Responses by endpoint and status code')
+            for (endpoint, status), count in sorted(self._responses.items()):
+                lines.append('skillswap_responses_total{%s,endpoint="%s",status="%d"} %d'
+                             % (worker, _escape(endpoint), status, count))
+
+            metric('sql_statements_total', 'counter', 'Sampled SQL statements executed')
+            metric_rows = []
+            for sql, (calls, seconds, rows, _) in sorted(self._statements.items()):
+                labels = '%s,statement="%s"' % (worker, _escape(sql))
+                lines.append('skillswap_sql_statements_total{%s} %d' % (labels, calls))
+                metric_rows.append((labels, seconds, rows))
+            metric('sql_seconds_total', 'counter', 'Time spent in sampled SQL statements')
+            lines.extend('skillswap_sql_seconds_total{%s} %r' % (labels, seconds)
+                         for labels, seconds, _ in metric_rows)
+            metric('sql_rows_total', 'counter', 'Rows returned by sampled SQL statements')
+            lines.extend('skillswap_sql_rows_total{%s} %d' % (labels, rows) for labels, _, rows in metric_rows)
+
+            metric('sql_slow_statements_total', 'counter', 'Sampled SQL statements over the slow threshold')
+            lines.append('skillswap_sql_slow_statements_total{%s} %d' % (worker, self._slow_total))
+
+        if page_cache:
+            metric('page_cache_requests_total', 'counter', 'Conditional page requests by outcome')
+            for endpoint, counts in sorted(page_cache['endpoints'].items()):
+                for outcome in ('not_modified', 'hits', 'misses', 'bypassed'):
+                    lines.append('skillswap_page_cache_requests_total{%s,endpoint="%s",outcome="%s"} %d'
+                                 % (worker, _escape(endpoint), outcome, counts[outcome]))
+            metric('page_cache_entries', 'gauge', 'Rendered pages held in the page cache')
+            lines.append('skillswap_page_cache_entries{%s} %d' % (worker, page_cache['size']))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports its statement to the request's ``Metrics`` once fetched"""
+
+    _timing = None
+
+    def execute(self, sql, parameters=()):
+        metrics = getattr(_local, 'metrics', None)
+        if metrics is None:
+            self._timing = None
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._timing = [metrics, sql, parameters, time.perf_counter() - started, 0]
+        if self.description is None:
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        metrics = getattr(_local, 'metrics', None)
+        self._timing = None
+        if metrics is None:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        metrics.observe_statement(sql, (), time.perf_counter() - started, max(self.rowcount, 0),
+                                  getattr(_local, 'endpoint', None))
+        return self
+
+    def _finish(self):
+        timing, self._timing = self._timing, None
+        if timing:
+            metrics, sql, parameters, seconds, rows = timing
+            metrics.observe_statement(sql, parameters, seconds, rows, getattr(_local, 'endpoint', None))
+
+    def fetchone(self):
+        if self._timing is None:
+            return super().fetchone()
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._timing[3] += time.perf_counter() - started
+        self._timing[4] += row is not None
+        self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        if self._timing is None:
+            return super().fetchmany(size or self.arraysize)
+        started = time.perf_counter()
+        rows = super().fetchmany(size or self.arraysize)
+        self._timing[3] += time.perf_counter() - started
+        self._timing[4] += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        if self._timing is None:
+            return super().fetchall()
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._timing[3] += time.perf_counter() - started
+        self._timing[4] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        if self._timing is None:
+            return super().__next__()
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._timing[3] += time.perf_counter() - started
+            self._finish()
+            raise
+        self._timing[3] += time.perf_counter() - started
+        self._timing[4] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Iteration abandoned before the last row
+        self._finish()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors time their statements during sampled requests"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def get_metrics(app=None):
+    """Return this worker's metrics, built from the METRICS_* settings"""
+    app = app or current_app
+    return per_worker(app, 'metrics', lambda: Metrics(
+        sample_rate=app.config['METRICS_SQL_SAMPLE_RATE'], slow_ms=app.config['METRICS_SLOW_QUERY_MS'],
+        slow_samples=app.config['METRICS_SLOW_SAMPLES']))
+
+
+def init_app(app):
+    """Time requests (and sampled SQL) if METRICS is on"""
+    if not app.config['METRICS']:
+        return
+    app.config['DB_CONNECTION_FACTORY'] = TimedConnection
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        metrics = get_metrics(app)
+        if metrics.sample_rate >= 1 or random.random() < metrics.sample_rate:
+            _local.metrics = metrics
+            _local.endpoint = request.endpoint
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def stop_timer(exc=None):
+        _local.metrics = None
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            get_metrics(app).observe_request(request.endpoint or 'unmatched', g.pop('metrics_status', 500),
+                                             time.perf_counter() - started)
@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the Skill Swap Platform.
+
+Each migration is a function registered with ``@migration(version, name)``.
+``migrate()`` applies every migration newer than the version recorded in the
+``schema_migrations`` table, each in its own transaction.
+
+Usage:
+    python migrations.py [database]           # apply pending migrations
+    python migrations.py --check [database]   # also verify hot query plans
+"""
+
+import sqlite3
+import sys
+
+import blobs
+import counters
+import dashboard
+import matching
+import page_cache
+import repository
+import sessions
+import throttle
+import user_stats
+from blobs import rebuild_refcounts
+from counters import recompute
+from dashboard import DASHBOARD_SQL, install_dashboard_triggers
+from matching import MATCHES_PER_USER, normalize_skill
+from page_cache import install_triggers
+from pagination import keyset_sql
+from room_stats import rebuild_room_stats
+from search import fts_available
+from user_stats import rebuild_stats
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register a schema migration"""
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def current_version(conn):
+    """Highest migration version applied to the database"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_migrations').fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    """Apply all pending migrations; returns the list of versions applied"""
+    applied = []
+    current_version(conn)
+    conn.commit()
+
+    for version, name, fn in MIGRATIONS:
+        # Take the write lock before re-reading the version so concurrent
+        # workers starting up never run the same migration twice
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            fn(conn)
+            conn.execute('INSERT INTO schema_migrations (version, name) VALUES (?, ?)',
+                         (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+
+    return applied
+
+
+@migration(1, 'initial schema')
+def _initial_schema(conn):
+    # Users table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            name TEXT NOT NULL,
+            location TEXT,
+            profile_photo TEXT,
+            is_public INTEGER DEFAULT 1,
+            availability TEXT,
+            is_admin INTEGER DEFAULT 0,
+            is_banned INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Skills offered table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS skills_offered (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            skill_name TEXT NOT NULL,
+            description TEXT,
+            is_approved INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Skills wanted table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS skills_wanted (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            skill_name TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Swap requests table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS swap_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            requester_id INTEGER,
+            provider_id INTEGER,
+            offered_skill_id INTEGER,
+            wanted_skill TEXT,
+            message TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (requester_id) REFERENCES users (id),
+            FOREIGN KEY (provider_id) REFERENCES users (id),
+            FOREIGN KEY (offered_skill_id) REFERENCES skills_offered (id)
+        )
+    ''')
+
+    # Ratings table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ratings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            swap_request_id INTEGER,
+            rater_id INTEGER,
+            rated_id INTEGER,
+            rating INTEGER CHECK (rating >= 1 AND rating <= 5),
+            feedback TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (swap_request_id) REFERENCES swap_requests (id),
+            FOREIGN KEY (rater_id) REFERENCES users (id),
+            FOREIGN KEY (rated_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Platform messages table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS platform_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER,
+            title TEXT NOT NULL,
+            message TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (admin_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Rooms table for group messaging
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            creator_id INTEGER,
+            is_public INTEGER DEFAULT 1,
+            room_code TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (creator_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Room members table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS room_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_id INTEGER,
+            user_id INTEGER,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (room_id) REFERENCES rooms (id),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(room_id, user_id)
+        )
+    ''')
+
+    # Room messages table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS room_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_id INTEGER,
+            user_id INTEGER,
+            message TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (room_id) REFERENCES rooms (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+@migration(2, 'indexes for hot query paths')
+def _hot_path_indexes(conn):
+    indexes = [
+        # Admin user listings: WHERE is_admin = 0 ORDER BY created_at DESC
+        'idx_users_admin_created ON users (is_admin, created_at)',
+
+        # Dashboard/profile: WHERE user_id = ? ORDER BY created_at DESC
+        'idx_skills_offered_user ON skills_offered (user_id, created_at)',
+        'idx_skills_wanted_user ON skills_wanted (user_id, created_at)',
+        # Browse/admin moderation: WHERE is_approved = ? ORDER BY created_at DESC
+        'idx_skills_offered_approved ON skills_offered (is_approved, created_at)',
+        # Top skills report: WHERE is_approved = 1 GROUP BY skill_name
+        'idx_skills_offered_approved_name ON skills_offered (is_approved, skill_name)',
+
+        # Received requests: WHERE provider_id = ? AND status = ? ORDER BY created_at DESC
+        'idx_swap_requests_provider ON swap_requests (provider_id, status, created_at)',
+        # Sent requests: WHERE requester_id = ? ORDER BY created_at DESC
+        'idx_swap_requests_requester ON swap_requests (requester_id, status, created_at)',
+        # Admin counts by status and recent swaps
+        'idx_swap_requests_status ON swap_requests (status)',
+        'idx_swap_requests_created ON swap_requests (created_at)',
+        # Most requested skills: JOIN ON offered_skill_id
+        'idx_swap_requests_skill ON swap_requests (offered_skill_id)',
+
+        # AVG/COUNT of ratings received, covering the rating column
+        'idx_ratings_rated ON ratings (rated_id, rating)',
+        # Already-rated check: WHERE swap_request_id = ? AND rater_id = ?
+        'idx_ratings_swap_rater ON ratings (swap_request_id, rater_id)',
+
+        'idx_platform_messages_created ON platform_messages (created_at)',
+
+        # Public room listing: WHERE is_public = 1 ORDER BY created_at DESC
+        'idx_rooms_public_created ON rooms (is_public, created_at)',
+        # Room member list: WHERE room_id = ? ORDER BY joined_at
+        'idx_room_members_room_joined ON room_members (room_id, joined_at)',
+        # User's rooms: WHERE user_id = ? ORDER BY joined_at DESC
+        'idx_room_members_user_joined ON room_members (user_id, joined_at)',
+        # Room chat: WHERE room_id = ? ORDER BY created_at
+        'idx_room_messages_room_created ON room_messages (room_id, created_at)',
+    ]
+    for index in indexes:
+        conn.execute('CREATE INDEX IF NOT EXISTS ' + index)
+
+
+
+@migration(3, 'room message id cursor index')
+def _room_message_cursor_index(conn):
+    # Chat is paged by message id: WHERE room_id = ? AND id > ? / id < ?
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_room_messages_room_id ON room_messages (room_id, id)')
+    conn.execute('DROP INDEX IF EXISTS idx_room_messages_room_created')
+
+
+@migration(4, 'chat hub event log')
+def _chat_hub_events(conn):
+    # Shared by worker processes when CHAT_HUB_BACKEND is 'sqlite'
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hub_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_id INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_hub_events_created ON hub_events (created_at)')
+
+
+@migration(5, 'full-text skill search index')
+def _skill_search_index(conn):
+    # Builds without FTS5 keep using the LIKE search in search.py
+    if not fts_available(conn):
+        return
+
+    # Only approved skills are indexed; the triggers add/remove rows as the
+    # approval flag, name or description change
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS skills_fts USING fts5(
+            skill_name, description,
+            content='skills_offered', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS skills_fts_insert AFTER INSERT ON skills_offered
+        WHEN new.is_approved = 1
+        BEGIN
+            INSERT INTO skills_fts (rowid, skill_name, description)
+            VALUES (new.id, new.skill_name, new.description);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS skills_fts_delete AFTER DELETE ON skills_offered
+        WHEN old.is_approved = 1
+        BEGIN
+            INSERT INTO skills_fts (skills_fts, rowid, skill_name, description)
+            VALUES ('delete', old.id, old.skill_name, old.description);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS skills_fts_update
+        AFTER UPDATE OF skill_name, description, is_approved ON skills_offered
+        BEGIN
+            INSERT INTO skills_fts (skills_fts, rowid, skill_name, description)
+            SELECT 'delete', old.id, old.skill_name, old.description WHERE old.is_approved = 1;
+            INSERT INTO skills_fts (rowid, skill_name, description)
+            SELECT new.id, new.skill_name, new.description WHERE new.is_approved = 1;
+        END
+    ''')
+    conn.execute('''
+        INSERT INTO skills_fts (rowid, skill_name, description)
+        SELECT id, skill_name, description FROM skills_offered WHERE is_approved = 1
+    ''')
+
+
+@migration(6, 'skill keys and reciprocal matches')
+def _skill_matches(conn):
+    for table in ('skills_offered', 'skills_wanted'):
+        conn.execute('ALTER TABLE %s ADD COLUMN skill_key TEXT' % table)
+        rows = conn.execute('SELECT id, skill_name FROM %s' % table).fetchall()
+        conn.executemany('UPDATE %s SET skill_key = ? WHERE id = ?' % table,
+                         [(normalize_skill(name), skill_id) for skill_id, name in rows])
+        # Inverted index: skill -> users offering/wanting it
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_%s_key ON %s (skill_key, user_id)' % (table, table))
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS skill_matches (
+            user_id INTEGER NOT NULL,
+            other_id INTEGER NOT NULL,
+            skill_id INTEGER,
+            they_offer TEXT NOT NULL,
+            they_want TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, other_id),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (other_id) REFERENCES users (id),
+            FOREIGN KEY (skill_id) REFERENCES skills_offered (id)
+        ) WITHOUT ROWID
+    ''')
+    # Filled by ``python matching.py``; too slow to run during startup
+
+
+@migration(7, 'user stats aggregates')
+def _user_stats(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            rating_sum INTEGER NOT NULL DEFAULT 0,
+            rating_count INTEGER NOT NULL DEFAULT 0,
+            swaps_completed INTEGER NOT NULL DEFAULT 0,
+            swap_requests INTEGER NOT NULL DEFAULT 0,
+            skills_offered INTEGER NOT NULL DEFAULT 0,
+            skills_wanted INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    rebuild_stats(conn)
+
+
+@migration(8, 'platform counters')
+def _platform_counters(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS platform_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0,
+            reconciled_at TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS skill_counts (
+            skill_name TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    # Top skills report: ORDER BY count DESC LIMIT 10
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_skill_counts_count ON skill_counts (count)')
+    recompute(conn)
+
+
+@migration(9, 'ratings export index')
+def _ratings_created_index(conn):
+    # Ratings export with ?since=/?until=: range on created_at, in order
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ratings_created ON ratings (created_at)')
+
+
+@migration(10, 'login throttle buckets')
+def _login_throttle(conn):
+    # Shared login buckets (LOGIN_THROTTLE_BACKEND = 'sqlite'): key -> time the bucket is full again
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS login_throttle (
+            key INTEGER PRIMARY KEY,
+            tat REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    # Pruning refilled buckets: range on tat
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_login_throttle_tat ON login_throttle (tat)')
+
+
+@migration(11, 'server-side sessions')
+def _sessions(conn):
+    # SESSION_BACKEND = 'sqlite': the cookie carries only the id
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            data TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    # Banning signs a user out everywhere; pruning deletes expired rows
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)')
+
+
+@migration(12, 'content-addressed upload blobs')
+def _blobs(conn):
+    # Users referencing each upload (users.profile_photo value); blobs.py collects the rest
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            key TEXT PRIMARY KEY,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+    rebuild_refcounts(conn)
+
+
+@migration(13, 'table change counters')
+def _table_versions(conn):
+    # Version stamps for conditional GETs; triggers bump them on every write
+    install_triggers(conn)
+
+
+@migration(14, 'sent swap requests index')
+def _sent_requests_index(conn):
+    # Dashboard sent requests: WHERE requester_id = ? ORDER BY created_at DESC, any status
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_swap_requests_requester_created '
+                 'ON swap_requests (requester_id, created_at)')
+
+
+@migration(15, 'dashboard change counters')
+def _dashboard_versions(conn):
+    # Per-user version stamps for the cached dashboard; triggers bump them
+    install_dashboard_triggers(conn)
+
+
+@migration(16, 'room counters')
+def _room_counters(conn):
+    # Kept current by the repository on join, leave and post; see room_stats.py
+    conn.execute('ALTER TABLE rooms ADD COLUMN member_count INTEGER NOT NULL DEFAULT 0')
+    conn.execute('ALTER TABLE rooms ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0')
+    conn.execute('ALTER TABLE rooms ADD COLUMN last_message_at TIMESTAMP')
+    rebuild_room_stats(conn)
+    # Public rooms by activity: WHERE is_public = 1 ORDER BY last_message_at DESC
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_rooms_public_activity ON rooms (is_public, last_message_at)')
+
+
+@migration(17, 'top matches per user')
+def _top_matches(conn):
+    # Approved teachers of a skill, read by matching._TOP_PARTNERS
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_skills_offered_key_approved '
+                 'ON skills_offered (skill_key, user_id) WHERE is_approved = 1')
+    # Pairs outside both users' top MATCHES_PER_USER go on the next ``python matching.py``
+
+
+@migration(18, 'dashboard membership triggers')
+def _dashboard_membership(conn):
+    # The old triggers bumped every member of the room on each join or leave
+    conn.execute('DROP TRIGGER IF EXISTS trg_room_members_dashboard_ins')
+    conn.execute('DROP TRIGGER IF EXISTS trg_room_members_dashboard_del')
+    install_dashboard_triggers(conn)
+
+
+@migration(19, 'match update queue')
+def _match_queue(conn):
+    # Skill changes waiting for matching.MatchQueue; routes only insert here
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS match_queue (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            skill_key TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Copies of one change are grouped and deleted together
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_match_queue_change ON match_queue (user_id, skill_key, kind)')
+
+
+@migration(20, 'dashboard triggers for users and rooms')
+def _dashboard_dependents(conn):
+    # Members of the rooms a renamed user created: WHERE creator_id = ?
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_rooms_creator ON rooms (creator_id)')
+    install_dashboard_triggers(conn)
+
+
+# Queries run on every dashboard, profile, admin and room render, taken from
+# the modules that run them. The check mode asserts none of them falls back
+# to a full table scan.
+_CURSOR = ('9999', 2 ** 62)
+
+HOT_QUERIES = [
+    ('dashboard', DASHBOARD_SQL, {'user_id': 1, 'limit': 50, 'matches': 6}),
+    ('dashboard version', dashboard.VERSION_SQL, (1,)),
+    ('skills wanted', repository.WANTED_BY_SQL, (1,)),
+    ('room memberships', repository.MEMBERSHIPS_SQL, (1, '[1, 2, 3]')),
+    ('profile stats', user_stats.STATS_SQL, (1,)),
+    ('profile most requested skills', repository.MOST_REQUESTED_SQL, (1, 3)),
+    ('rate user existing rating', repository.RATING_EXISTS_SQL, (1, 1)),
+    ('browse skills', keyset_sql(*repository.SKILL_LISTING_PAGE, after=True), _CURSOR + (51,)),
+    ('admin unapproved skills', repository.PENDING_APPROVAL_SQL, ()),
+    ('admin users', keyset_sql(*repository.ADMIN_USERS_PAGE, after=True), _CURSOR + (51,)),
+    ('admin user activity', keyset_sql(*repository.USER_ACTIVITY_PAGE, after=True), _CURSOR + (51,)),
+    ('admin counters', counters.COUNTERS_SQL % '?, ?', ('total_users', 'swaps_pending')),
+    ('admin top skills', counters.TOP_SKILLS_SQL, (10,)),
+    ('platform messages', repository.RECENT_PLATFORM_SQL, (3,)),
+    ('platform messages page', keyset_sql(*repository.PLATFORM_PAGE, after=True), _CURSOR + (51,)),
+    ('public rooms', repository.PUBLIC_ROOMS_SQL['newest'], ()),
+    ('public rooms by activity', repository.PUBLIC_ROOMS_SQL['activity'], ()),
+    ('room member counter', repository.MEMBER_JOINED_SQL, (0,)),
+    ('room message counter', repository.MESSAGE_POSTED_SQL, (0, 0)),
+    ('room messages latest', repository.MESSAGES_BEFORE_SQL, (1, 2 ** 62, 50)),
+    ('room messages since', repository.MESSAGES_AFTER_SQL, (1, 0, 50)),
+    ('room members', repository.ROOM_MEMBERS_SQL, (1,)),
+    ('matches for user', matching._MATCHES, (1, 10)),
+    ('top match partners', matching._TOP_PARTNERS, {'user_id': 1, 'limit': MATCHES_PER_USER, 'theirs': 1}),
+    ('stored matches on an offered skill', matching._STORED_ON_SKILL['offered'], (1, 'python')),
+    ('stored matches on a wanted skill', matching._STORED_ON_SKILL['wanted'], (1, 'python')),
+    ('match rank', matching._RANK, (1, 2, 2, 1, MATCHES_PER_USER)),
+    ('room membership check', repository.IS_MEMBER_SQL, (1, 1)),
+    ('login throttle bucket', throttle.BUCKET_SQL, (1,)),
+    ('login throttle prune', throttle.PRUNE_SQL, (0.0,)),
+    ('session load', sessions.LOAD_SQL, ('x', 0.0)),
+    ('session revoke', sessions.REVOKE_SQL, (1,)),
+    ('session prune', sessions.PRUNE_SQL, (0.0,)),
+    ('principal', sessions.PRINCIPAL_SQL, (1,)),
+    ('blob references', blobs.REFERENCED_SQL % '?, ?', ('a', 'b')),
+    ('blob release', blobs.RELEASE_SQL, ('a',)),
+    ('page versions', page_cache.VERSIONS_SQL % '?, ?', ('users', 'rooms')),
+]
+
+
+def full_scans(plan):
+    """The lines of an EXPLAIN QUERY PLAN detail column that scan a whole table"""
+    # Subquery results ("CO-ROUTINE sr", "MATERIALIZE c") are read back with
+    # "SCAN sr"; that walks rows the query produced itself, not a table
+    produced = set(line.split(' ', 1)[1] for line in plan if line.startswith(('CO-ROUTINE ', 'MATERIALIZE ')))
+    # "SCAN t USING [COVERING] INDEX ..." walks an index, not the table
+    return [line for line in plan if line.startswith('SCAN ') and ' INDEX ' not in line
+            and line[5:] not in produced and line != 'SCAN CONSTANT ROW']
+
+
+def table_scans(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN lines that are full table scans"""
+    return full_scans([row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)])
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """Map query name -> offending plan lines for every hot query that scans"""
+    failures = {}
+    for name, sql, params in queries:
+        scans = table_scans(conn, sql, params)
+        if scans:
+            failures[name] = scans
+    return failures
+
+
+def main(argv):
+    check = '--check' in argv
+    args = [a for a in argv if a != '--check']
+    database = args[0] if args else 'skillswap.db'
+
+    conn = sqlite3.connect(database)
+    applied = migrate(conn)
+    print('Schema version %d (%s)' % (
+        current_version(conn), 'applied %s' % applied if applied else 'up to date'))
+
+    if check:
+        failures = check_query_plans(conn)
+        for name, scans in failures.items():
+            print('SCAN  %s: %s' % (name, '; '.join(scans)))
+        print('%d/%d hot queries use indexes' % (len(HOT_QUERIES) - len(failures), len(HOT_QUERIES)))
+        conn.close()
+        return 1 if failures else 0
+
+    conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,200 @@
+"""
+Conditional GET and rendered-page caching for read-heavy pages.
+
+Every table a page reads from has a row in ``table_versions`` whose version
+is bumped by triggers on each insert, update and delete (see
+``install_triggers``), whatever code path made the write. A page's ETag is a
+hash of its URL, the viewer, and the versions of the tables it declares, so
+it can be computed with a single primary-key query before the view runs:
+
+    @app.route('/browse_skills')
+    @conditional('skills_offered', 'users')
+    def browse_skills(): ...
+
+A matching ``If-None-Match`` is answered with 304 and the view never runs.
+``If-Modified-Since`` alone never is: a timestamp says nothing about the
+viewer or the representation, and misses a second write within the same
+second. ``Last-Modified`` is still sent for information. Otherwise the rendered body is looked up in
+a bounded per-worker LRU keyed by (URL, representation, viewer class), and
+only rendered when the cached copy carries an older ETag.
+
+Signed-in pages show the user's name, so each signed-in user is their own
+viewer class; anonymous visitors share one. Requests with pending flash
+messages are neither answered with 304 nor cached.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, g, request, session
+
+from db import get_db, per_worker
+
+VERSIONS_SQL = 'SELECT name, version, changed_at FROM table_versions WHERE name IN (%s)'
+
+TRACKED_TABLES = ('users', 'skills_offered', 'skills_wanted', 'swap_requests', 'ratings',
+                  'platform_messages', 'rooms', 'room_members', 'room_messages', 'user_stats')
+
+# Unix time with sub-second precision, in SQL
+_NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+
+def install_triggers(conn, tables=TRACKED_TABLES):
+    """Create ``table_versions`` and the triggers that bump it on every write"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            changed_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    for table in tables:
+        conn.execute('INSERT OR IGNORE INTO table_versions (name, version, changed_at) VALUES (?, 1, %s)'
+                     % _NOW, (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_%(table)s_version_%(short)s AFTER %(event)s ON %(table)s
+                BEGIN
+                    UPDATE table_versions SET version = version + 1, changed_at = %(now)s
+                    WHERE name = '%(table)s';
+                END
+            ''' % {'table': table, 'event': event, 'short': event[:3].lower(), 'now': _NOW})
+
+
+def table_versions(conn, tables):
+    """(versions in ``tables`` order, latest change as Unix time) for the given tables"""
+    rows = dict((name, (version, changed_at)) for name, version, changed_at in conn.execute(
+        VERSIONS_SQL % ','.join('?' * len(tables)), tables))
+    versions = tuple(rows.get(table, (0, 0.0))[0] for table in tables)
+    return versions, max((changed_at for _, changed_at in rows.values()), default=0.0)
+
+
+def template_salt(app):
+    """Hash of the templates and built assets, so a deploy changes every ETag"""
+    digest = hashlib.sha256()
+    folder = os.path.join(app.root_path, app.template_folder)
+    for root, _, files in sorted(os.walk(folder)):
+        for name in sorted(files):
+            with open(os.path.join(root, name), 'rb') as f:
+                digest.update(name.encode('utf-8') + b'\0' + f.read())
+    digest.update(repr(sorted(app.extensions.get('assets', {}).items())).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class PageCache:
+    """Bounded LRU of rendered bodies plus per-endpoint hit counters"""
+
+    def __init__(self, max_size=1000, salt=''):
+        self.pid = os.getpid()
+        self.max_size = max_size
+        self.salt = salt
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._evictions = 0
+        self._endpoints = {}
+
+    def count(self, endpoint, outcome):
+        """Record a 'not_modified', 'hits', 'misses' or 'bypassed' outcome"""
+        with self._lock:
+            counts = self._endpoints.setdefault(
+                endpoint, {'not_modified': 0, 'hits': 0, 'misses': 0, 'bypassed': 0})
+            counts[outcome] += 1
+
+    def get(self, key, etag):
+        """(body, mimetype) cached for ``key`` under ``etag``, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key, etag, body, mimetype):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= len(old[1])
+            self._entries[key] = (etag, body, mimetype)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[1])
+                self._evictions += 1
+
+    def stats(self):
+        endpoints = {}
+        for endpoint, counts in self._endpoints.items():
+            served = counts['not_modified'] + counts['hits'] + counts['misses']
+            endpoints[endpoint] = dict(counts, hit_rate=round(
+                (counts['not_modified'] + counts['hits']) / served, 4) if served else None)
+        return {'size': len(self._entries), 'max_size': self.max_size, 'bytes': self._bytes,
+                'evictions': self._evictions, 'endpoints': endpoints}
+
+
+def get_page_cache(app=None):
+    """Return this worker's page cache, built from the PAGE_CACHE_* settings"""
+    app = app or current_app
+    return per_worker(app, 'page_cache', lambda: PageCache(
+        app.config['PAGE_CACHE_SIZE'], salt=template_salt(app)))
+
+
+def conditional(*tables, store=True, period=None):
+    """Serve a GET view with ETag/Last-Modified, 304s and the page cache
+
+    ``tables`` must name every table the view reads. ``store=False`` only
+    answers conditional requests and never caches bodies (for responses
+    rarely requested twice). ``period`` makes the ETag also change every
+    ``period`` seconds, for pages with content that rotates over time;
+    the view can seed its randomness from ``g.page_etag`` to stay stable
+    within a period.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_page_cache()
+            if not current_app.config['PAGE_CACHE'] or request.method != 'GET' or '_flashes' in session:
+                cache.count(request.endpoint, 'bypassed')
+                return view(*args, **kwargs)
+
+            versions, last_modified = table_versions(get_db(), tables)
+            bucket = None
+            if period:
+                bucket = int(time.time() // period)
+                last_modified = max(last_modified, bucket * period)
+            viewer = 'user:%d:%d' % (g.user.id, g.user.is_admin) if g.user else 'anonymous'
+            key = (request.url, request.accept_mimetypes.best, viewer)
+            etag = hashlib.sha256(repr((key, versions, bucket, cache.salt)).encode('utf-8')).hexdigest()[:32]
+            g.page_etag = etag
+
+            def finish(response):
+                response.set_etag(etag)
+                response.last_modified = last_modified
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+                response.vary.update(('Cookie', 'Accept'))
+                return response
+
+            # Only the ETag identifies this viewer's version of the page
+            if request.if_none_match.contains(etag):
+                cache.count(request.endpoint, 'not_modified')
+                return finish(Response(status=304))
+
+            cached = cache.get(key, etag) if store else None
+            if cached:
+                cache.count(request.endpoint, 'hits')
+                return finish(Response(cached[0], mimetype=cached[1]))
+
+            cache.count(request.endpoint, 'misses')
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or '_flashes' in session:
+                return response
+            if store and not response.direct_passthrough:
+                cache.put(key, etag, response.get_data(), response.mimetype)
+            return finish(response)
+        return wrapper
+    return decorator
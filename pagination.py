@@ -0,0 +1,78 @@
+"""
+Keyset (cursor) pagination for listing pages.
+
+Listings are ordered newest first on ``(created_at, id)``. Rather than
+OFFSET, each page starts strictly after the last row of the previous one, so
+fetching any page is an index range scan of ``limit`` rows no matter how deep
+it is. The cursor handed to clients is that last ``(created_at, id)`` pair,
+encoded as an opaque URL-safe token.
+"""
+
+import base64
+import binascii
+
+
+def encode_cursor(created_at, row_id):
+    """Opaque token for the position just after ``(created_at, row_id)``"""
+    raw = '%s|%d' % (created_at, row_id)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """``(created_at, id)`` from a token, or None if it is missing or malformed"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+        created_at, row_id = raw.rsplit('|', 1)
+        return created_at, int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def keyset_sql(select, where, key=('created_at', 'id'), after=False):
+    """The statement ``keyset_page`` runs: the first page, or with ``after`` a page past a cursor"""
+    created, row_id = key
+    sql = select + ' WHERE ' + where
+    if after:
+        sql += ' AND (%s, %s) < (?, ?)' % (created, row_id)
+    return sql + ' ORDER BY %s DESC, %s DESC LIMIT ?' % (created, row_id)
+
+
+def page_size(requested, default, maximum):
+    """Clamp a client-supplied page size to ``1..maximum``"""
+    if not requested or requested < 1:
+        return default
+    return min(requested, maximum)
+
+
+def keyset_page(conn, select, where, params, cursor, limit, key=('created_at', 'id'), row_type=None):
+    """Run one page of ``select ... WHERE where`` newest first
+
+    ``key`` names the ``(created_at, id)`` columns as they appear in the
+    query (e.g. with a table alias). ``row_type`` (a namedtuple with
+    ``created_at`` and ``id`` fields) builds the rows instead of the
+    connection's row factory. Returns ``(rows, next_cursor)``, where
+    ``next_cursor`` is None on the last page.
+    """
+    params = list(params)
+    position = decode_cursor(cursor)
+    sql = keyset_sql(select, where, key, after=position is not None)
+    if position is not None:
+        params.extend(position)
+    # One extra row tells us whether another page exists
+    params.append(limit + 1)
+
+    if row_type is None:
+        rows = conn.execute(sql, params).fetchall()
+    else:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = list(map(row_type._make, cursor.execute(sql, params).fetchall()))
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    if row_type is not None:
+        return rows, encode_cursor(last.created_at, last.id)
+    return rows, encode_cursor(last['created_at'], last['id'])
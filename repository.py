@@ -0,0 +1,600 @@
+"""
+Data access for the routes: every query they run, with compact row types.
+
+Routes call ``get_repo()`` and go through its tables (``users``, ``skills``,
+``swaps``, ``ratings``, ``rooms``, ``messages``) instead of writing SQL
+inline. Each method runs one fixed statement, so the connection's statement
+cache (``DB_STATEMENT_CACHE``) always finds it already prepared; id lists
+are bound as a single JSON array through ``json_each`` rather than a
+variable-length ``IN (?, ?, ...)``, which would be a new statement for
+every list length.
+
+Rows come back as namedtuples naming exactly the columns the query selects.
+They are plain tuples built without the connection's ``sqlite3.Row``
+factory, read by attribute in Python and in templates, and turned into
+dicts with ``as_dict`` for JSON. Password hashes are only ever selected by
+``Users.credentials``.
+
+Batch methods (``Users.cards``, ``Rooms.memberships``) fetch for a whole
+list of ids in one query, in place of a correlated subquery per row. Rooms
+carry their own member and message counts (see room_stats.py), which the
+methods that join, leave and post keep current in the same transaction.
+Writes never commit; the route does, so it can group them with the stats and
+counter updates that go with them. Domain logic with its own queries
+(search, matching, user_stats, counters, exports) keeps them in its own
+module.
+
+The statements of the hot paths are module constants, so the query-plan
+check (``migrations.HOT_QUERIES``) explains exactly what the methods run.
+Listing pages are ``(select, where, key)`` triples for ``keyset_page``.
+"""
+
+import json
+from collections import namedtuple
+
+from flask import g
+
+from db import get_db, write
+from pagination import keyset_page
+
+User = namedtuple('User', 'id username email name location profile_photo is_public availability '
+                          'is_admin is_banned created_at')
+Credentials = namedtuple('Credentials', 'id password_hash is_admin is_banned')
+UserCard = namedtuple('UserCard', 'id username name profile_photo')
+AdminUser = namedtuple('AdminUser', 'id username email name location profile_photo is_public availability '
+                                    'is_banned created_at rating_count avg_rating')
+UserActivity = namedtuple('UserActivity', 'id name username created_at skills_offered skills_wanted '
+                                          'total_swaps avg_rating')
+
+Skill = namedtuple('Skill', 'id user_id skill_name description is_approved created_at')
+WantedSkill = namedtuple('WantedSkill', 'id user_id skill_name description created_at')
+SkillListing = namedtuple('SkillListing', 'id user_id skill_name description created_at '
+                                          'name location profile_photo')
+SkillWithOwner = namedtuple('SkillWithOwner', 'id user_id skill_name description name location')
+FeaturedSkill = namedtuple('FeaturedSkill', 'id skill_name name location')
+PendingSkill = namedtuple('PendingSkill', 'id skill_name description created_at name username')
+SkillState = namedtuple('SkillState', 'user_id skill_name skill_key is_approved')
+SkillDemand = namedtuple('SkillDemand', 'skill_name request_count')
+
+Swap = namedtuple('Swap', 'id requester_id provider_id offered_skill_id wanted_skill message status '
+                          'created_at updated_at')
+ReceivedSwap = namedtuple('ReceivedSwap', Swap._fields + ('requester_name', 'offered_skill'))
+SentSwap = namedtuple('SentSwap', Swap._fields + ('provider_name', 'offered_skill'))
+SwapParties = namedtuple('SwapParties', 'id requester_id provider_id requester_name provider_name')
+RecentSwap = namedtuple('RecentSwap', 'id status created_at requester_name provider_name skill_name')
+BusiestSlot = namedtuple('BusiestSlot', 'day hour cnt')
+
+Room = namedtuple('Room', 'id name description creator_id is_public room_code created_at '
+                          'member_count message_count last_message_at')
+RoomListing = namedtuple('RoomListing', Room._fields + ('creator_name', 'is_member'))
+MemberRoom = namedtuple('MemberRoom', Room._fields + ('creator_name', 'joined_at'))
+RoomDetail = namedtuple('RoomDetail', Room._fields + ('creator_name',))
+RoomMember = namedtuple('RoomMember', 'id name username profile_photo joined_at rating')
+
+ChatMessage = namedtuple('ChatMessage', 'id room_id user_id message created_at name profile_photo')
+PlatformMessage = namedtuple('PlatformMessage', 'id admin_id title message created_at name')
+
+_USER = 'u.id, u.username, u.email, u.name, u.location, u.profile_photo, u.is_public, u.availability, ' \
+        'u.is_admin, u.is_banned, u.created_at'
+_SWAP = 'sr.id, sr.requester_id, sr.provider_id, sr.offered_skill_id, sr.wanted_skill, sr.message, ' \
+        'sr.status, sr.created_at, sr.updated_at'
+_ROOM = 'r.id, r.name, r.description, r.creator_id, r.is_public, r.room_code, r.created_at, ' \
+        'r.member_count, r.message_count, r.last_message_at'
+_CHAT = 'rm.id, rm.room_id, rm.user_id, rm.message, rm.created_at, u.name, u.profile_photo'
+
+# How ``Rooms.public`` can sort; both orders are served by an index on rooms
+ROOM_ORDERS = {
+    'newest': 'r.created_at DESC',
+    'activity': 'r.last_message_at DESC, r.id DESC',
+}
+
+ADMIN_USERS_PAGE = ('''
+    SELECT u.id, u.username, u.email, u.name, u.location, u.profile_photo, u.is_public,
+           u.availability, u.is_banned, u.created_at, s.rating_count,
+           1.0 * s.rating_sum / NULLIF(s.rating_count, 0) as avg_rating
+    FROM users u
+    LEFT JOIN user_stats s ON s.user_id = u.id
+''', 'u.is_admin = 0', ('u.created_at', 'u.id'))
+
+USER_ACTIVITY_PAGE = ('''
+    SELECT u.id, u.name, u.username, u.created_at,
+           COALESCE(s.skills_offered, 0) as skills_offered,
+           COALESCE(s.skills_wanted, 0) as skills_wanted,
+           COALESCE(s.swap_requests, 0) as total_swaps,
+           1.0 * s.rating_sum / NULLIF(s.rating_count, 0) as avg_rating
+    FROM users u
+    LEFT JOIN user_stats s ON s.user_id = u.id
+''', 'u.is_admin = 0', ('u.created_at', 'u.id'))
+
+WANTED_BY_SQL = '''
+    SELECT id, user_id, skill_name, description, created_at
+    FROM skills_wanted WHERE user_id = ? ORDER BY created_at DESC
+'''
+
+SKILL_LISTING_PAGE = ('''
+    SELECT so.id, so.user_id, so.skill_name, so.description, so.created_at,
+           u.name, u.location, u.profile_photo
+    FROM skills_offered so
+    JOIN users u ON so.user_id = u.id
+''', 'u.is_public = 1 AND u.is_banned = 0 AND so.is_approved = 1', ('so.created_at', 'so.id'))
+
+PENDING_APPROVAL_SQL = '''
+    SELECT so.id, so.skill_name, so.description, so.created_at, u.name, u.username
+    FROM skills_offered so
+    JOIN users u ON so.user_id = u.id
+    WHERE so.is_approved = 0
+    ORDER BY so.created_at DESC
+'''
+
+MOST_REQUESTED_SQL = '''
+    SELECT so.skill_name, COUNT(sr.id) as request_count
+    FROM skills_offered so
+    LEFT JOIN swap_requests sr ON sr.offered_skill_id = so.id
+    WHERE so.user_id = ?
+    GROUP BY so.skill_name
+    ORDER BY request_count DESC
+    LIMIT ?
+'''
+
+RATING_EXISTS_SQL = 'SELECT id FROM ratings WHERE swap_request_id = ? AND rater_id = ?'
+
+# One statement per ROOM_ORDERS key
+PUBLIC_ROOMS_SQL = {sort: '''
+    SELECT %s, u.name as creator_name
+    FROM rooms r
+    JOIN users u ON r.creator_id = u.id
+    WHERE r.is_public = 1
+    ORDER BY %s
+''' % (_ROOM, order) for sort, order in ROOM_ORDERS.items()}
+
+MEMBERSHIPS_SQL = '''
+    SELECT room_id FROM room_members
+    WHERE user_id = ? AND room_id IN (SELECT value FROM json_each(?))
+'''
+
+IS_MEMBER_SQL = 'SELECT id FROM room_members WHERE room_id = ? AND user_id = ?'
+
+ROOM_MEMBERS_SQL = '''
+    SELECT u.id, u.name, u.username, u.profile_photo, rm.joined_at,
+           1.0 * s.rating_sum / NULLIF(s.rating_count, 0) as rating
+    FROM room_members rm
+    JOIN users u ON rm.user_id = u.id
+    LEFT JOIN user_stats s ON s.user_id = u.id
+    WHERE rm.room_id = ?
+    ORDER BY rm.joined_at ASC
+'''
+
+MEMBER_JOINED_SQL = 'UPDATE rooms SET member_count = member_count + 1 WHERE id = ?'
+
+MESSAGE_POSTED_SQL = '''
+    UPDATE rooms SET message_count = message_count + 1,
+                     last_message_at = (SELECT created_at FROM room_messages WHERE id = ?)
+    WHERE id = ?
+'''
+
+MESSAGES_AFTER_SQL = '''
+    SELECT %s
+    FROM room_messages rm
+    JOIN users u ON rm.user_id = u.id
+    WHERE rm.room_id = ? AND rm.id > ?
+    ORDER BY rm.id ASC
+    LIMIT ?
+''' % _CHAT
+
+MESSAGES_BEFORE_SQL = '''
+    SELECT %s
+    FROM room_messages rm
+    JOIN users u ON rm.user_id = u.id
+    WHERE rm.room_id = ? AND rm.id < ?
+    ORDER BY rm.id DESC
+    LIMIT ?
+''' % _CHAT
+
+RECENT_PLATFORM_SQL = '''
+    SELECT pm.id, pm.admin_id, pm.title, pm.message, pm.created_at, u.name
+    FROM platform_messages pm
+    JOIN users u ON pm.admin_id = u.id
+    ORDER BY pm.created_at DESC
+    LIMIT ?
+'''
+
+PLATFORM_PAGE = ('''
+    SELECT pm.id, pm.admin_id, pm.title, pm.message, pm.created_at, u.name
+    FROM platform_messages pm
+    JOIN users u ON pm.admin_id = u.id
+''', '1 = 1', ('pm.created_at', 'pm.id'))
+
+
+def as_dict(row):
+    """A row as a dict for JSON, whether a namedtuple or a ``sqlite3.Row``"""
+    return row._asdict() if isinstance(row, tuple) else dict(row)
+
+
+def id_list(ids):
+    """Bind value for ``IN (SELECT value FROM json_each(?))``"""
+    return json.dumps([int(i) for i in ids])
+
+
+class Table:
+    """Queries over one connection, with namedtuple row helpers"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _cursor(self):
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        return cursor
+
+    def _all(self, row_type, sql, params=()):
+        return list(map(row_type._make, self._cursor().execute(sql, params).fetchall()))
+
+    def _one(self, row_type, sql, params=()):
+        row = self._cursor().execute(sql, params).fetchone()
+        return row_type._make(row) if row else None
+
+    def _value(self, sql, params=()):
+        row = self._cursor().execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    def _page(self, row_type, page, params, cursor, limit):
+        select, where, key = page
+        return keyset_page(self.conn, select, where, params, cursor, limit, key=key, row_type=row_type)
+
+
+class Users(Table):
+
+    def get(self, user_id):
+        return self._one(User, 'SELECT %s FROM users u WHERE u.id = ?' % _USER, (user_id,))
+
+    def credentials(self, username):
+        """Password hash and flags for a login attempt"""
+        return self._one(Credentials, '''
+            SELECT id, password_hash, is_admin, is_banned FROM users WHERE username = ?
+        ''', (username,))
+
+    def exists(self, username, email):
+        return self._value('SELECT id FROM users WHERE username = ? OR email = ?',
+                           (username, email)) is not None
+
+    def find_active(self, username):
+        """Card for a user who is not banned, by username"""
+        return self._one(UserCard, '''
+            SELECT id, username, name, profile_photo FROM users WHERE username = ? AND is_banned = 0
+        ''', (username,))
+
+    def cards(self, user_ids):
+        """``{id: UserCard}`` for many users in one query"""
+        return {card.id: card for card in self._all(UserCard, '''
+            SELECT id, username, name, profile_photo FROM users
+            WHERE id IN (SELECT value FROM json_each(?))
+        ''', (id_list(user_ids),))}
+
+    def create(self, username, email, password_hash, name, location):
+        return self.conn.execute('''
+            INSERT INTO users (username, email, password_hash, name, location)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (username, email, password_hash, name, location)).lastrowid
+
+    def upgrade_password_hash(self, user_id, old_hash, new_hash):
+        """Replace ``old_hash``, unless the password was changed meanwhile"""
+        self.conn.execute('UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                          (new_hash, user_id, old_hash))
+
+    def update_profile(self, user_id, name, location, availability, is_public):
+        self.conn.execute('''
+            UPDATE users SET name = ?, location = ?, availability = ?,
+            is_public = ? WHERE id = ?
+        ''', (name, location, availability, is_public, user_id))
+
+    def set_banned(self, user_id, banned):
+        self.conn.execute('UPDATE users SET is_banned = ? WHERE id = ?', (banned, user_id))
+
+    def admin_page(self, cursor, limit):
+        """Non-admin users with their rating summary, newest first"""
+        return self._page(AdminUser, ADMIN_USERS_PAGE, (), cursor, limit)
+
+    def activity_page(self, cursor, limit):
+        """Per-user activity report, newest users first"""
+        return self._page(UserActivity, USER_ACTIVITY_PAGE, (), cursor, limit)
+
+
+class Skills(Table):
+
+    def wanted_by(self, user_id):
+        return self._all(WantedSkill, WANTED_BY_SQL, (user_id,))
+
+    def with_owner(self, skill_id):
+        return self._one(SkillWithOwner, '''
+            SELECT so.id, so.user_id, so.skill_name, so.description, u.name, u.location
+            FROM skills_offered so
+            JOIN users u ON so.user_id = u.id
+            WHERE so.id = ?
+        ''', (skill_id,))
+
+    def owner_id(self, skill_id):
+        return self._value('SELECT user_id FROM skills_offered WHERE id = ?', (skill_id,))
+
+    def state(self, skill_id):
+        """What approving or rejecting a skill needs to know about it"""
+        return self._one(SkillState, '''
+            SELECT user_id, skill_name, skill_key, is_approved FROM skills_offered WHERE id = ?
+        ''', (skill_id,))
+
+    def add_offered(self, user_id, skill_name, skill_key, description):
+        return self.conn.execute('''
+            INSERT INTO skills_offered (user_id, skill_name, skill_key, description)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, skill_name, skill_key, description)).lastrowid
+
+    def add_wanted(self, user_id, skill_name, skill_key, description):
+        return self.conn.execute('''
+            INSERT INTO skills_wanted (user_id, skill_name, skill_key, description)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, skill_name, skill_key, description)).lastrowid
+
+    def approve(self, skill_id):
+        self.conn.execute('UPDATE skills_offered SET is_approved = 1 WHERE id = ?', (skill_id,))
+
+    def delete(self, skill_id):
+        self.conn.execute('DELETE FROM skills_offered WHERE id = ?', (skill_id,))
+
+    def listing_page(self, cursor, limit):
+        """Approved skills of public, active users, newest first"""
+        return self._page(SkillListing, SKILL_LISTING_PAGE, (), cursor, limit)
+
+    def featurable_ids(self):
+        """Ids of every skill that may be featured on the home page"""
+        return (row[0] for row in self._cursor().execute('''
+            SELECT so.id
+            FROM skills_offered so
+            JOIN users u ON so.user_id = u.id
+            WHERE u.is_public = 1 AND u.is_banned = 0 AND so.is_approved = 1
+        '''))
+
+    def featured(self, skill_ids):
+        """The given skills that are still featurable, in ``skill_ids`` order"""
+        by_id = {skill.id: skill for skill in self._all(FeaturedSkill, '''
+            SELECT so.id, so.skill_name, u.name, u.location
+            FROM skills_offered so
+            JOIN users u ON so.user_id = u.id
+            WHERE so.id IN (SELECT value FROM json_each(?))
+            AND u.is_public = 1 AND u.is_banned = 0 AND so.is_approved = 1
+        ''', (id_list(skill_ids),))}
+        return [by_id[skill_id] for skill_id in skill_ids if skill_id in by_id]
+
+    def pending_approval(self):
+        return self._all(PendingSkill, PENDING_APPROVAL_SQL)
+
+    def most_requested(self, user_id, limit=3):
+        """A user's offered skills by the swap requests they drew"""
+        return self._all(SkillDemand, MOST_REQUESTED_SQL, (user_id, limit))
+
+
+class Swaps(Table):
+
+    def received(self, swap_id, provider_id):
+        """A swap sent to ``provider_id``, whatever its status"""
+        return self._one(Swap, '''
+            SELECT %s FROM swap_requests sr WHERE sr.id = ? AND sr.provider_id = ?
+        ''' % _SWAP, (swap_id, provider_id))
+
+    def pending_sent(self, swap_id, requester_id):
+        """A swap ``requester_id`` sent that is still pending"""
+        return self._one(Swap, '''
+            SELECT %s FROM swap_requests sr WHERE sr.id = ? AND sr.requester_id = ? AND sr.status = 'pending'
+        ''' % _SWAP, (swap_id, requester_id))
+
+    def accepted(self, swap_id, user_id):
+        """An accepted swap ``user_id`` took part in"""
+        return self._one(Swap, '''
+            SELECT %s FROM swap_requests sr WHERE sr.id = ? AND sr.status = 'accepted'
+            AND (sr.requester_id = ? OR sr.provider_id = ?)
+        ''' % _SWAP, (swap_id, user_id, user_id))
+
+    def accepted_parties(self, swap_id, user_id):
+        """An accepted swap ``user_id`` took part in, with both names"""
+        return self._one(SwapParties, '''
+            SELECT sr.id, sr.requester_id, sr.provider_id,
+                   u1.name as requester_name, u2.name as provider_name
+            FROM swap_requests sr
+            JOIN users u1 ON sr.requester_id = u1.id
+            JOIN users u2 ON sr.provider_id = u2.id
+            WHERE sr.id = ? AND sr.status = 'accepted'
+            AND (sr.requester_id = ? OR sr.provider_id = ?)
+        ''', (swap_id, user_id, user_id))
+
+    def recent(self, limit=10):
+        return self._all(RecentSwap, '''
+            SELECT sr.id, sr.status, sr.created_at, u1.name as requester_name, u2.name as provider_name,
+                   so.skill_name
+            FROM swap_requests sr
+            JOIN users u1 ON sr.requester_id = u1.id
+            JOIN users u2 ON sr.provider_id = u2.id
+            JOIN skills_offered so ON sr.offered_skill_id = so.id
+            ORDER BY sr.created_at DESC
+            LIMIT ?
+        ''', (limit,))
+
+    def busiest_slot(self, user_id):
+        """Weekday (0 = Sunday) and hour in which ``user_id`` had the most accepted swaps"""
+        return self._one(BusiestSlot, '''
+            SELECT strftime('%w', updated_at) as day, strftime('%H', updated_at) as hour, COUNT(*) as cnt
+            FROM swap_requests
+            WHERE (requester_id = ? OR provider_id = ?) AND status = 'accepted'
+            GROUP BY day, hour
+            ORDER BY cnt DESC
+            LIMIT 1
+        ''', (user_id, user_id))
+
+    def create(self, requester_id, provider_id, offered_skill_id, wanted_skill, message):
+        return self.conn.execute('''
+            INSERT INTO swap_requests (requester_id, provider_id, offered_skill_id, wanted_skill, message)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (requester_id, provider_id, offered_skill_id, wanted_skill, message)).lastrowid
+
+    def set_status(self, swap_id, status):
+        self.conn.execute('''
+            UPDATE swap_requests SET status = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (status, swap_id))
+
+    def delete(self, swap_id):
+        self.conn.execute('DELETE FROM swap_requests WHERE id = ?', (swap_id,))
+
+
+class Ratings(Table):
+
+    def exists(self, swap_id, rater_id):
+        return self._value(RATING_EXISTS_SQL, (swap_id, rater_id)) is not None
+
+    def create(self, swap_id, rater_id, rated_id, rating, feedback):
+        return self.conn.execute('''
+            INSERT INTO ratings (swap_request_id, rater_id, rated_id, rating, feedback)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (swap_id, rater_id, rated_id, rating, feedback)).lastrowid
+
+
+class Rooms(Table):
+
+    def get(self, room_id):
+        return self._one(Room, 'SELECT %s FROM rooms r WHERE r.id = ?' % _ROOM, (room_id,))
+
+    def get_public(self, room_id):
+        return self._one(Room, 'SELECT %s FROM rooms r WHERE r.id = ? AND r.is_public = 1' % _ROOM,
+                         (room_id,))
+
+    def by_code(self, room_code):
+        return self._one(Room, 'SELECT %s FROM rooms r WHERE r.room_code = ?' % _ROOM, (room_code,))
+
+    def code_taken(self, room_code):
+        return self._value('SELECT id FROM rooms WHERE room_code = ?', (room_code,)) is not None
+
+    def detail(self, room_id):
+        return self._one(RoomDetail, '''
+            SELECT %s, u.name as creator_name
+            FROM rooms r
+            JOIN users u ON r.creator_id = u.id
+            WHERE r.id = ?
+        ''' % _ROOM, (room_id,))
+
+    def public(self, viewer_id, sort='newest'):
+        """Every public room, newest or most recently active first, and whether the viewer is in it"""
+        rooms = self._cursor().execute(PUBLIC_ROOMS_SQL[sort]).fetchall()
+        mine = self.memberships(viewer_id, [room[0] for room in rooms])
+        return [RoomListing._make(room + (room[0] in mine,)) for room in rooms]
+
+    def memberships(self, user_id, room_ids):
+        """The subset of ``room_ids`` that ``user_id`` belongs to"""
+        if not room_ids:
+            return set()
+        return {row[0] for row in self._cursor().execute(MEMBERSHIPS_SQL, (user_id, id_list(room_ids)))}
+
+    def is_member(self, room_id, user_id):
+        return self._value(IS_MEMBER_SQL, (room_id, user_id)) is not None
+
+    def members(self, room_id):
+        """Members with their average rating, in the order they joined"""
+        return self._all(RoomMember, ROOM_MEMBERS_SQL, (room_id,))
+
+    def create(self, name, description, creator_id, is_public, room_code):
+        """Create a room with its creator as the first member; returns its id"""
+        room_id = self.conn.execute('''
+            INSERT INTO rooms (name, description, creator_id, is_public, room_code)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (name, description, creator_id, is_public, room_code)).lastrowid
+        self.add_member(room_id, creator_id)
+        return room_id
+
+    def add_member(self, room_id, user_id):
+        """Add a member and count them on the room, in the caller's transaction"""
+        self.conn.execute('''
+            INSERT INTO room_members (room_id, user_id)
+            VALUES (?, ?)
+        ''', (room_id, user_id))
+        self.conn.execute(MEMBER_JOINED_SQL, (room_id,))
+
+    def remove_member(self, room_id, user_id):
+        """Remove a member and uncount them, in the caller's transaction"""
+        removed = self.conn.execute('''
+            DELETE FROM room_members WHERE room_id = ? AND user_id = ?
+        ''', (room_id, user_id)).rowcount
+        if removed:
+            self.conn.execute('UPDATE rooms SET member_count = member_count - ? WHERE id = ?',
+                              (removed, room_id))
+
+    def delete(self, room_id):
+        """Delete a room with its messages and members"""
+        self.conn.execute('DELETE FROM room_messages WHERE room_id = ?', (room_id,))
+        self.conn.execute('DELETE FROM room_members WHERE room_id = ?', (room_id,))
+        self.conn.execute('DELETE FROM rooms WHERE id = ?', (room_id,))
+
+
+def _post_message(conn, room_id, user_id, message):
+    message_id = conn.execute('''
+        INSERT INTO room_messages (room_id, user_id, message)
+        VALUES (?, ?, ?)
+    ''', (room_id, user_id, message)).lastrowid
+    conn.execute(MESSAGE_POSTED_SQL, (message_id, room_id))
+    return message_id
+
+
+class Messages(Table):
+    """Room chat messages and platform-wide admin messages"""
+
+    def after(self, room_id, after, limit):
+        """Up to ``limit`` messages newer than id ``after``, oldest first"""
+        return self._all(ChatMessage, MESSAGES_AFTER_SQL, (room_id, after, limit))
+
+    def before(self, room_id, before, limit):
+        """Up to ``limit`` messages older than id ``before``, newest first"""
+        return self._all(ChatMessage, MESSAGES_BEFORE_SQL, (room_id, before, limit))
+
+    def get(self, message_id):
+        return self._one(ChatMessage, '''
+            SELECT %s
+            FROM room_messages rm
+            JOIN users u ON rm.user_id = u.id
+            WHERE rm.id = ?
+        ''' % _CHAT, (message_id,))
+
+    @staticmethod
+    def post(room_id, user_id, message):
+        """Insert a chat message and count it on its room in one ``write`` job; returns its id"""
+        return write(_post_message, room_id, user_id, message)
+
+    def recent_platform(self, limit=3):
+        """Newest platform messages with the sending admin's name"""
+        return self._all(PlatformMessage, RECENT_PLATFORM_SQL, (limit,))
+
+    def platform_page(self, cursor, limit):
+        return self._page(PlatformMessage, PLATFORM_PAGE, (), cursor, limit)
+
+    def send_platform(self, admin_id, title, message):
+        return self.conn.execute('''
+            INSERT INTO platform_messages (admin_id, title, message)
+            VALUES (?, ?, ?)
+        ''', (admin_id, title, message)).lastrowid
+
+    def delete_platform(self, message_id):
+        self.conn.execute('DELETE FROM platform_messages WHERE id = ?', (message_id,))
+
+
+class Repository:
+    """All the tables over one connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.users = Users(conn)
+        self.skills = Skills(conn)
+        self.swaps = Swaps(conn)
+        self.ratings = Ratings(conn)
+        self.rooms = Rooms(conn)
+        self.messages = Messages(conn)
+
+
+def get_repo():
+    """Repository over the current request's pooled connection"""
+    if 'repo' not in g:
+        g.repo = Repository(get_db())
+    return g.repo
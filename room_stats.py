@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Per-room aggregates kept on the ``rooms`` row itself.
+
+Room listings used to count ``room_members`` with a correlated subquery for
+every room, so they cost O(rooms x members). Instead ``rooms`` carries
+``member_count``, ``message_count`` and ``last_message_at``. The repository
+updates them in the same transaction as the membership or message write
+(``Rooms.add_member``, ``Rooms.remove_member``, ``Messages.post``), so a
+count can never commit without its change or the other way round.
+
+Usage: python room_stats.py [--repair] [database]   # report (and fix) drift
+"""
+
+import argparse
+import sqlite3
+
+COLUMNS = ('member_count', 'message_count', 'last_message_at')
+
+# What every counter should be, recomputed from the base tables; the last
+# message is the newest by id, as Messages.post records it
+_EXPECTED = {
+    'member_count': '(SELECT COUNT(*) FROM room_members WHERE room_id = rooms.id)',
+    'message_count': '(SELECT COUNT(*) FROM room_messages WHERE room_id = rooms.id)',
+    'last_message_at': '(SELECT created_at FROM room_messages WHERE room_id = rooms.id ORDER BY id DESC LIMIT 1)',
+}
+
+
+def find_drift(conn):
+    """Rooms whose stored counters disagree with the base tables"""
+    return conn.execute('SELECT id FROM rooms WHERE %s'
+                        % ' OR '.join('%s IS NOT %s' % (c, _EXPECTED[c]) for c in COLUMNS)).fetchall()
+
+
+def rebuild_room_stats(conn):
+    """Recompute every room's counters from scratch"""
+    conn.execute('UPDATE rooms SET %s' % ', '.join('%s = %s' % (c, _EXPECTED[c]) for c in COLUMNS))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check room counters against the base tables')
+    parser.add_argument('database', nargs='?', default='skillswap.db')
+    parser.add_argument('--repair', action='store_true', help='rebuild the counters if they have drifted')
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.database)
+    drifted = find_drift(conn)
+    print('%d rooms with drifted counters' % len(drifted))
+    if drifted and args.repair:
+        rebuild_room_stats(conn)
+        conn.commit()
+        print('Rebuilt room counters; %d rooms drifted after repair' % len(find_drift(conn)))
+    conn.close()
+    return 1 if drifted and not args.repair else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,101 @@
+"""
+Full-text skill search backed by the ``skills_fts`` FTS5 index.
+
+``skills_fts`` is an external-content index over the name and description of
+approved rows in ``skills_offered``; triggers created by migration 5 keep it
+in sync on insert, approve, edit and delete. Results are ranked with bm25
+(skill name weighted above description) and every search term is matched as
+a prefix, so "pho" finds "Photoshop".
+"""
+
+import re
+
+from markupsafe import Markup, escape
+
+from pagination import keyset_page
+
+# Control characters mark highlighted spans inside SQLite; they are swapped
+# for <mark> only after the surrounding user text has been HTML-escaped
+_OPEN, _CLOSE = '\x02', '\x03'
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available(conn):
+    """True when this SQLite build was compiled with FTS5"""
+    options = [row[0] for row in conn.execute('PRAGMA compile_options')]
+    return 'ENABLE_FTS5' in options
+
+
+def has_index(conn):
+    """True when the skills_fts table exists in this database"""
+    return conn.execute('''
+        SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'skills_fts'
+    ''').fetchone() is not None
+
+
+def build_match(search):
+    """Turn free text into an FTS5 query: every word, as a quoted prefix"""
+    terms = _TERM.findall(search)
+    return ' '.join('"%s"*' % term for term in terms)
+
+
+def _highlighted(text):
+    if text is None:
+        return None
+    return Markup(str(escape(text)).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>'))
+
+
+def search_skills(conn, search, limit=100):
+    """Public, approved skills matching ``search``, best match first
+
+    Each result is a dict of the skills_offered columns plus the owner's
+    name/location/photo, with ``skill_name_html`` and ``snippet_html`` holding
+    safe, highlighted markup.
+    """
+    match = build_match(search)
+    if not match:
+        return []
+
+    rows = conn.execute('''
+        SELECT so.*, u.name, u.location, u.profile_photo,
+               highlight(skills_fts, 0, ?, ?) AS skill_name_marked,
+               snippet(skills_fts, 1, ?, ?, '...', 24) AS snippet_marked
+        FROM skills_fts
+        JOIN skills_offered so ON so.id = skills_fts.rowid
+        JOIN users u ON so.user_id = u.id
+        WHERE skills_fts MATCH ?
+        AND u.is_public = 1 AND u.is_banned = 0 AND so.is_approved = 1
+        ORDER BY bm25(skills_fts, 10.0, 1.0)
+        LIMIT ?
+    ''', (_OPEN, _CLOSE, _OPEN, _CLOSE, match, limit)).fetchall()
+
+    results = []
+    for row in rows:
+        skill = dict(row)
+        skill['skill_name_html'] = _highlighted(skill.pop('skill_name_marked'))
+        snippet = skill.pop('snippet_marked')
+        skill['snippet_html'] = _highlighted(snippet) if skill['description'] else None
+        results.append(skill)
+    return results
+
+
+def search_skills_like(conn, search, cursor=None, limit=None):
+    """The original unindexed LIKE search, kept for builds without FTS5
+
+    Returns ``(rows, next_cursor)``, newest first; with a ``limit`` the rows
+    are one keyset page starting after ``cursor``, otherwise every match.
+    """
+    select = '''
+        SELECT so.*, u.name, u.location, u.profile_photo
+        FROM skills_offered so
+        JOIN users u ON so.user_id = u.id
+    '''
+    where = '''u.is_public = 1 AND u.is_banned = 0 AND so.is_approved = 1
+        AND (so.skill_name LIKE ? OR so.description LIKE ?)'''
+    params = (f'%{search}%', f'%{search}%')
+
+    if limit is None:
+        sql = select + ' WHERE ' + where + ' ORDER BY so.created_at DESC, so.id DESC'
+        return conn.execute(sql, params).fetchall(), None
+    return keyset_page(conn, select, where, params, cursor, limit, key=('so.created_at', 'so.id'))
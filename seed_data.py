@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Bulk-load synthetic data for load testing and query-plan work.
+
+Generates users, offered and wanted skills, swap requests, ratings, rooms,
+members and chat messages with skewed, roughly realistic distributions: a
+few skills are far more popular than the rest, a few users and rooms do most
+of the talking, and timestamps grow with ids over ``--days``.
+
+Rows go in with ``executemany`` in transactions of ``--batch`` rows. The
+loaded tables' secondary indexes and triggers are dropped first and put back
+afterwards, ``ANALYZE`` refreshes the planner statistics, and the derived
+tables (user_stats, room and platform counters, the search index) are
+rebuilt once, which is much faster than keeping them current row by row.
+Reciprocal matches are rebuilt last, one user at a time; it is the slowest
+step, and ``--no-matches`` skips it. Every seeded user's password is
+``--password``.
+
+Usage:
+    python seed_data.py --scale small [database]
+    python seed_data.py --users 1000000 --skills 5000000 --swaps 10000000 --messages 50000000 big.db
+"""
+
+import argparse
+import random
+import time
+from array import array
+
+from werkzeug.security import generate_password_hash
+
+from counters import recompute
+from db import connect
+from matching import normalize_skill, rebuild_matches
+from migrations import migrate
+from room_stats import rebuild_room_stats
+from search import has_index
+from user_stats import rebuild_stats
+
+# Row counts per scale; --users etc. override single values
+SCALES = {
+    'tiny': dict(users=1000, skills=5000, wanted=2000, swaps=10000, rooms=50, messages=50000),
+    'small': dict(users=10000, skills=50000, wanted=20000, swaps=100000, rooms=500, messages=500000),
+    'medium': dict(users=100000, skills=500000, wanted=200000, swaps=1000000, rooms=5000,
+                   messages=5000000),
+    'large': dict(users=1000000, skills=5000000, wanted=2000000, swaps=10000000, rooms=50000,
+                  messages=50000000),
+}
+
+LOADED_TABLES = ('users', 'skills_offered', 'skills_wanted', 'swap_requests', 'ratings',
+                 'rooms', 'room_members', 'room_messages')
+
+SKILLS = ('Python', 'JavaScript', 'Guitar', 'Piano', 'Spanish', 'French', 'Cooking', 'Photography',
+          'Yoga', 'Drawing', 'Excel', 'SQL', 'Public Speaking', 'Writing', 'Marketing', 'Design',
+          'Video Editing', 'Chess', 'Gardening', 'Knitting', 'Woodworking', 'Baking', 'German',
+          'Japanese', 'Mandarin', 'Singing', 'Dancing', 'Running', 'Swimming', 'Accounting',
+          'Machine Learning', 'React', 'Rust', 'Go', 'Linux', 'Docker', 'Statistics', 'Calculus',
+          'Physics', 'Painting', 'Pottery', 'Sewing', 'Carpentry', 'Plumbing', 'Car Repair',
+          'Meditation', 'Tennis', 'Climbing', 'Negotiation', 'Sales')
+LEVELS = ('', 'Beginner ', 'Intermediate ', 'Advanced ', 'Conversational ', 'Professional ')
+FIRST_NAMES = ('Alex', 'Sam', 'Priya', 'Chen', 'Maria', 'Omar', 'Lena', 'Kofi', 'Yuki', 'Ivan',
+               'Ana', 'Raj', 'Emma', 'Noah', 'Fatima', 'Diego', 'Sara', 'Tom', 'Aisha', 'Leo')
+LAST_NAMES = ('Smith', 'Patel', 'Garcia', 'Kim', 'Nguyen', 'Okafor', 'Rossi', 'Muller', 'Silva',
+              'Khan', 'Cohen', 'Tanaka', 'Novak', 'Haddad', 'Jones', 'Lopez', 'Sato', 'Ali')
+CITIES = ('Mumbai', 'Pune', 'Delhi', 'Bangalore', 'London', 'New York', 'Berlin', 'Lagos', 'Tokyo',
+          'Sao Paulo', 'Toronto', 'Sydney', 'Paris', 'Nairobi', 'Seoul', None)
+AVAILABILITY = ('Weekends', 'Evenings', 'Weekdays', 'Flexible', None)
+WORDS = ('hi', 'thanks', 'great', 'session', 'tomorrow', 'practice', 'question', 'link', 'notes',
+         'lesson', 'time', 'works', 'for', 'me', 'the', 'a', 'can', 'we', 'share', 'next', 'week',
+         'learned', 'so', 'much', 'today', 'how', 'about', 'this', 'exercise', 'cool')
+
+
+def skewed(rng, n, power=2.0):
+    """Index in [0, n) favouring small values; higher ``power`` is more skewed"""
+    return int(n * rng.random() ** power)
+
+
+class Clock:
+    """Timestamps spread evenly over the last ``days`` days for ``count`` rows"""
+
+    def __init__(self, days, count):
+        self.start = time.time() - days * 86400
+        self.step = days * 86400 / max(count, 1)
+
+    def at(self, n):
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(self.start + n * self.step))
+
+
+def _drop_extras(conn, tables):
+    """Drop secondary indexes and triggers on ``tables``; returns the SQL to recreate them"""
+    rows = conn.execute('''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND tbl_name IN (%s) AND sql IS NOT NULL
+    ''' % ','.join('?' * len(tables)), tables).fetchall()
+    for kind, name, _ in rows:
+        conn.execute('DROP %s %s' % (kind.upper(), name))
+    return [sql for _, _, sql in rows]
+
+
+def _load(conn, label, sql, rows, batch):
+    """executemany ``rows`` into the database, committing every ``batch`` rows"""
+    started = time.perf_counter()
+    total = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= batch:
+            conn.executemany(sql, chunk)
+            conn.commit()
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        conn.executemany(sql, chunk)
+        conn.commit()
+        total += len(chunk)
+    elapsed = time.perf_counter() - started
+    print('%-14s %11d rows %8.1fs %10.0f rows/s' % (label, total, elapsed, total / elapsed if elapsed else 0))
+    return total
+
+
+def seed(conn, users, skills, wanted, swaps, rooms, messages, batch=50000, days=730, seed=1,
+         password='password', matches=True):
+    """Append synthetic rows to a migrated database"""
+    rng = random.Random(seed)
+    vocabulary = [level + skill for skill in SKILLS for level in LEVELS]
+
+    def first(table):
+        return conn.execute('SELECT COALESCE(MAX(id), 0) FROM %s' % table).fetchone()[0] + 1
+
+    user0, skill0, swap0, room0 = (first(table) for table in ('users', 'skills_offered', 'swap_requests', 'rooms'))
+    password_hash = generate_password_hash(password)
+
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -262144')
+    recreate = _drop_extras(conn, LOADED_TABLES)
+    conn.commit()
+
+    def user_id():
+        return user0 + skewed(rng, users, 1.5)
+
+    clock = Clock(days, users)
+    _load(conn, 'users', '''
+        INSERT INTO users (id, username, email, password_hash, name, location, is_public, availability,
+                           is_banned, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ((user0 + n, 'user%d' % (user0 + n), 'user%d@example.com' % (user0 + n), password_hash,
+           '%s %s' % (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)), rng.choice(CITIES),
+           int(rng.random() < 0.9), rng.choice(AVAILABILITY), int(rng.random() < 0.005), clock.at(n))
+          for n in range(users)), batch)
+
+    # Owner of each offered skill, for swap requests
+    owners = array('q')
+
+    def offered():
+        clock = Clock(days, skills)
+        for n in range(skills):
+            name = vocabulary[skewed(rng, len(vocabulary), 3.0)]
+            owner = user_id()
+            owners.append(owner)
+            yield (skill0 + n, owner, name, normalize_skill(name), 'I can teach %s.' % name,
+                   int(rng.random() < 0.97), clock.at(n))
+
+    _load(conn, 'skills_offered', '''
+        INSERT INTO skills_offered (id, user_id, skill_name, skill_key, description, is_approved, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', offered(), batch)
+
+    clock = Clock(days, wanted)
+    _load(conn, 'skills_wanted', '''
+        INSERT INTO skills_wanted (user_id, skill_name, skill_key, description, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ((user_id(), name, normalize_skill(name), 'I want to learn %s.' % name, clock.at(n))
+          for n, name in ((n, vocabulary[skewed(rng, len(vocabulary), 3.0)]) for n in range(wanted))), batch)
+
+    # (id, requester, provider) of accepted swaps, for ratings
+    accepted = (array('q'), array('q'), array('q'))
+
+    def swap_rows():
+        clock = Clock(days, swaps)
+        for n in range(swaps):
+            skill = skewed(rng, skills, 1.5)
+            status = rng.choices(('pending', 'accepted', 'rejected'), (25, 55, 20))[0]
+            requester, provider = user_id(), owners[skill]
+            if status == 'accepted':
+                for column, value in zip(accepted, (swap0 + n, requester, provider)):
+                    column.append(value)
+            created = clock.at(n)
+            yield (swap0 + n, requester, provider, skill0 + skill,
+                   vocabulary[skewed(rng, len(vocabulary), 3.0)], 'Want to swap?', status, created, created)
+
+    if skills:
+        _load(conn, 'swap_requests', '''
+            INSERT INTO swap_requests (id, requester_id, provider_id, offered_skill_id, wanted_skill, message,
+                                       status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', swap_rows(), batch)
+
+    def rating_rows():
+        clock = Clock(days, len(accepted[0]))
+        for n, (swap, requester, provider) in enumerate(zip(*accepted)):
+            if rng.random() < 0.6:
+                yield (swap, requester, provider, rng.choices((1, 2, 3, 4, 5), (2, 3, 10, 35, 50))[0],
+                       'Great swap!', clock.at(n))
+
+    _load(conn, 'ratings', '''
+        INSERT INTO ratings (swap_request_id, rater_id, rated_id, rating, feedback, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rating_rows(), batch)
+    del owners, accepted
+
+    members = {}
+
+    def room_rows():
+        clock = Clock(days, rooms)
+        for n in range(rooms):
+            creator = user_id()
+            members[room0 + n] = [creator]
+            yield (room0 + n, '%s circle %d' % (rng.choice(SKILLS), room0 + n), 'Practice together',
+                   creator, int(rng.random() < 0.8), 'S%07X' % (room0 + n), clock.at(n))
+
+    _load(conn, 'rooms', '''
+        INSERT INTO rooms (id, name, description, creator_id, is_public, room_code, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', room_rows(), batch)
+
+    def member_rows():
+        clock = Clock(days, rooms)
+        for n, (room, room_members) in enumerate(members.items()):
+            size = 1 + skewed(rng, min(users, 2000), 6.0)
+            others = set(user0 + i for i in rng.sample(range(users), min(size, users))) - set(room_members)
+            room_members.extend(others)
+            for user in room_members:
+                yield room, user, clock.at(n)
+
+    _load(conn, 'room_members', '''
+        INSERT INTO room_members (room_id, user_id, joined_at) VALUES (?, ?, ?)
+    ''', member_rows(), batch)
+
+    def message_rows():
+        clock = Clock(days, messages)
+        room_ids = list(members)
+        for n in range(messages):
+            room = room_ids[skewed(rng, len(room_ids), 2.0)]
+            room_members = members[room]
+            author = room_members[skewed(rng, len(room_members), 2.0)]
+            text = ' '.join(rng.choice(WORDS) for _ in range(3 + skewed(rng, 20, 2.0)))
+            yield room, author, text, clock.at(n)
+
+    if members:
+        _load(conn, 'room_messages', '''
+            INSERT INTO room_messages (room_id, user_id, message, created_at) VALUES (?, ?, ?, ?)
+        ''', message_rows(), batch)
+
+    started = time.perf_counter()
+    for sql in recreate:
+        conn.execute(sql)
+    # Fresh statistics; without them the user_stats rebuild below walks every
+    # accepted swap once per user
+    conn.execute('ANALYZE')
+    conn.commit()
+    print('%-14s %28.1fs' % ('indexes', time.perf_counter() - started))
+
+    # Derived tables, rebuilt once instead of row by row
+    started = time.perf_counter()
+    rebuild_stats(conn)
+    rebuild_room_stats(conn)
+    recompute(conn)
+    if has_index(conn):
+        conn.execute("INSERT INTO skills_fts (skills_fts) VALUES ('delete-all')")
+        conn.execute('''
+            INSERT INTO skills_fts (rowid, skill_name, description)
+            SELECT id, skill_name, description FROM skills_offered WHERE is_approved = 1
+        ''')
+    if matches:
+        rebuild_matches(conn)
+    conn.execute('UPDATE table_versions SET version = version + 1')
+    conn.commit()
+    print('%-14s %28.1fs' % ('derived', time.perf_counter() - started))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk-load synthetic Skill Swap data')
+    parser.add_argument('database', nargs='?', default='skillswap.db')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='tiny')
+    for name in SCALES['tiny']:
+        parser.add_argument('--' + name, type=int, help='override the scale\'s %s count' % name)
+    parser.add_argument('--batch', type=int, default=50000, help='rows per transaction')
+    parser.add_argument('--days', type=int, default=730, help='history the timestamps span')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--no-matches', dest='matches', action='store_false',
+                        help='leave skill_matches empty (its rebuild is the slowest step)')
+    args = parser.parse_args(argv)
+
+    counts = dict(SCALES[args.scale])
+    counts.update({name: getattr(args, name) for name in counts if getattr(args, name) is not None})
+
+    conn = connect(args.database)
+    migrate(conn)
+    started = time.perf_counter()
+    seed(conn, batch=args.batch, days=args.days, seed=args.seed, password=args.password,
+         matches=args.matches, **counts)
+    print('Seeded %s in %.1fs' % (args.database, time.perf_counter() - started))
+    conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,180 @@
+"""
+The signed-in user for each request, and optional server-side sessions.
+
+The session only records ``user_id``. A ``before_request`` hook turns it into
+a ``Principal`` (id, username, name, admin and banned flags, photo) exposed
+as ``g.user``, so routes and templates never query ``users`` just to check
+who is asking or whether they are an admin.
+
+Principals are cached per worker for ``PRINCIPAL_CACHE_TTL`` seconds. Profile
+edits and bans call ``invalidate``, which drops the entry at once in this
+worker; other workers pick the change up when their entry expires. Every
+invalidation bumps a version number, and a principal loaded while the version
+moved is returned but not cached, so a slow load can never put back data an
+edit has just replaced.
+
+With ``SESSION_BACKEND = 'sqlite'`` the session data lives in the
+``sessions`` table and the cookie only carries a random id. Banning a user
+deletes their rows, which signs them out of every worker immediately.
+"""
+
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from db import get_db, per_worker
+
+Principal = namedtuple('Principal', 'id username name is_admin is_banned profile_photo')
+
+PRINCIPAL_SQL = 'SELECT %s FROM users WHERE id = ?' % ', '.join(Principal._fields)
+LOAD_SQL = 'SELECT data FROM sessions WHERE id = ? AND expires_at > ?'
+REVOKE_SQL = 'DELETE FROM sessions WHERE user_id = ?'
+PRUNE_SQL = 'DELETE FROM sessions WHERE expires_at <= ?'
+
+
+class PrincipalCache:
+    """Bounded, TTL-limited cache of principals for one worker process"""
+
+    def __init__(self, ttl=30, max_size=10000):
+        self.pid = os.getpid()
+        self.ttl = ttl
+        self.max_size = max_size
+        self.version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, user_id, get_conn=get_db):
+        """Principal for ``user_id``, or None if the user no longer exists
+
+        ``get_conn`` is only called on a miss, so a hit borrows no connection.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and now - entry[1] < self.ttl:
+                self._entries.move_to_end(user_id)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+            version = self.version
+
+        row = get_conn().execute(PRINCIPAL_SQL, (user_id,)).fetchone()
+        principal = Principal(*row) if row else None
+
+        with self._lock:
+            if principal and version == self.version:
+                self._entries[user_id] = (principal, now)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id):
+        """Forget ``user_id`` after a change to its row"""
+        with self._lock:
+            self.version += 1
+            self._entries.pop(user_id, None)
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        lookups = self._stats['hits'] + self._stats['misses']
+        return dict(self._stats, size=len(self._entries), max_size=self.max_size, ttl=self.ttl,
+                    version=self.version,
+                    hit_rate=round(self._stats['hits'] / lookups, 4) if lookups else None)
+
+
+def get_principals(app=None):
+    """Return this worker's principal cache, built from the PRINCIPAL_* settings"""
+    app = app or current_app
+    return per_worker(app, 'principals', lambda: PrincipalCache(
+        ttl=app.config['PRINCIPAL_CACHE_TTL'], max_size=app.config['PRINCIPAL_CACHE_SIZE']))
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session data kept in the ``sessions`` table, addressed by ``sid``"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.loaded_user_id = self.get('user_id')
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """Store sessions in SQLite; the cookie holds only the session id
+
+    Expired rows are deleted every ``prune_every`` saves.
+    """
+
+    def __init__(self, prune_every=1000):
+        self.prune_every = prune_every
+        self._saves = 0
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            row = get_db().execute(LOAD_SQL, (sid, time.time())).fetchone()
+            if row:
+                return ServerSession(json.loads(row['data']), sid=sid)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        conn = get_db()
+
+        if not session:
+            if session.modified and not session.new:
+                conn.execute('DELETE FROM sessions WHERE id = ?', (session.sid,))
+                conn.commit()
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        expires = self.get_expiration_time(app, session)
+        # Browser-session cookies still need a server-side limit
+        stored_until = time.time() + app.permanent_session_lifetime.total_seconds()
+        if session.modified or session.new:
+            if not session.new and session.get('user_id') != session.loaded_user_id:
+                # New id whenever the user changes, so a planted session id is useless
+                conn.execute('DELETE FROM sessions WHERE id = ?', (session.sid,))
+                session.sid = secrets.token_urlsafe(32)
+            conn.execute('''
+                INSERT INTO sessions (id, user_id, data, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    user_id = excluded.user_id, data = excluded.data, expires_at = excluded.expires_at
+            ''', (session.sid, session.get('user_id'), json.dumps(dict(session)), stored_until))
+            self._saves += 1
+            if self._saves % self.prune_every == 0:
+                conn.execute(PRUNE_SQL, (time.time(),))
+            conn.commit()
+
+        response.set_cookie(name, session.sid, expires=expires, httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path, secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
+
+def revoke_sessions(conn, user_id):
+    """Sign ``user_id`` out everywhere (server-side sessions only); caller commits"""
+    if isinstance(current_app.session_interface, SQLiteSessionInterface):
+        conn.execute(REVOKE_SQL, (user_id,))
+
+
+def init_app(app):
+    """Switch to server-side sessions when SESSION_BACKEND is 'sqlite'"""
+    if app.config.get('SESSION_BACKEND') == 'sqlite':
+        app.session_interface = SQLiteSessionInterface()
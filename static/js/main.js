@@ -536,17 +536,24 @@ function showCopySuccess(buttonElement) {
 
 // Auto-refresh for chat and dynamic content
 function initializeAutoRefresh() {
-    // Auto-refresh chat messages - only if on room detail page
+    // Incremental chat updates - only if on room detail page
     const chatContainer = document.getElementById('chatMessages');
-    if (chatContainer && window.location.pathname.includes('/room/')) {
-        const refreshInterval = setInterval(() => {
-            // Check if user is still on the page and container exists
-            if (!document.getElementById('chatMessages')) {
-                clearInterval(refreshInterval);
-                return;
-            }
-            refreshChatMessages();
-        }, 10000); // Increased to 10 seconds to reduce load
+    if (chatContainer && chatContainer.dataset.messagesUrl) {
+        initializeRoomChat(chatContainer);
+        
+        if (window.EventSource && chatContainer.dataset.streamUrl) {
+            // Server pushes new messages; EventSource reconnects by itself
+            openChatStream(chatContainer);
+        } else {
+            const refreshInterval = setInterval(() => {
+                // Check if user is still on the page and container exists
+                if (!document.getElementById('chatMessages')) {
+                    clearInterval(refreshInterval);
+                    return;
+                }
+                refreshChatMessages();
+            }, 5000); // Only messages newer than the last one seen are fetched
+        }
     }
     
     // Auto-refresh room member count - less frequent
@@ -562,39 +569,273 @@ function initializeAutoRefresh() {
             refreshMemberCounts();
         }, 60000); // Increased to 1 minute
     }
+    
+    // Dashboard counts and requests refresh in place from its JSON variant
+    const dashboardStats = document.getElementById('dashboardStats');
+    if (dashboardStats && dashboardStats.dataset.refreshUrl) {
+        setInterval(() => {
+            if (!document.hidden) {
+                refreshDashboard(dashboardStats);
+            }
+        }, 30000); // Unchanged dashboards are answered from the server's cache
+    }
+}
+
+function refreshDashboard(dashboardStats) {
+    fetch(dashboardStats.dataset.refreshUrl, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(data => {
+            if (String(data.version) === dashboardStats.dataset.version) return;
+            dashboardStats.dataset.version = data.version;
+            
+            const previousPending = parseInt(document.querySelector('[data-dashboard-count="pending_requests"]').textContent, 10);
+            Object.entries(data.counts).forEach(([name, count]) => {
+                document.querySelectorAll('[data-dashboard-count="' + name + '"]').forEach(counter => {
+                    counter.textContent = count;
+                });
+            });
+            
+            const pendingList = document.getElementById('pendingRequests');
+            if (pendingList && data.pending_requests.length > 0) {
+                pendingList.replaceChildren(...data.pending_requests.map(renderPendingRequest));
+            } else if (pendingList && pendingList.querySelector('.request-item')) {
+                pendingList.innerHTML = '<div class="empty-state text-center py-4">' +
+                    '<i class="fas fa-inbox fa-3x text-muted mb-3"></i>' +
+                    '<p class="text-muted">No pending requests.</p></div>';
+            }
+            if (data.counts.pending_requests > previousPending) {
+                showToast('You have new swap requests.', 'info');
+            }
+            
+            data.sent_requests.forEach(request => {
+                const badge = document.querySelector('[data-request-status="' + request.id + '"]');
+                if (badge) {
+                    badge.className = 'badge bg-' + (request.status === 'pending' ? 'warning' : request.status === 'accepted' ? 'success' : 'danger');
+                    badge.textContent = request.status.charAt(0).toUpperCase() + request.status.slice(1);
+                }
+            });
+        })
+        .catch(error => {
+            console.error('Failed to refresh dashboard:', error);
+        });
 }
 
+function renderPendingRequest(request) {
+    const item = document.createElement('div');
+    item.className = 'request-item mb-3 p-3 border rounded-3 bg-light';
+    
+    const header = document.createElement('div');
+    header.className = 'd-flex justify-content-between align-items-start mb-2';
+    const name = document.createElement('h6');
+    name.className = 'text-primary';
+    name.textContent = request.requester_name;
+    const badge = document.createElement('span');
+    badge.className = 'badge bg-warning';
+    badge.textContent = 'Pending';
+    header.append(name, badge);
+    item.append(header);
+    
+    [['Wants to learn:', request.offered_skill, 'mb-2'],
+     ['In exchange for:', request.wanted_skill, 'mb-2'],
+     ['Message:', request.message, 'mb-2 text-muted small']].forEach(([label, value, className]) => {
+        if (!value) return;
+        const line = document.createElement('p');
+        line.className = className;
+        const strong = document.createElement('strong');
+        strong.textContent = label;
+        line.append(strong, ' ', value);
+        item.append(line);
+    });
+    
+    const actions = document.createElement('div');
+    actions.className = 'd-flex gap-2 mt-3';
+    [[request.accept_url, 'btn-success', 'fa-check', 'Accept'],
+     [request.reject_url, 'btn-danger', 'fa-times', 'Reject']].forEach(([url, style, icon, label]) => {
+        const link = document.createElement('a');
+        link.href = url;
+        link.className = 'btn btn-sm ' + style;
+        const glyph = document.createElement('i');
+        glyph.className = 'fas ' + icon;
+        link.append(glyph, ' ' + label);
+        actions.append(link);
+    });
+    item.append(actions);
+    return item;
+}
+
+// Room chat: send without reloading and page through history by message id
+function initializeRoomChat(chatContainer) {
+    const messageForm = document.getElementById('messageForm');
+    const messageInput = document.getElementById('messageInput');
+    
+    if (messageForm) {
+        messageForm.addEventListener('submit', function(e) {
+            e.preventDefault();
+            
+            fetch(this.action, {
+                method: 'POST',
+                body: new FormData(this),
+                headers: { 'Accept': 'application/json' }
+            })
+            .then(response => {
+                if (response.ok) {
+                    messageInput.value = '';
+                    refreshChatMessages();
+                } else {
+                    showToast('Message could not be sent.', 'danger');
+                }
+            })
+            .catch(error => {
+                console.error('Error sending message:', error);
+            });
+        });
+    }
+    
+    const loadOlder = document.getElementById('loadOlderMessages');
+    if (loadOlder) {
+        loadOlder.querySelector('button').addEventListener('click', loadOlderChatMessages);
+    }
+}
+
+function openChatStream(chatContainer) {
+    const source = new EventSource(chatContainer.dataset.streamUrl + '?after=' + chatContainer.dataset.lastId);
+    
+    source.onmessage = function(event) {
+        appendChatMessages(chatContainer, [JSON.parse(event.data)]);
+    };
+    
+    // Too many messages were missed to replay; start over from a fresh page
+    source.addEventListener('reset', function() {
+        source.close();
+        window.location.reload();
+    });
+    
+    return source;
+}
+
+function appendChatMessages(chatContainer, messages) {
+    const wasAtBottom = chatContainer.scrollTop + chatContainer.clientHeight >= chatContainer.scrollHeight - 10;
+    const emptyChat = chatContainer.querySelector('.empty-chat');
+    if (emptyChat) emptyChat.remove();
+    
+    let added = 0;
+    messages.forEach(message => {
+        // A message may arrive from both the stream and a refresh after sending
+        if (!chatContainer.querySelector('[data-message-id="' + message.id + '"]')) {
+            chatContainer.appendChild(renderChatMessage(message, chatContainer.dataset.userId));
+            added++;
+        }
+        if (message.id > parseInt(chatContainer.dataset.lastId, 10)) {
+            chatContainer.dataset.lastId = message.id;
+        }
+    });
+    if (chatContainer.dataset.firstId === '0' && messages.length > 0) {
+        chatContainer.dataset.firstId = messages[0].id;
+    }
+    updateChatMessageCount(added);
+    
+    if (wasAtBottom) {
+        chatContainer.scrollTop = chatContainer.scrollHeight;
+    }
+}
+
+let chatRefreshInFlight = false;
+
 function refreshChatMessages() {
     const chatContainer = document.getElementById('chatMessages');
-    if (!chatContainer) return;
+    if (!chatContainer || chatRefreshInFlight) return;
     
-    const roomId = chatContainer.getAttribute('data-room-id');
-    if (!roomId) return;
+    const url = chatContainer.dataset.messagesUrl + '?after=' + chatContainer.dataset.lastId;
+    let fetchMore = false;
+    chatRefreshInFlight = true;
     
-    fetch(window.location.href)
-        .then(response => response.text())
-        .then(html => {
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(html, 'text/html');
-            const newMessages = doc.getElementById('chatMessages');
+    fetch(url, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.messages || data.messages.length === 0) return;
             
-            if (newMessages && chatContainer.innerHTML !== newMessages.innerHTML) {
-                const wasAtBottom = chatContainer.scrollTop + chatContainer.clientHeight >= chatContainer.scrollHeight - 10;
-                chatContainer.innerHTML = newMessages.innerHTML;
-                
-                if (wasAtBottom) {
-                    chatContainer.scrollTop = chatContainer.scrollHeight;
-                }
-                
-                // Re-initialize tooltips for new content
-                initializeTooltips();
-            }
+            appendChatMessages(chatContainer, data.messages);
+            
+            // More than one page arrived since the last poll
+            fetchMore = data.has_more;
         })
         .catch(error => {
             console.error('Failed to refresh messages:', error);
+        })
+        .finally(() => {
+            chatRefreshInFlight = false;
+            if (fetchMore) {
+                refreshChatMessages();
+            }
         });
 }
 
+function loadOlderChatMessages() {
+    const chatContainer = document.getElementById('chatMessages');
+    const loadOlder = document.getElementById('loadOlderMessages');
+    if (!chatContainer || !loadOlder) return;
+    
+    const button = loadOlder.querySelector('button');
+    setLoadingState(button, true);
+    
+    fetch(chatContainer.dataset.messagesUrl + '?before=' + chatContainer.dataset.firstId,
+          { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(data => {
+            // Keep the current view anchored while content is inserted above it
+            const previousHeight = chatContainer.scrollHeight;
+            const fragment = document.createDocumentFragment();
+            data.messages.forEach(message => {
+                fragment.appendChild(renderChatMessage(message, chatContainer.dataset.userId));
+            });
+            loadOlder.after(fragment);
+            
+            if (data.messages.length > 0) {
+                chatContainer.dataset.firstId = data.messages[0].id;
+            }
+            if (!data.has_more) {
+                loadOlder.remove();
+            }
+            chatContainer.scrollTop += chatContainer.scrollHeight - previousHeight;
+        })
+        .catch(error => {
+            console.error('Failed to load older messages:', error);
+        })
+        .finally(() => {
+            setLoadingState(button, false);
+        });
+}
+
+function renderChatMessage(message, currentUserId) {
+    const item = document.createElement('div');
+    item.className = 'message-item ' + (String(message.user_id) === String(currentUserId) ? 'own-message' : 'other-message');
+    item.dataset.messageId = message.id;
+    
+    const header = document.createElement('div');
+    header.className = 'message-header';
+    const name = document.createElement('strong');
+    name.className = 'username';
+    name.textContent = message.name;
+    const timestamp = document.createElement('small');
+    timestamp.className = 'timestamp';
+    timestamp.textContent = message.created_at;
+    header.append(name, ' ', timestamp);
+    
+    const content = document.createElement('div');
+    content.className = 'message-content';
+    content.textContent = message.message;
+    
+    item.append(header, content);
+    return item;
+}
+
+function updateChatMessageCount(added) {
+    const counter = document.getElementById('chatMessageCount');
+    if (counter) {
+        counter.textContent = parseInt(counter.textContent, 10) + added;
+    }
+}
+
 // Enhanced toast notification system
 function showToast(message, type = 'success', duration = 5000) {
     const toastContainer = getOrCreateToastContainer();
@@ -823,7 +1064,7 @@ function showProfileViewer(userId, userName, displayName, profilePhoto, skillsCo
     // Handle profile photo
     const profilePhotoLarge = document.getElementById('profilePhotoLarge');
     if (profilePhoto && profilePhoto !== 'None' && profilePhoto !== '') {
-        profilePhotoLarge.src = `/static/uploads/${profilePhoto}`;
+        profilePhotoLarge.src = profilePhoto.startsWith('/') ? profilePhoto : `/static/uploads/${profilePhoto}`;
         profilePhotoLarge.style.display = 'block';
     } else {
         // Create avatar placeholder
@@ -873,7 +1114,7 @@ document.addEventListener('DOMContentLoaded', function() {
         if (memberInfo) {
             const userName = memberInfo.querySelector('strong')?.textContent || 'Unknown';
             const userId = avatar.dataset.userId || '1';
-            const profilePhoto = img?.src?.split('/').pop() || '';
+            const profilePhoto = img?.dataset.photoLarge || img?.src?.split('/').pop() || '';
             
             avatar.style.cursor = 'pointer';
             avatar.addEventListener('click', function() {
@@ -893,7 +1134,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const skillItem = this.closest('.skill-item');
             const userName = skillItem.querySelector('h6')?.textContent?.split(' - ')[0] || 'Unknown';
             const userId = this.dataset.userId || '1';
-            const profilePhoto = this.src.split('/').pop();
+            const profilePhoto = this.dataset.photoLarge || this.src.split('/').pop();
             
             showProfileViewer(userId, userName, userName, profilePhoto);
         });
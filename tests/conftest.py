@@ -0,0 +1,75 @@
+"""
+Shared fixtures: the Flask app on a fresh database in a temporary directory.
+
+Every test gets its own database, upload folder and per-worker objects
+(pools, caches, background threads), so nothing leaks between tests.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as skillswap  # noqa: E402
+from db import connect  # noqa: E402
+
+
+def _reset_workers(flask_app):
+    pool = flask_app.extensions.get('db_pool')
+    if pool is not None:
+        pool.close_all()
+    for key, obj in list(flask_app.extensions.items()):
+        if hasattr(obj, 'pid'):
+            del flask_app.extensions[key]
+
+
+@pytest.fixture
+def app(tmp_path):
+    flask_app = skillswap.app
+    config = dict(flask_app.config)
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    flask_app.config.update(
+        TESTING=True,
+        DATABASE=str(tmp_path / 'skillswap.db'),
+        UPLOAD_FOLDER=str(uploads),
+        AUTH_HASH_WORKERS=0,
+        PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+    )
+    _reset_workers(flask_app)
+    skillswap.init_db()
+    yield flask_app
+    _reset_workers(flask_app)
+    flask_app.config.clear()
+    flask_app.config.update(config)
+
+
+@pytest.fixture
+def db(app):
+    """A connection of the test's own, outside the app's pool"""
+    conn = connect(app.config['DATABASE'], app.config['SQLITE_PRAGMAS'])
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def signup(app):
+    """``signup(username, **fields)`` registers a user and returns a signed-in client"""
+    def signup(username, password='pw', **fields):
+        client = app.test_client()
+        form = dict(username=username, email=username + '@example.com', password=password,
+                    name=username.title(), location='')
+        form.update(fields)
+        assert client.post('/register', data=form).status_code == 302
+        assert client.post('/login', data=dict(username=username, password=password)).status_code == 302
+        return client
+    return signup
+
+
+@pytest.fixture
+def admin(app):
+    client = app.test_client()
+    assert client.post('/login', data=dict(username='admin', password='admin123')).status_code == 302
+    return client
@@ -0,0 +1,116 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from blobs import collect_garbage, rebuild_refcounts, set_photo
+from images import get_image_pipeline, photo_key
+
+ONE, TWO = 'a' * 32, 'b' * 32
+
+
+@pytest.fixture
+def users(db):
+    ids = []
+    for name in ('alice', 'bob'):
+        cursor = db.execute('INSERT INTO users (username, email, password_hash, name) VALUES (?, ?, ?, ?)',
+                            (name, name + '@example.com', 'x', name))
+        ids.append(cursor.lastrowid)
+    db.commit()
+    return ids
+
+
+@pytest.fixture
+def folder(app):
+    return app.config['UPLOAD_FOLDER']
+
+
+def touch(folder, *names):
+    for name in names:
+        path = os.path.join(folder, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as out:
+            out.write('x')
+
+
+def refcount(db, key):
+    row = db.execute('SELECT refcount FROM blobs WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+
+def test_set_photo_moves_references(db, users):
+    alice, bob = users
+    set_photo(db, alice, ONE)
+    set_photo(db, bob, ONE)
+    assert refcount(db, ONE) == 2
+
+    assert set_photo(db, alice, TWO) == ONE
+    assert (refcount(db, ONE), refcount(db, TWO)) == (1, 1)
+    set_photo(db, bob, None)
+    assert refcount(db, ONE) == 0
+
+
+def test_setting_the_same_photo_again_changes_nothing(db, users):
+    set_photo(db, users[0], ONE)
+    set_photo(db, users[0], ONE)
+    assert refcount(db, ONE) == 1
+
+
+def test_rebuild_matches_incremental_counts(db, users):
+    alice, bob = users
+    set_photo(db, alice, ONE)
+    set_photo(db, bob, TWO)
+    set_photo(db, bob, ONE)
+    assert rebuild_refcounts(db) == 0
+
+
+def test_collects_only_unreferenced_pipeline_files(db, users, folder):
+    set_photo(db, users[0], TWO)
+    db.commit()
+    dead = [ONE + '_64.webp', ONE + '_256.webp', ONE + '_64.webp.tmp', ONE + '.jpg']
+    live = [TWO + '_64.webp', TWO + '_256.webp']
+    foreign = ['temp.jpg', 'stray.png', '1_me.jpg', 'README']
+    touch(folder, *(dead + live + foreign))
+
+    removed, freed = collect_garbage(db, folder, min_age=0)
+    assert (removed, freed) == (len(dead), len(dead))
+    assert sorted(os.listdir(folder)) == sorted(live + foreign)
+
+
+def test_dry_run_and_min_age_keep_files(db, users, folder):
+    touch(folder, ONE + '_64.webp')
+    assert collect_garbage(db, folder, min_age=0, dry_run=True) == (1, 1)
+    assert collect_garbage(db, folder, min_age=3600) == (0, 0)
+    assert os.listdir(folder) == [ONE + '_64.webp']
+
+
+def test_stale_partial_uploads_are_collected(db, folder):
+    touch(folder, 'incoming/' + 'c' * 32, 'incoming/notes.txt')
+    assert collect_garbage(db, folder, min_age=0) == (1, 1)
+    assert os.listdir(os.path.join(folder, 'incoming')) == ['notes.txt']
+
+
+def test_unreferenced_blob_rows_are_dropped(db, users, folder):
+    set_photo(db, users[0], ONE)
+    set_photo(db, users[0], None)
+    db.commit()
+    collect_garbage(db, folder, min_age=0)
+    assert refcount(db, ONE) is None
+
+
+def test_identical_uploads_share_one_blob(app, db, signup):
+    pipeline = get_image_pipeline(app)
+    photo = b'\xff\xd8\xff\xe0' + os.urandom(5000)
+
+    def upload(client):
+        response = client.post('/edit_profile', content_type='multipart/form-data', data=dict(
+            name='X', location='', availability='', is_public='1', profile_photo=(io.BytesIO(photo), 'me.jpg')))
+        assert response.status_code == 302
+        pipeline.join()
+
+    upload(signup('alice'))
+    upload(signup('bob'))
+    key = photo_key(hashlib.sha256(photo).hexdigest())
+    stored = db.execute('SELECT key, refcount FROM blobs WHERE key LIKE ?', (key + '%',)).fetchall()
+    assert [tuple(row)[1] for row in stored] == [2]
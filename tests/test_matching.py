@@ -0,0 +1,88 @@
+import time
+
+from matching import get_match_queue, rebuild_matches
+
+
+def wait_for_matches(app, timeout=5.0):
+    """Block until the background updater has applied every queued change"""
+    queue = get_match_queue(app)
+    deadline = time.monotonic() + timeout
+    while queue.stats()['pending']:
+        assert time.monotonic() < deadline, 'match queue never drained'
+        time.sleep(0.02)
+
+
+def matched_names(client):
+    return [match['name'] for match in client.get('/api/matches').get_json()['matches']]
+
+
+def stored(db):
+    return db.execute('SELECT * FROM skill_matches ORDER BY user_id, other_id').fetchall()
+
+
+def test_reciprocal_skills_match_both_ways(app, signup):
+    alice, bob = signup('alice'), signup('bob')
+    alice.post('/add_skill_offered', data=dict(skill_name='Python'))
+    alice.post('/add_skill_wanted', data=dict(skill_name='Guitar'))
+    bob.post('/add_skill_offered', data=dict(skill_name='guitar!'))
+    bob.post('/add_skill_wanted', data=dict(skill_name='python'))
+    wait_for_matches(app)
+
+    assert matched_names(alice) == ['Bob']
+    assert matched_names(bob) == ['Alice']
+
+
+def test_one_way_interest_is_not_a_match(app, signup):
+    alice, bob = signup('alice'), signup('bob')
+    alice.post('/add_skill_wanted', data=dict(skill_name='Guitar'))
+    bob.post('/add_skill_offered', data=dict(skill_name='Guitar'))
+    wait_for_matches(app)
+
+    assert matched_names(alice) == []
+    assert matched_names(bob) == []
+
+
+def test_rejected_skill_removes_the_match(app, db, signup, admin):
+    alice, bob = signup('alice'), signup('bob')
+    alice.post('/add_skill_offered', data=dict(skill_name='Python'))
+    alice.post('/add_skill_wanted', data=dict(skill_name='Guitar'))
+    bob.post('/add_skill_offered', data=dict(skill_name='Guitar'))
+    bob.post('/add_skill_wanted', data=dict(skill_name='Python'))
+    wait_for_matches(app)
+    assert matched_names(alice) == ['Bob']
+
+    guitar = db.execute("SELECT id FROM skills_offered WHERE skill_name = 'Guitar'").fetchone()[0]
+    admin.get('/admin/approve_skill/%d?action=reject' % guitar)
+    wait_for_matches(app)
+
+    assert matched_names(alice) == []
+    assert matched_names(bob) == []
+
+
+def test_banned_partner_is_hidden(app, db, signup, admin):
+    alice, bob = signup('alice'), signup('bob')
+    alice.post('/add_skill_offered', data=dict(skill_name='Python'))
+    alice.post('/add_skill_wanted', data=dict(skill_name='Guitar'))
+    bob.post('/add_skill_offered', data=dict(skill_name='Guitar'))
+    bob.post('/add_skill_wanted', data=dict(skill_name='Python'))
+    wait_for_matches(app)
+
+    bob_id = db.execute("SELECT id FROM users WHERE username = 'bob'").fetchone()[0]
+    admin.get('/admin/ban_user/%d' % bob_id)
+    assert matched_names(alice) == []
+
+
+def test_incremental_updates_agree_with_a_rebuild(app, db, signup):
+    skills = ['Python', 'Guitar', 'Cooking', 'Chess']
+    clients = [signup('user%d' % i) for i in range(6)]
+    for i, client in enumerate(clients):
+        client.post('/add_skill_offered', data=dict(skill_name=skills[i % 4]))
+        client.post('/add_skill_wanted', data=dict(skill_name=skills[(i + 1) % 4]))
+        client.post('/add_skill_wanted', data=dict(skill_name=skills[(i + 3) % 4]))
+    wait_for_matches(app)
+
+    incremental = stored(db)
+    assert incremental
+    rebuild_matches(db)
+    db.commit()
+    assert stored(db) == incremental
@@ -0,0 +1,69 @@
+def test_matching_etag_gets_304(app):
+    client = app.test_client()
+    first = client.get('/')
+    assert first.status_code == 200 and first.headers['ETag']
+
+    again = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+    cached = client.get('/')
+    assert cached.data == first.data and cached.headers['ETag'] == first.headers['ETag']
+
+
+def test_write_to_a_read_table_changes_the_etag(app, signup):
+    alice = signup('alice')
+    alice.get('/browse_skills')
+    etag = alice.get('/browse_skills').headers['ETag']
+    alice.post('/add_skill_offered', data=dict(skill_name='Juggling'))
+    alice.get('/dashboard')  # consumes the flash
+
+    response = alice.get('/browse_skills', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert b'Juggling' in response.data
+
+
+def test_direct_database_writes_are_seen(app, db, signup):
+    alice = signup('alice')
+    alice.get('/profile')
+    etag = alice.get('/profile').headers['ETag']
+    db.execute("UPDATE users SET location = 'Paris' WHERE username = 'alice'")
+    db.commit()
+    assert alice.get('/profile', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_each_viewer_has_their_own_etag(app, signup):
+    alice, bob = signup('alice'), signup('bob')
+    alice.get('/browse_skills')
+    bob.get('/browse_skills')
+    seen_by_alice = alice.get('/browse_skills')
+    assert bob.get('/browse_skills').headers['ETag'] != seen_by_alice.headers['ETag']
+    response = bob.get('/browse_skills', headers={'If-None-Match': seen_by_alice.headers['ETag'],
+                                                  'If-Modified-Since': seen_by_alice.headers['Last-Modified']})
+    assert response.status_code == 200
+
+
+def test_pages_with_flashes_are_not_cached(app, signup):
+    alice = signup('alice')
+    alice.post('/create_room', data=dict(name='Room', description='', is_public='1'))
+    assert 'ETag' not in alice.get('/rooms').headers
+    assert 'ETag' in alice.get('/rooms').headers
+
+
+def test_new_chat_message_invalidates_the_fetch(app, db, signup):
+    alice = signup('alice')
+    alice.post('/create_room', data=dict(name='Room', description='', is_public='1'))
+    alice.get('/rooms')
+    room = db.execute('SELECT id FROM rooms').fetchone()[0]
+    url = '/room/%d/messages?after=0' % room
+    etag = alice.get(url).headers['ETag']
+    assert alice.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    alice.post('/send_message', data=dict(room_id=room, message='hi'))
+    assert alice.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_not_modified_responses_are_counted(app, admin):
+    client = app.test_client()
+    etag = client.get('/').headers['ETag']
+    client.get('/', headers={'If-None-Match': etag})
+    stats = admin.get('/admin/caches').get_json()['pages']['endpoints']['index']
+    assert stats['not_modified'] == 1
@@ -0,0 +1,81 @@
+import sqlite3
+
+from pagination import decode_cursor, encode_cursor, keyset_page, page_size
+
+
+def walk(conn, limit):
+    """Every id keyset_page returns, following next cursors to the end"""
+    seen, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(conn, 'SELECT id, created_at FROM items', '1 = 1', (), cursor, limit)
+        seen.extend(row['id'] for row in rows)
+        if cursor is None:
+            return seen
+
+
+def items(created):
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, created_at TEXT)')
+    conn.executemany('INSERT INTO items (created_at) VALUES (?)', [(c,) for c in created])
+    return conn
+
+
+def test_cursor_round_trip():
+    token = encode_cursor('2024-01-02 03:04:05', 42)
+    assert decode_cursor(token) == ('2024-01-02 03:04:05', 42)
+
+
+def test_malformed_cursor_means_first_page():
+    assert decode_cursor(None) is None
+    assert decode_cursor('garbage!!') is None
+    assert decode_cursor(encode_cursor('x', 1)[:-2] + '~~') is None
+
+
+def test_pages_cover_every_row_once_in_order():
+    conn = items(['2024-01-%02d' % (day % 5 + 1) for day in range(23)])
+    expected = [row[0] for row in conn.execute('SELECT id FROM items ORDER BY created_at DESC, id DESC')]
+    for limit in (1, 3, 5, 23, 50):
+        assert walk(conn, limit) == expected
+
+
+def test_last_page_has_no_cursor():
+    conn = items(['2024-01-01'] * 4)
+    rows, cursor = keyset_page(conn, 'SELECT id, created_at FROM items', '1 = 1', (), None, 4)
+    assert len(rows) == 4 and cursor is None
+
+
+def test_rows_added_while_paging_are_not_repeated():
+    conn = items(['2024-01-01'] * 6)
+    rows, cursor = keyset_page(conn, 'SELECT id, created_at FROM items', '1 = 1', (), None, 3)
+    conn.execute("INSERT INTO items (created_at) VALUES ('2024-02-01')")
+    rest, _ = keyset_page(conn, 'SELECT id, created_at FROM items', '1 = 1', (), cursor, 10)
+    assert [row['id'] for row in rows] == [6, 5, 4]
+    assert [row['id'] for row in rest] == [3, 2, 1]
+
+
+def test_page_size_is_clamped():
+    assert page_size(None, 50, 200) == 50
+    assert page_size(0, 50, 200) == 50
+    assert page_size(10, 50, 200) == 10
+    assert page_size(10 ** 6, 50, 200) == 200
+
+
+def test_admin_messages_follow_next_url(admin, db):
+    for i in range(7):
+        admin.post('/admin/send_message', data=dict(title='T%d' % i, message='m'))
+    page = admin.get('/admin/messages?limit=3&format=json').get_json()
+    seen = [item['id'] for item in page['items']]
+    while page['next_url']:
+        page = admin.get(page['next_url']).get_json()
+        seen.extend(item['id'] for item in page['items'])
+
+    expected = [row[0] for row in db.execute('SELECT id FROM platform_messages ORDER BY created_at DESC, id DESC')]
+    assert seen == expected and len(seen) == 7
+
+
+def test_browse_skills_ignores_a_bad_cursor(app, signup):
+    alice = signup('alice')
+    alice.post('/add_skill_offered', data=dict(skill_name='Python'))
+    page = alice.get('/browse_skills?limit=1&cursor=garbage!!&format=json').get_json()
+    assert [item['skill_name'] for item in page['items']] == ['Python']
@@ -0,0 +1,85 @@
+import pytest
+
+from sessions import SQLiteSessionInterface, get_principals
+
+
+@pytest.fixture
+def server_sessions(app):
+    cookie_sessions = app.session_interface
+    app.session_interface = SQLiteSessionInterface()
+    yield
+    app.session_interface = cookie_sessions
+
+
+def sid(client):
+    return client.get_cookie('session').value
+
+
+def stored(db, session_id):
+    return db.execute('SELECT user_id FROM sessions WHERE id = ?', (session_id,)).fetchone()
+
+
+def user_id(db, username):
+    return db.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()[0]
+
+
+def test_cookie_carries_only_the_session_id(app, db, server_sessions, signup):
+    alice = signup('alice')
+    row = stored(db, sid(alice))
+    assert row['user_id'] == user_id(db, 'alice')
+    assert len(sid(alice)) < 60
+    assert alice.get('/dashboard').status_code == 200
+
+
+def test_login_rotates_a_planted_session_id(app, db, server_sessions, signup):
+    signup('alice')
+    client = app.test_client()
+    # An anonymous session (holding the logout flash) an attacker could plant
+    client.get('/logout')
+    planted = sid(client)
+    assert stored(db, planted) is not None
+
+    assert client.post('/login', data=dict(username='alice', password='pw')).status_code == 302
+    assert sid(client) != planted
+    assert stored(db, planted) is None
+    assert stored(db, sid(client))['user_id'] == user_id(db, 'alice')
+
+
+def test_logout_deletes_the_session(app, db, server_sessions, signup):
+    alice = signup('alice')
+    session_id = sid(alice)
+    alice.get('/logout')
+    assert stored(db, session_id) is None
+    assert alice.get('/dashboard').status_code == 302
+
+
+def test_ban_signs_the_user_out_everywhere(app, db, server_sessions, signup, admin):
+    phone, laptop = signup('alice'), app.test_client()
+    laptop.post('/login', data=dict(username='alice', password='pw'))
+    alice = user_id(db, 'alice')
+
+    admin.get('/admin/ban_user/%d' % alice)
+    assert db.execute('SELECT COUNT(*) FROM sessions WHERE user_id = ?', (alice,)).fetchone()[0] == 0
+    for client in (phone, laptop):
+        response = client.get('/dashboard')
+        assert response.status_code == 302 and '/login' in response.headers['Location']
+
+
+def test_principal_is_cached_and_dropped_on_profile_edit(app, db, signup):
+    alice = signup('alice')
+    principals = get_principals(app)
+    alice.get('/dashboard')
+    hits = principals.stats()['hits']
+    alice.get('/dashboard')
+    assert principals.stats()['hits'] > hits
+
+    alice.post('/edit_profile', data=dict(name='Alice B', location='', availability='', is_public='1'))
+    with app.app_context():
+        assert principals.get(user_id(db, 'alice')).name == 'Alice B'
+
+
+def test_admin_rights_come_from_the_database_not_the_cookie(app, signup):
+    alice = signup('alice')
+    with alice.session_transaction() as session:
+        session['is_admin'] = True
+    assert alice.get('/admin').status_code == 302
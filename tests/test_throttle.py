@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from throttle import LoginThrottle, MemoryStore, SQLiteStore, _gcra
+
+
+def takes(store, key, times, now=100.0, interval=10.0, burst=3):
+    return [store.take(key, now, interval, burst) for _ in range(times)]
+
+
+def test_gcra_allows_a_burst_then_one_per_interval():
+    tat, waits = None, []
+    for _ in range(4):
+        new_tat, wait = _gcra(tat, 100.0, 10.0, 3)
+        tat = new_tat or tat
+        waits.append(wait)
+    assert waits == [0.0, 0.0, 0.0, pytest.approx(10.0)]
+    assert _gcra(tat, 110.0, 10.0, 3)[1] == 0.0
+
+
+def test_gcra_refused_attempt_does_not_extend_the_wait():
+    tat, _ = _gcra(None, 0.0, 10.0, 1)
+    assert _gcra(tat, 5.0, 10.0, 1) == (None, pytest.approx(5.0))
+    assert _gcra(tat, 9.0, 10.0, 1) == (None, pytest.approx(1.0))
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, app):
+    if request.param == 'memory':
+        return MemoryStore(max_keys=64)
+    return SQLiteStore(app.config['DATABASE'], prune_every=1)
+
+
+def test_store_buckets_are_per_key(store):
+    assert takes(store, 1, 4)[3] > 0
+    assert takes(store, 2, 3) == [0, 0, 0]
+
+
+def test_store_refills_and_resets(store):
+    # reset() reads the clock, so these buckets live in real time
+    now = time.time()
+    assert takes(store, 1, 4, now=now)[3] > 0
+    assert store.take(1, now + 10, 10.0, 3) == 0
+    store.reset(1)
+    assert takes(store, 1, 3, now=now + 10) == [0, 0, 0]
+
+
+def test_memory_store_never_grows():
+    store = MemoryStore(max_keys=4)
+    for key in range(100):
+        store.take(key, 100.0, 10.0, 3)
+    assert len(store._tats) == 4 and store.evicted > 0
+
+
+def test_throttled_address_cannot_lock_out_a_username():
+    throttle = LoginThrottle(MemoryStore(1000), {'user': (3, 300), 'ip': (2, 60)})
+    assert throttle.check('victim', '6.6.6.6') == 0
+    assert throttle.check('victim', '6.6.6.6') == 0
+    for _ in range(20):
+        assert throttle.check('victim', '6.6.6.6') > 0
+    assert throttle.check('victim', '1.2.3.4') == 0
+    assert throttle.stats()['ip_throttled'] == 20 and throttle.stats()['user_throttled'] == 0
+
+
+def test_login_route_refuses_before_hashing(app, signup):
+    from auth import get_auth
+
+    signup('alice')
+    client = app.test_client()
+    auth = get_auth(app)
+    verifies = auth.stats()['verifies']
+    codes = [client.post('/login', data=dict(username='alice', password='bad')).status_code for _ in range(6)]
+    assert codes == [200] * 5 + [429]
+    assert auth.stats()['verifies'] == verifies + 5
+
+    response = client.post('/login', data=dict(username='alice', password='pw'))
+    assert response.status_code == 429 and int(response.headers['Retry-After']) > 0
+
+
+def test_good_login_clears_the_username_bucket(app, signup):
+    signup('alice')
+    client = app.test_client()
+    for _ in range(4):
+        client.post('/login', data=dict(username='alice', password='bad'))
+    assert client.post('/login', data=dict(username='alice', password='pw')).status_code == 302
+    codes = [client.post('/login', data=dict(username='alice', password='bad')).status_code for _ in range(5)]
+    assert codes == [200] * 5
+
+
+def test_ip_limit_spans_usernames(app):
+    app.config['LOGIN_IP_LIMIT'] = (3, 60)
+    client = app.test_client()
+    codes = [client.post('/login', data=dict(username='nobody%d' % i, password='x'),
+                         environ_base={'REMOTE_ADDR': '10.0.0.9'}).status_code for i in range(4)]
+    assert codes == [200, 200, 200, 429]
@@ -0,0 +1,208 @@
+"""
+Login throttling with token buckets keyed by username and client IP.
+
+Every login attempt takes a token from the bucket of the client's address
+and then from the bucket of the username tried; if either is empty the
+attempt is refused before any password hash is computed. The username bucket
+slows guessing at one account from many addresses, the IP bucket slows
+credential stuffing across many accounts from one address. An attempt the
+IP bucket refuses never touches the username bucket, so an address that is
+already throttled cannot keep locking a victim's account.
+
+Buckets use GCRA, which is a token bucket stored as a single number per key:
+the time at which the bucket will be full again. A key whose time has passed
+holds no information and its slot can be reused. ``MemoryStore`` keeps the
+buckets of this worker in a fixed-size table of ``max_keys`` slots;
+``SQLiteStore`` keeps them in the ``login_throttle`` table so every worker
+shares them.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from flask import current_app
+
+from db import per_worker
+
+
+BUCKET_SQL = 'SELECT tat FROM login_throttle WHERE key = ?'
+PRUNE_SQL = 'DELETE FROM login_throttle WHERE tat <= ?'
+
+
+def _key(bucket, value):
+    """Fixed-size integer key, so long usernames cost no more than short ones"""
+    digest = hashlib.blake2b(('%s\0%s' % (bucket, value)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def _gcra(tat, now, interval, burst):
+    """(new full-at time, 0) if a token is free, else (None, seconds until one is)"""
+    tat = max(tat or now, now) + interval
+    allowed_at = tat - burst * interval
+    if allowed_at > now:
+        return None, allowed_at - now
+    return tat, 0.0
+
+
+class MemoryStore:
+    """Buckets for this worker only, in a fixed-size set-associative table
+
+    Room for ``max_keys`` buckets at 16 bytes each, allocated up front. A key
+    may live in any of ``WAYS`` slots of its set; a new key takes a refilled
+    slot, or else evicts the bucket closest to refilling.
+    """
+
+    WAYS = 4
+
+    def __init__(self, max_keys=1000000):
+        self.pid = os.getpid()
+        self._sets = max(1, max_keys // self.WAYS)
+        size = self._sets * self.WAYS
+        self._keys = array('q', bytes(8 * size))
+        self._tats = array('d', bytes(8 * size))
+        self._lock = threading.Lock()
+        self.evicted = 0   # buckets dropped before they had refilled
+
+    def _find(self, key, now):
+        """Slot holding ``key``, or the slot a new bucket for it should take"""
+        keys, tats = self._keys, self._tats
+        base = key % self._sets * self.WAYS
+        victim, oldest = base, None
+        for slot in range(base, base + self.WAYS):
+            if keys[slot] == key and tats[slot] > now:
+                return slot, True
+            if oldest is None or tats[slot] < oldest:
+                victim, oldest = slot, tats[slot]
+        if oldest > now:
+            self.evicted += 1
+        return victim, False
+
+    def take(self, key, now, interval, burst):
+        with self._lock:
+            slot, found = self._find(key, now)
+            new_tat, wait = _gcra(self._tats[slot] if found else None, now, interval, burst)
+            if new_tat:
+                self._keys[slot] = key
+                self._tats[slot] = new_tat
+        return wait
+
+    def reset(self, key):
+        with self._lock:
+            slot, found = self._find(key, time.time())
+            if found:
+                self._tats[slot] = 0.0
+
+    def stats(self):
+        now = time.time()
+        return {'keys': sum(1 for tat in self._tats if tat > now), 'slots': len(self._tats),
+                'evicted': self.evicted}
+
+
+class SQLiteStore:
+    """Buckets shared by every worker through the ``login_throttle`` table
+
+    Each take is one short write transaction. Refilled rows are deleted every
+    ``prune_every`` takes, so the table only holds recently active keys.
+    """
+
+    def __init__(self, database, prune_every=1000):
+        self.pid = os.getpid()
+        self.prune_every = prune_every
+        self._conn = sqlite3.connect(database, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA busy_timeout = 5000')
+        self._lock = threading.Lock()
+        self._takes = 0
+        self.expired = 0
+
+    def take(self, key, now, interval, burst):
+        with self._lock:
+            conn = self._conn
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(BUCKET_SQL, (key,)).fetchone()
+                new_tat, wait = _gcra(row and row[0], now, interval, burst)
+                if new_tat:
+                    conn.execute('''
+                        INSERT INTO login_throttle (key, tat) VALUES (?, ?)
+                        ON CONFLICT (key) DO UPDATE SET tat = excluded.tat
+                    ''', (key, new_tat))
+                self._takes += 1
+                if self._takes % self.prune_every == 0:
+                    self.expired += conn.execute(PRUNE_SQL, (now,)).rowcount
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return wait
+
+    def reset(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM login_throttle WHERE key = ?', (key,))
+
+    def stats(self):
+        with self._lock:
+            keys = self._conn.execute('SELECT COUNT(*) FROM login_throttle').fetchone()[0]
+        return {'keys': keys, 'expired': self.expired}
+
+
+class LoginThrottle:
+    """Per-username and per-IP login buckets over one store
+
+    ``limits`` maps 'user' and 'ip' to (burst, period): ``burst`` attempts
+    at once, refilled evenly over ``period`` seconds.
+    """
+
+    def __init__(self, store, limits):
+        self.pid = os.getpid()
+        self.store = store
+        self.limits = limits
+        self._stats = {'allowed': 0, 'throttled': 0, 'user_throttled': 0, 'ip_throttled': 0, 'errors': 0}
+
+    def check(self, username, ip):
+        """Take one attempt from the IP bucket, then the username's; seconds to wait, 0 if allowed"""
+        now = time.time()
+        wait = 0.0
+        for bucket, value in (('ip', ip), ('user', username)):
+            burst, period = self.limits[bucket]
+            try:
+                wait = self.store.take(_key(bucket, value), now, period / burst, burst)
+            except sqlite3.Error:
+                # A locked throttle table should not lock everyone out
+                self._stats['errors'] += 1
+                continue
+            if wait:
+                self._stats[bucket + '_throttled'] += 1
+                break
+        self._stats['throttled' if wait else 'allowed'] += 1
+        return wait
+
+    def succeeded(self, username):
+        """Forget the username's failed attempts after a good login"""
+        try:
+            self.store.reset(_key('user', username))
+        except sqlite3.Error:
+            self._stats['errors'] += 1
+
+    def stats(self):
+        return dict(self._stats, store=dict(self.store.stats(), backend=type(self.store).__name__),
+                    limits={bucket: {'burst': burst, 'period': period}
+                            for bucket, (burst, period) in self.limits.items()})
+
+
+def get_login_throttle(app=None):
+    """Return this worker's login throttle, built from the LOGIN_* settings"""
+    app = app or current_app
+
+    def build():
+        if app.config['LOGIN_THROTTLE_BACKEND'] == 'sqlite':
+            store = SQLiteStore(app.config['DATABASE'])
+        else:
+            store = MemoryStore(app.config['LOGIN_THROTTLE_MAX_KEYS'])
+        return LoginThrottle(store, {'user': app.config['LOGIN_USER_LIMIT'],
+                                     'ip': app.config['LOGIN_IP_LIMIT']})
+
+    return per_worker(app, 'login_throttle', build)
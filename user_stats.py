@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Per-user aggregates kept in the ``user_stats`` table.
+
+Pages that list users used to recompute ratings and counts with correlated
+subqueries for every row. Instead, the routes that change ratings, swaps or
+skills call :func:`bump` inside the same transaction as their own write, and
+readers ``LEFT JOIN user_stats`` (a missing row means all zeros).
+
+Usage: python user_stats.py [--repair] [database]   # report (and fix) drift
+"""
+
+import argparse
+import sqlite3
+
+COLUMNS = ('rating_sum', 'rating_count', 'swaps_completed', 'swap_requests',
+           'skills_offered', 'skills_wanted')
+
+# What every counter should be, recomputed from the base tables
+STATS_SQL = 'SELECT * FROM user_stats WHERE user_id = ?'
+
+_EXPECTED = '''
+    SELECT u.id AS user_id,
+           COALESCE((SELECT SUM(rating) FROM ratings WHERE rated_id = u.id), 0) AS rating_sum,
+           (SELECT COUNT(*) FROM ratings WHERE rated_id = u.id) AS rating_count,
+           (SELECT COUNT(*) FROM swap_requests
+            WHERE (requester_id = u.id OR provider_id = u.id) AND status = 'accepted') AS swaps_completed,
+           (SELECT COUNT(*) FROM swap_requests
+            WHERE requester_id = u.id OR provider_id = u.id) AS swap_requests,
+           (SELECT COUNT(*) FROM skills_offered WHERE user_id = u.id) AS skills_offered,
+           (SELECT COUNT(*) FROM skills_wanted WHERE user_id = u.id) AS skills_wanted
+    FROM users u
+'''
+
+
+def bump(conn, user_id, **deltas):
+    """Add ``deltas`` (column=amount) to a user's counters
+
+    Runs inside the caller's transaction so the counters commit or roll back
+    together with the change they describe.
+    """
+    unknown = set(deltas) - set(COLUMNS)
+    if unknown:
+        raise ValueError('Unknown user_stats columns: %s' % ', '.join(sorted(unknown)))
+    columns = [column for column in COLUMNS if deltas.get(column)]
+    if not columns:
+        return
+
+    conn.execute('''
+        INSERT INTO user_stats (user_id, %s) VALUES (?, %s)
+        ON CONFLICT (user_id) DO UPDATE SET %s, updated_at = CURRENT_TIMESTAMP
+    ''' % (', '.join(columns),
+           ', '.join('?' * len(columns)),
+           ', '.join('%s = %s + excluded.%s' % (c, c, c) for c in columns)),
+        [user_id] + [deltas[c] for c in columns])
+
+
+def get_stats(conn, user_id):
+    """Counters for one user as a dict, with ``avg_rating`` (None if unrated)"""
+    row = conn.execute(STATS_SQL, (user_id,)).fetchone()
+    stats = dict.fromkeys(COLUMNS, 0)
+    if row is not None:
+        stats.update((c, row[c]) for c in COLUMNS)
+    stats['avg_rating'] = stats['rating_sum'] / stats['rating_count'] if stats['rating_count'] else None
+    return stats
+
+
+def find_drift(conn):
+    """Users whose stored counters disagree with the base tables"""
+    return conn.execute('''
+        SELECT e.user_id FROM (%s) e
+        LEFT JOIN user_stats s ON s.user_id = e.user_id
+        WHERE %s
+        UNION
+        SELECT s.user_id FROM user_stats s
+        WHERE NOT EXISTS (SELECT 1 FROM users WHERE id = s.user_id)
+    ''' % (_EXPECTED, ' OR '.join('COALESCE(s.%s, 0) != e.%s' % (c, c) for c in COLUMNS))).fetchall()
+
+
+def rebuild_stats(conn):
+    """Recompute every user's counters from scratch"""
+    conn.execute('DELETE FROM user_stats')
+    conn.execute('INSERT INTO user_stats (user_id, %s) SELECT * FROM (%s)'
+                 % (', '.join(COLUMNS), _EXPECTED))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check user_stats against the base tables')
+    parser.add_argument('database', nargs='?', default='skillswap.db')
+    parser.add_argument('--repair', action='store_true', help='rebuild the table if it has drifted')
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.database)
+    drifted = find_drift(conn)
+    print('%d users with drifted stats' % len(drifted))
+    if drifted and args.repair:
+        rebuild_stats(conn)
+        conn.commit()
+        print('Rebuilt user_stats; %d users drifted after repair' % len(find_drift(conn)))
+    conn.close()
+    return 1 if drifted and not args.repair else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())